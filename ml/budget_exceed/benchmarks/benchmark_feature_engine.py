@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark the feature engine: compute_features() on 10k and 100k projects
+(long-format tables, one grouped pass) against one call per project, timed on
+a sample and extrapolated.
+
+Tables are random but shaped like the database: ~40 timesheets, ~20 tasks,
+a few blockers, expenses, POs, bills, invoices and team rates per project.
+
+Usage:
+    python benchmarks/benchmark_feature_engine.py [--sizes 10000 100000] [--per-project-sample 300]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from feature_engine import compute_features
+
+TODAY = np.datetime64('2025-06-30')
+
+
+def synthetic_tables(n: int, seed: int = 7):
+    """Long-format source tables for n projects"""
+    rng = np.random.default_rng(seed)
+    ids = np.array([f'project-{i}' for i in range(n)])
+    start = TODAY - rng.integers(30, 900, n).astype('timedelta64[D]')
+    duration = rng.integers(14, 720, n)
+    end = start + duration.astype('timedelta64[D]')
+
+    def rows(mean):
+        counts = rng.poisson(mean, n)
+        owner = np.repeat(np.arange(n), counts)
+        offset = (rng.random(len(owner)) * duration[owner]).astype('timedelta64[D]')
+        return owner, start[owner] + offset
+
+    owner, worked_on = rows(40)
+    timesheets = pd.DataFrame({'project_id': ids[owner], 'worked_on': worked_on,
+                               'hours': rng.uniform(2, 10, len(owner)), 'cost_rate': rng.uniform(40, 200, len(owner))})
+    owner, created_at = rows(20)
+    tasks = pd.DataFrame({'project_id': ids[owner], 'created_at': created_at,
+                          'due_date': created_at + rng.integers(5, 60, len(owner)).astype('timedelta64[D]'),
+                          'state': rng.choice(['new', 'in_progress', 'done', 'blocked'], len(owner))})
+    owner, blocked_at = rows(3)
+    blockers = pd.DataFrame({'project_id': ids[owner],
+                             'resolved_at': np.where(rng.random(len(owner)) < 0.7, blocked_at, np.datetime64('NaT'))})
+    owner, _ = rows(5)
+    expenses = pd.DataFrame({'project_id': ids[owner], 'amount': rng.lognormal(6, 1, len(owner))})
+    owner, _ = rows(3)
+    purchase_orders = pd.DataFrame({'project_id': ids[owner], 'grand_total': rng.lognormal(7, 1, len(owner)),
+                                    'status': rng.choice(['draft', 'confirmed', 'fulfilled'], len(owner))})
+    owner, _ = rows(2)
+    vendor_bills = pd.DataFrame({'project_id': ids[owner], 'grand_total': rng.lognormal(7, 1, len(owner))})
+    owner, invoice_date = rows(4)
+    invoices = pd.DataFrame({'project_id': ids[owner], 'invoice_date': invoice_date,
+                             'paid_at': np.where(rng.random(len(owner)) < 0.6,
+                                                 invoice_date + rng.integers(5, 60, len(owner)).astype('timedelta64[D]'),
+                                                 np.datetime64('NaT'))})
+    owner, _ = rows(6)
+    user_rates = pd.DataFrame({'project_id': ids[owner], 'bill_rate': rng.uniform(75, 250, len(owner))})
+
+    projects = pd.DataFrame({'project_id': ids, 'start_date': start, 'end_date': end,
+                             'budget_amount': rng.lognormal(11, 1, n), 'progress_pct': rng.uniform(0, 100, n)})
+    return dict(projects=projects, timesheets=timesheets, tasks=tasks, blockers=blockers, expenses=expenses,
+                purchase_orders=purchase_orders, vendor_bills=vendor_bills, invoices=invoices, user_rates=user_rates)
+
+
+def per_project(tables, as_of):
+    """One compute_features() call per project (the previous per-project loop shape)"""
+    split = {name: dict(tuple(frame.groupby('project_id'))) for name, frame in tables.items() if name != 'projects'}
+    for _, project in tables['projects'].groupby('project_id', sort=False):
+        pid = project['project_id'].iloc[0]
+        compute_features(project, *(split[name].get(pid) for name in split), as_of=as_of)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--per-project-sample', type=int, default=300,
+                        help='Projects computed one call at a time to estimate that rate')
+    args = parser.parse_args()
+    as_of = pd.Timestamp(TODAY)
+
+    sample = synthetic_tables(args.per_project_sample)
+    start = time.perf_counter()
+    per_project(sample, as_of)
+    per_project_rate = (time.perf_counter() - start) / args.per_project_sample
+    print(f"Per-project calls: {per_project_rate * 1000:.2f} ms/project ({args.per_project_sample} sampled)")
+
+    for n in args.sizes:
+        tables = synthetic_tables(n)
+        rows = sum(len(frame) for frame in tables.values())
+        start = time.perf_counter()
+        features = compute_features(**tables, as_of=as_of)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>7} projects ({rows:,} rows): batch {elapsed:.2f}s ({n / elapsed:,.0f}/s), "
+              f"per-project ~{per_project_rate * n:.0f}s, mean CPI {features['cpi'].mean():.2f}")
+
+
+if __name__ == '__main__':
+    main()
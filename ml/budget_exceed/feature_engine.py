@@ -0,0 +1,263 @@
+"""
+Project Feature Engine
+======================
+The 14 overrun-model features for many projects at once, shared by the
+synthetic training data generator and live scoring.
+
+Inputs are long-format tables with a project_id column (one frame per source
+table, all projects together); every feature is a grouped aggregate computed
+in one vectorized pass:
+
+    features = compute_features(projects, timesheets=..., tasks=..., blockers=...,
+                                expenses=..., purchase_orders=..., vendor_bills=...,
+                                invoices=..., user_rates=...)
+
+Dates are compared at day resolution (timezone-aware timestamps as local wall
+time), the snapshot date is today capped at each project's end date unless a
+snapshot_date column says otherwise.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+FEATURE_NAMES = [
+    'cpi', 'spi', 'vac_pct', 'burn_rate_ratio', 'overdue_pct', 'blocker_density',
+    'progress_pct', 'days_elapsed_pct', 'scope_creep_proxy', 'finance_gaps',
+    'invoice_lag_days', 'timesheet_volatility', 'avg_team_rate', 'people_active_7d'
+]
+
+DAY = np.timedelta64(1, 'D')
+
+
+def _timestamps(values) -> pd.Series:
+    """Naive datetime64 values; timezone-aware inputs keep their local wall time"""
+    values = pd.Series(values)
+    try:
+        stamps = pd.to_datetime(values)
+    except (ValueError, TypeError):
+        # Mixed UTC offsets (e.g. across DST) cannot share one dtype: drop the tz per value
+        stamps = pd.to_datetime(values.map(
+            lambda v: v.replace(tzinfo=None) if getattr(v, 'tzinfo', None) is not None else v))
+    if getattr(stamps.dt, 'tz', None) is not None:
+        stamps = stamps.dt.tz_localize(None)
+    return stamps
+
+
+def _days(values) -> np.ndarray:
+    """Values as day-resolution datetime64 (NaT where missing)"""
+    return _timestamps(values).dt.normalize().to_numpy(dtype='datetime64[ns]')
+
+
+def _numbers(values) -> np.ndarray:
+    """Values as float64 (Decimal/None friendly)"""
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+
+class _Grouper:
+    """Maps each table row to its project's position"""
+
+    def __init__(self, project_ids: pd.Index):
+        self.project_ids = project_ids
+        self.n = len(project_ids)
+
+    def codes(self, table: Optional[pd.DataFrame]) -> np.ndarray:
+        if table is None or len(table) == 0:
+            return np.empty(0, dtype=np.intp)
+        return self.project_ids.get_indexer(table['project_id'])
+
+    def count(self, codes: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        keep = codes >= 0 if mask is None else (codes >= 0) & mask
+        return np.bincount(codes[keep], minlength=self.n)
+
+    def total(self, codes: np.ndarray, values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        keep = (codes >= 0) & ~np.isnan(values)
+        if mask is not None:
+            keep &= mask
+        return np.bincount(codes[keep], weights=values[keep], minlength=self.n)
+
+
+def _has(table: Optional[pd.DataFrame], *columns: str) -> bool:
+    return table is not None and len(table) > 0 and all(col in table.columns for col in columns)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """numerator / denominator where valid, else 0"""
+    out = np.zeros(len(numerator))
+    np.divide(numerator, denominator, out=out, where=valid)
+    return out
+
+
+def compute_features(projects: pd.DataFrame,
+                     timesheets: Optional[pd.DataFrame] = None,
+                     tasks: Optional[pd.DataFrame] = None,
+                     blockers: Optional[pd.DataFrame] = None,
+                     expenses: Optional[pd.DataFrame] = None,
+                     purchase_orders: Optional[pd.DataFrame] = None,
+                     vendor_bills: Optional[pd.DataFrame] = None,
+                     invoices: Optional[pd.DataFrame] = None,
+                     user_rates: Optional[pd.DataFrame] = None,
+                     as_of=None) -> pd.DataFrame:
+    """
+    Compute the model features for every project.
+
+    Args:
+        projects: One row per project: project_id, start_date, end_date, budget_amount,
+                  progress_pct; optional snapshot_date (default: as_of capped at end_date)
+                  and actual_cost (default: timesheet + expense + vendor bill cost)
+        timesheets: project_id, worked_on, hours and cost (or cost_rate)
+        tasks: project_id, created_at, due_date, state
+        blockers: project_id, resolved_at (one row per blocker on the project's tasks)
+        expenses: project_id, amount (only the statuses that count as cost)
+        purchase_orders: project_id, status, grand_total
+        vendor_bills: project_id, grand_total (only the statuses that count as cost)
+        invoices: project_id, invoice_date, paid_at
+        user_rates: project_id, bill_rate (current rates of the project's team)
+        as_of: Snapshot date for projects without snapshot_date (default: today)
+
+    Returns:
+        DataFrame indexed by project_id with FEATURE_NAMES columns
+    """
+    groups = _Grouper(pd.Index(projects['project_id']))
+    n = groups.n
+    if n == 0:
+        return pd.DataFrame(columns=FEATURE_NAMES, index=groups.project_ids, dtype=float)
+
+    start = _days(projects['start_date'])
+    end = _days(projects['end_date'])
+    if 'snapshot_date' in projects.columns:
+        snapshot = _days(projects['snapshot_date'])
+    else:
+        today = np.datetime64(pd.Timestamp(as_of or datetime.now().date()).normalize(), 'ns')
+        snapshot = np.where(np.isnat(end) | (end > today), today, end)
+    budget = np.nan_to_num(_numbers(projects['budget_amount']))
+    progress = np.nan_to_num(_numbers(projects['progress_pct']))
+
+    # Schedule
+    days_elapsed = np.where(np.isnat(start), 0, (snapshot - start) / DAY)
+    total_days = np.where(np.isnat(start) | np.isnat(end), 1, (end - start) / DAY)
+    days_elapsed_pct = _ratio(days_elapsed, total_days, total_days > 0) * 100
+
+    # Actual cost (AC)
+    ts_codes = groups.codes(timesheets)
+    if _has(timesheets, 'cost'):
+        ac_timesheets = groups.total(ts_codes, _numbers(timesheets['cost']))
+    elif _has(timesheets, 'hours', 'cost_rate'):
+        ac_timesheets = groups.total(ts_codes, _numbers(timesheets['hours'])
+                                     * np.nan_to_num(_numbers(timesheets['cost_rate'])))
+    else:
+        ac_timesheets = np.zeros(n)
+    ac_expenses = (groups.total(groups.codes(expenses), _numbers(expenses['amount']))
+                   if _has(expenses, 'amount') else np.zeros(n))
+    bills_linked = (groups.total(groups.codes(vendor_bills), _numbers(vendor_bills['grand_total']))
+                    if _has(vendor_bills, 'grand_total') else np.zeros(n))
+    actual_cost = ac_timesheets + ac_expenses + bills_linked
+    if 'actual_cost' in projects.columns:
+        given = _numbers(projects['actual_cost'])
+        actual_cost = np.where(np.isnan(given), actual_cost, given)
+
+    # Earned value management
+    ev = (progress / 100) * budget
+    pv = _ratio(days_elapsed, total_days, total_days > 0) * budget
+    cpi = np.ones(n)
+    np.divide(ev, actual_cost, out=cpi, where=actual_cost > 0)
+    spi = np.ones(n)
+    np.divide(ev, pv, out=spi, where=pv > 0)
+    eac = budget.copy()
+    np.divide(budget - ev, cpi, out=eac, where=cpi > 0)
+    eac = np.where(cpi > 0, actual_cost + eac, budget)
+    vac_pct = _ratio(budget - eac, budget, budget > 0) * 100
+    burn_rate = _ratio(actual_cost, days_elapsed, days_elapsed > 0)
+
+    # Tasks and blockers
+    task_codes = groups.codes(tasks)
+    task_count = groups.count(task_codes)
+    if _has(tasks, 'due_date', 'state'):
+        row_snapshot = snapshot[np.maximum(task_codes, 0)]
+        overdue = (_days(tasks['due_date']) < row_snapshot) & (tasks['state'].to_numpy() != 'done')
+        overdue_pct = _ratio(groups.count(task_codes, overdue), task_count, task_count > 0) * 100
+    else:
+        overdue_pct = np.zeros(n)
+    if _has(tasks, 'created_at'):
+        added_after_start = _days(tasks['created_at']) > start[np.maximum(task_codes, 0)]
+        scope_creep_proxy = _ratio(groups.count(task_codes, added_after_start), task_count,
+                                   (task_count > 0) & ~np.isnat(start))
+    else:
+        scope_creep_proxy = np.zeros(n)
+
+    if _has(blockers, 'resolved_at'):
+        blocker_codes = groups.codes(blockers)
+        active = groups.count(blocker_codes, blockers['resolved_at'].isna().to_numpy())
+        blocker_density = _ratio(active, task_count, (task_count > 0) & (groups.count(blocker_codes) > 0))
+    else:
+        blocker_density = np.zeros(n)
+
+    # Finance gaps (PO committed but not billed)
+    if _has(purchase_orders, 'status', 'grand_total'):
+        po_committed = groups.total(groups.codes(purchase_orders), _numbers(purchase_orders['grand_total']),
+                                    purchase_orders['status'].to_numpy() == 'confirmed')
+    else:
+        po_committed = np.zeros(n)
+    finance_gaps = np.maximum(0, po_committed - bills_linked)
+
+    # Invoice lag days (paid invoices)
+    if _has(invoices, 'invoice_date', 'paid_at'):
+        invoice_codes = groups.codes(invoices)
+        lag = (_timestamps(invoices['paid_at']) - _timestamps(invoices['invoice_date'])).dt.days.to_numpy(dtype=float)
+        paid = ~np.isnan(lag)
+        invoice_lag_days = _ratio(groups.total(invoice_codes, lag, paid), groups.count(invoice_codes, paid),
+                                  groups.count(invoice_codes, paid) > 0)
+    else:
+        invoice_lag_days = np.zeros(n)
+
+    # Timesheet activity: stddev of hours/day over the last 14 days, days worked in the last 7
+    timesheet_volatility = np.zeros(n)
+    people_active_7d = np.zeros(n, dtype=int)
+    if _has(timesheets, 'worked_on', 'hours'):
+        worked_on = _days(timesheets['worked_on'])
+        row_snapshot = snapshot[np.maximum(ts_codes, 0)]
+        recent = (ts_codes >= 0) & (worked_on >= row_snapshot - 14 * DAY)
+        if recent.any():
+            daily = pd.DataFrame({
+                'project': ts_codes[recent],
+                'day': worked_on[recent],
+                'hours': _numbers(timesheets['hours'])[recent],
+            }).groupby(['project', 'day'], sort=False)['hours'].sum().reset_index()
+            by_project = daily.groupby('project')['hours']
+            volatility = by_project.std(ddof=1)
+            days_worked = by_project.size()
+            multi = days_worked[days_worked > 1].index
+            timesheet_volatility[multi] = volatility[multi].to_numpy()
+
+            last_week = daily['day'].to_numpy() >= snapshot[daily['project'].to_numpy()] - 7 * DAY
+            people_active_7d = np.bincount(daily['project'].to_numpy()[last_week], minlength=n)
+
+    # Team mix
+    if _has(user_rates, 'bill_rate'):
+        rate_codes = groups.codes(user_rates)
+        rates = _numbers(user_rates['bill_rate'])
+        rated = ~np.isnan(rates)
+        rate_count = groups.count(rate_codes, rated)
+        avg_team_rate = _ratio(groups.total(rate_codes, rates), rate_count, rate_count > 0)
+    else:
+        avg_team_rate = np.zeros(n)
+
+    return pd.DataFrame({
+        'cpi': cpi,
+        'spi': spi,
+        'vac_pct': vac_pct,
+        'burn_rate_ratio': burn_rate,
+        'overdue_pct': overdue_pct,
+        'blocker_density': blocker_density,
+        'progress_pct': progress,
+        'days_elapsed_pct': days_elapsed_pct,
+        'scope_creep_proxy': scope_creep_proxy,
+        'finance_gaps': finance_gaps,
+        'invoice_lag_days': invoice_lag_days,
+        'timesheet_volatility': timesheet_volatility,
+        'avg_team_rate': avg_team_rate,
+        'people_active_7d': people_active_7d,
+    }, index=groups.project_ids)[FEATURE_NAMES]
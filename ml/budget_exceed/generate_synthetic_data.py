@@ -2,7 +2,8 @@
 Synthetic Dataset Generator for Project Overrun Prediction Model
 
 This script generates realistic synthetic project data based on the PostgreSQL schema
-and calculates all features needed for the overrun prediction model.
+and calculates all features needed for the overrun prediction model (with the same
+feature engine live scoring uses, see feature_engine.py).
 """
 
 import numpy as np
@@ -13,12 +14,19 @@ from typing import Dict, List, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from feature_engine import FEATURE_NAMES, compute_features
+
+# Source tables generated per project, in compute_features() argument order
+TABLES = ['timesheets', 'tasks', 'blockers', 'expenses', 'purchase_orders',
+          'vendor_bills', 'invoices', 'user_rates']
+
 
 class SyntheticProjectGenerator:
     """Generate synthetic project data with realistic patterns"""
     
-    def __init__(self, n_projects: int = 300, random_seed: int = 42):
+    def __init__(self, n_projects: int = 300, random_seed: int = 42, batch_size: int = 1000):
         self.n_projects = n_projects
+        self.batch_size = batch_size
         np.random.seed(random_seed)
         random.seed(random_seed)
         
@@ -27,21 +35,37 @@ class SyntheticProjectGenerator:
         
         print(f"Generating {self.n_projects} synthetic projects...")
         
-        projects_data = []
+        batches = []
+        projects, tables, noise = [], {name: [] for name in TABLES}, []
         
         for i in range(self.n_projects):
             if (i + 1) % 50 == 0:
                 print(f"  Generated {i + 1}/{self.n_projects} projects...")
             
-            project = self._generate_single_project(i)
-            projects_data.append(project)
+            project, project_tables, project_noise = self._generate_single_project(i)
+            projects.append(project)
+            for name in TABLES:
+                if len(project_tables[name]) > 0:
+                    tables[name].append(project_tables[name].assign(project_id=i))
+            noise.append(project_noise)
+            
+            # Features are computed for a batch of projects at once
+            if len(projects) == self.batch_size or i == self.n_projects - 1:
+                batches.append(self._calculate_features(projects, tables, noise))
+                projects, tables, noise = [], {name: [] for name in TABLES}, []
         
-        df = pd.DataFrame(projects_data)
+        df = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
         print(f"✓ Generated {len(df)} projects")
         return df
     
-    def _generate_single_project(self, project_id: int) -> Dict:
-        """Generate a single project with all its data"""
+    def _generate_single_project(self, project_id: int) -> Tuple[Dict, Dict[str, pd.DataFrame], np.ndarray]:
+        """
+        Generate a single project with all its data.
+        
+        Returns:
+            Project row (without features), its source tables by name, and the
+            feature noise draws (applied in _calculate_features)
+        """
         
         # Determine if this is an outlier project (5% chance)
         is_outlier = np.random.random() < 0.05
@@ -131,23 +155,10 @@ class SyntheticProjectGenerator:
         # Calculate progress percentage (realistic, may not match actual completion)
         progress_pct = min(100, np.random.beta(2, 1) * 100) if actual_end_date <= datetime.now() else min(100, np.random.beta(1.5, 2) * 100)
         
-        # Calculate features
-        features = self._calculate_features(
-            start_date=start_date,
-            end_date=end_date,
-            actual_end_date=actual_end_date,
-            budget_amount=budget_amount,
-            actual_cost=actual_cost,
-            progress_pct=progress_pct,
-            timesheets=timesheets,
-            tasks=tasks,
-            blockers=blockers,
-            expenses=expenses,
-            purchase_orders=purchase_orders,
-            vendor_bills=vendor_bills,
-            invoices=invoices,
-            user_rates=user_rates
-        )
+        # Feature noise (simulating measurement/estimation errors), drawn here so the
+        # random stream does not depend on batching: 5% relative noise per feature,
+        # +/-0.5 people on people_active_7d
+        noise = np.append(np.random.normal(0, 0.05, len(FEATURE_NAMES) - 1), np.random.normal(0, 0.5))
         
         # Label: 1 if AC > BAC, else 0
         # Add some realistic uncertainty - not all overruns are perfectly predictable
@@ -170,7 +181,7 @@ class SyntheticProjectGenerator:
                 # Slightly under budget - 25% chance of overrun (scope creep, hidden costs)
                 label = 1 if np.random.random() < 0.25 else 0
         
-        return {
+        project = {
             'project_id': project_id,
             'label': label,
             'budget_amount': budget_amount,
@@ -178,9 +189,19 @@ class SyntheticProjectGenerator:
             'start_date': start_date,
             'end_date': end_date,
             'actual_end_date': actual_end_date,
-            'progress_pct': progress_pct,
-            **features
+            'progress_pct': progress_pct
         }
+        tables = {
+            'timesheets': timesheets,
+            'tasks': tasks,
+            'blockers': blockers,
+            'expenses': expenses,
+            'purchase_orders': purchase_orders,
+            'vendor_bills': vendor_bills,
+            'invoices': invoices,
+            'user_rates': user_rates
+        }
+        return project, tables, noise
     
     def _generate_timesheets(self, start_date: datetime, end_date: datetime, budget_amount: float, 
                            project_type: str, is_outlier: bool) -> pd.DataFrame:
@@ -600,132 +621,44 @@ class SyntheticProjectGenerator:
         
         return pd.DataFrame(rates)
     
-    def _calculate_features(self, start_date: datetime, end_date: datetime, actual_end_date: datetime,
-                           budget_amount: float, actual_cost: float, progress_pct: float,
-                           timesheets: pd.DataFrame, tasks: pd.DataFrame, blockers: pd.DataFrame,
-                           expenses: pd.DataFrame, purchase_orders: pd.DataFrame,
-                           vendor_bills: pd.DataFrame, invoices: pd.DataFrame,
-                           user_rates: pd.DataFrame) -> Dict:
-        """Calculate all features for the model"""
-        
-        # Current date (snapshot time)
-        snapshot_date = min(actual_end_date, datetime.now())
-        
-        # Days elapsed
-        days_elapsed = (snapshot_date - start_date).days
-        total_days = (end_date - start_date).days
-        days_elapsed_pct = (days_elapsed / total_days * 100) if total_days > 0 else 0
-        
-        # Earned Value (EV) - simplified
-        ev = (progress_pct / 100) * budget_amount
-        
-        # Planned Value (PV) - simplified
-        pv = (days_elapsed / total_days * budget_amount) if total_days > 0 else 0
+    def _calculate_features(self, projects: List[Dict], tables: Dict[str, List[pd.DataFrame]],
+                            noise: List[np.ndarray]) -> pd.DataFrame:
+        """Calculate all features for the model for a batch of projects"""
         
-        # CPI (Cost Performance Index)
-        cpi = ev / actual_cost if actual_cost > 0 else 1.0
-        
-        # SPI (Schedule Performance Index)
-        spi = ev / pv if pv > 0 else 1.0
-        
-        # EAC (Estimate at Completion)
-        if cpi > 0:
-            eac = actual_cost + (budget_amount - ev) / cpi
-        else:
-            eac = budget_amount
-        
-        # VAC% (Variance at Completion %)
-        vac_pct = ((budget_amount - eac) / budget_amount * 100) if budget_amount > 0 else 0
-        
-        # Burn-rate ratio
-        burn_rate = actual_cost / days_elapsed if days_elapsed > 0 else 0
-        
-        # Overdue% (tasks overdue)
-        if len(tasks) > 0 and 'due_date' in tasks.columns and 'state' in tasks.columns:
-            overdue_tasks = tasks[(tasks['due_date'] < snapshot_date) & (tasks['state'] != 'done')]
-            overdue_pct = len(overdue_tasks) / len(tasks) * 100
-        else:
-            overdue_pct = 0
-        
-        # Blocker density
-        if len(tasks) > 0 and len(blockers) > 0 and 'resolved_at' in blockers.columns:
-            active_blockers = blockers[blockers['resolved_at'].isna()]
-            blocker_density = len(active_blockers) / len(tasks)
-        else:
-            blocker_density = 0
+        df = pd.DataFrame(projects)
         
-        # Scope creep proxy
-        if len(tasks) > 0 and 'created_at' in tasks.columns:
-            tasks_after_start = tasks[tasks['created_at'] > start_date]
-            scope_creep_proxy = len(tasks_after_start) / len(tasks)
-        else:
-            scope_creep_proxy = 0
-        
-        # Finance gaps (PO committed but no bill)
-        if len(purchase_orders) > 0 and 'status' in purchase_orders.columns and 'grand_total' in purchase_orders.columns:
-            po_committed = purchase_orders[purchase_orders['status'] == 'confirmed']['grand_total'].sum()
-        else:
-            po_committed = 0
-        bills_linked = vendor_bills['grand_total'].sum() if len(vendor_bills) > 0 and 'grand_total' in vendor_bills.columns else 0
-        finance_gaps = max(0, po_committed - bills_linked)
-        
-        # Invoice lag days
-        if len(invoices) > 0 and 'paid_at' in invoices.columns and 'invoice_date' in invoices.columns:
-            paid_invoices = invoices[invoices['paid_at'].notna()]
-            if len(paid_invoices) > 0:
-                invoice_lag_days = (paid_invoices['paid_at'] - paid_invoices['invoice_date']).dt.days.mean()
-            else:
-                invoice_lag_days = 0
-        else:
-            invoice_lag_days = 0
-        
-        # Timesheet volatility (stddev of hours/day last 14 days)
-        if len(timesheets) > 0 and 'worked_on' in timesheets.columns and 'hours' in timesheets.columns:
-            last_14_days = snapshot_date - timedelta(days=14)
-            recent_timesheets = timesheets[timesheets['worked_on'] >= last_14_days]
-            
-            if len(recent_timesheets) > 0:
-                daily_hours = recent_timesheets.groupby('worked_on')['hours'].sum()
-                timesheet_volatility = daily_hours.std() if len(daily_hours) > 1 else 0
-            else:
-                timesheet_volatility = 0
-        else:
-            timesheet_volatility = 0
-        
-        # Team mix
-        if len(user_rates) > 0 and 'bill_rate' in user_rates.columns:
-            avg_rate = user_rates['bill_rate'].mean()
-        else:
-            avg_rate = 0
-        
-        # # people active last 7 days
-        if len(timesheets) > 0 and 'worked_on' in timesheets.columns:
-            last_7_days = snapshot_date - timedelta(days=7)
-            recent_timesheets = timesheets[timesheets['worked_on'] >= last_7_days]
-            people_active_7d = recent_timesheets['worked_on'].nunique() if len(recent_timesheets) > 0 else 0
-        else:
-            people_active_7d = 0
+        # Snapshot at the actual end date (or now for running projects), with the noisy actual cost
+        inputs = df[['project_id', 'start_date', 'end_date', 'budget_amount', 'progress_pct', 'actual_cost']].assign(
+            snapshot_date=df['actual_end_date'].where(df['actual_end_date'] < datetime.now(), datetime.now())
+        )
+        features = compute_features(inputs, *(
+            pd.concat(tables[name], ignore_index=True) if tables[name] else None for name in TABLES
+        ))
         
         # Add small realistic noise to features (simulating measurement/estimation errors)
         # This prevents perfect correlations and makes the model more realistic
-        noise_std = 0.05  # 5% standard deviation for noise
-        
-        return {
-            'cpi': max(0.1, cpi * (1 + np.random.normal(0, noise_std))),  # CPI can't be negative
-            'spi': max(0.1, spi * (1 + np.random.normal(0, noise_std))),  # SPI can't be negative
-            'vac_pct': vac_pct * (1 + np.random.normal(0, noise_std)),
-            'burn_rate_ratio': max(0, burn_rate * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'overdue_pct': max(0, min(100, overdue_pct * (1 + np.random.normal(0, noise_std)))),  # Clamp 0-100
-            'blocker_density': max(0, blocker_density * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'progress_pct': max(0, min(100, progress_pct * (1 + np.random.normal(0, noise_std)))),  # Clamp 0-100
-            'days_elapsed_pct': max(0, min(100, days_elapsed_pct * (1 + np.random.normal(0, noise_std)))),  # Clamp 0-100
-            'scope_creep_proxy': max(0, min(1, scope_creep_proxy * (1 + np.random.normal(0, noise_std)))),  # Clamp 0-1
-            'finance_gaps': max(0, finance_gaps * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'invoice_lag_days': max(0, invoice_lag_days * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'timesheet_volatility': max(0, timesheet_volatility * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'avg_team_rate': max(0, avg_rate * (1 + np.random.normal(0, noise_std))),  # Can't be negative
-            'people_active_7d': max(0, int(people_active_7d + np.random.normal(0, 0.5)))  # Round to integer, can't be negative
-        }
+        noise = np.vstack(noise)
+        noisy = features.to_numpy(dtype=float)[:, :-1] * (1 + noise[:, :-1])
+        noisy = pd.DataFrame(noisy, columns=FEATURE_NAMES[:-1])
+        
+        df = df.assign(
+            cpi=noisy['cpi'].clip(lower=0.1),  # CPI can't be negative
+            spi=noisy['spi'].clip(lower=0.1),  # SPI can't be negative
+            vac_pct=noisy['vac_pct'],
+            burn_rate_ratio=noisy['burn_rate_ratio'].clip(lower=0),  # Can't be negative
+            overdue_pct=noisy['overdue_pct'].clip(0, 100),  # Clamp 0-100
+            blocker_density=noisy['blocker_density'].clip(lower=0),  # Can't be negative
+            progress_pct=noisy['progress_pct'].clip(0, 100),  # Clamp 0-100
+            days_elapsed_pct=noisy['days_elapsed_pct'].clip(0, 100),  # Clamp 0-100
+            scope_creep_proxy=noisy['scope_creep_proxy'].clip(0, 1),  # Clamp 0-1
+            finance_gaps=noisy['finance_gaps'].clip(lower=0),  # Can't be negative
+            invoice_lag_days=noisy['invoice_lag_days'].clip(lower=0),  # Can't be negative
+            timesheet_volatility=noisy['timesheet_volatility'].clip(lower=0),  # Can't be negative
+            avg_team_rate=noisy['avg_team_rate'].clip(lower=0),  # Can't be negative
+            # Round toward zero to an integer, can't be negative
+            people_active_7d=np.maximum(0, np.trunc(features['people_active_7d'].to_numpy() + noise[:, -1])).astype(int)
+        )
+        return df
 
 
 def main():
@@ -8,12 +8,15 @@ Outputs predictions to JSON file.
 
 import pandas as pd
 import numpy as np
+import os
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import joblib
 from typing import Dict, List
 import sys
 
+from feature_engine import FEATURE_NAMES, compute_features
+
 # Try to import psycopg2 for database connection
 try:
     import psycopg2
@@ -30,147 +33,49 @@ def calculate_features_from_db(project_data: Dict, timesheets: pd.DataFrame,
                                expenses: pd.DataFrame, purchase_orders: pd.DataFrame,
                                vendor_bills: pd.DataFrame, invoices: pd.DataFrame,
                                user_rates: pd.DataFrame) -> Dict:
-    """Calculate features from database data (same logic as training)"""
-    from decimal import Decimal
-    
-    # Helper to convert Decimal to float
-    def to_float(val):
-        if val is None:
-            return 0.0
-        if isinstance(val, Decimal):
-            return float(val)
-        return float(val)
-    
-    start_date = project_data['start_date']
-    end_date = project_data['end_date']
-    budget_amount = to_float(project_data['budget_amount'])
-    progress_pct = to_float(project_data['progress_pct'])
-    
-    # Current date (snapshot time)
-    snapshot_date = min(datetime.now().date(), end_date) if end_date else datetime.now().date()
-    
-    # Days elapsed
-    days_elapsed = (snapshot_date - start_date).days if start_date else 0
-    total_days = (end_date - start_date).days if (start_date and end_date) else 1
-    days_elapsed_pct = (days_elapsed / total_days * 100) if total_days > 0 else 0
-    
-    # Calculate actual cost (AC)
-    ac_timesheets = to_float(timesheets['cost'].sum()) if len(timesheets) > 0 and 'cost' in timesheets.columns else 0.0
-    ac_expenses = to_float(expenses['amount'].sum()) if len(expenses) > 0 and 'amount' in expenses.columns else 0.0
-    ac_vendor_bills = to_float(vendor_bills['grand_total'].sum()) if len(vendor_bills) > 0 and 'grand_total' in vendor_bills.columns else 0.0
-    actual_cost = ac_timesheets + ac_expenses + ac_vendor_bills
-    
-    # Earned Value (EV)
-    ev = (progress_pct / 100) * budget_amount
-    
-    # Planned Value (PV)
-    pv = (days_elapsed / total_days * budget_amount) if total_days > 0 else 0
-    
-    # CPI (Cost Performance Index)
-    cpi = ev / actual_cost if actual_cost > 0 else 1.0
-    
-    # SPI (Schedule Performance Index)
-    spi = ev / pv if pv > 0 else 1.0
-    
-    # EAC (Estimate at Completion)
-    if cpi > 0:
-        eac = actual_cost + (budget_amount - ev) / cpi
-    else:
-        eac = budget_amount
-    
-    # VAC% (Variance at Completion %)
-    vac_pct = ((budget_amount - eac) / budget_amount * 100) if budget_amount > 0 else 0
-    
-    # Burn-rate ratio
-    burn_rate = actual_cost / days_elapsed if days_elapsed > 0 else 0
-    
-    # Overdue% (tasks overdue)
-    if len(tasks) > 0 and 'due_date' in tasks.columns and 'state' in tasks.columns:
-        overdue_tasks = tasks[(tasks['due_date'] < snapshot_date) & (tasks['state'] != 'done')]
-        overdue_pct = len(overdue_tasks) / len(tasks) * 100
-    else:
-        overdue_pct = 0
-    
-    # Blocker density
-    if len(tasks) > 0 and len(blockers) > 0 and 'resolved_at' in blockers.columns:
-        active_blockers = blockers[blockers['resolved_at'].isna()]
-        blocker_density = len(active_blockers) / len(tasks)
-    else:
-        blocker_density = 0
-    
-    # Scope creep proxy
-    if len(tasks) > 0 and 'created_at' in tasks.columns and start_date:
-        tasks_after_start = tasks[pd.to_datetime(tasks['created_at']).dt.date > start_date]
-        scope_creep_proxy = len(tasks_after_start) / len(tasks)
-    else:
-        scope_creep_proxy = 0
-    
-    # Finance gaps (PO committed but no bill)
-    if len(purchase_orders) > 0 and 'status' in purchase_orders.columns and 'grand_total' in purchase_orders.columns:
-        po_committed = to_float(purchase_orders[purchase_orders['status'] == 'confirmed']['grand_total'].sum())
-    else:
-        po_committed = 0.0
-    bills_linked = to_float(vendor_bills['grand_total'].sum()) if len(vendor_bills) > 0 and 'grand_total' in vendor_bills.columns else 0.0
-    finance_gaps = max(0, po_committed - bills_linked)
-    
-    # Invoice lag days
-    if len(invoices) > 0 and 'paid_at' in invoices.columns and 'invoice_date' in invoices.columns:
-        paid_invoices = invoices[invoices['paid_at'].notna()]
-        if len(paid_invoices) > 0:
-            paid_at = pd.to_datetime(paid_invoices['paid_at']).dt.tz_localize(None) if pd.to_datetime(paid_invoices['paid_at']).dt.tz is not None else pd.to_datetime(paid_invoices['paid_at'])
-            invoice_date = pd.to_datetime(paid_invoices['invoice_date']).dt.tz_localize(None) if pd.to_datetime(paid_invoices['invoice_date']).dt.tz is not None else pd.to_datetime(paid_invoices['invoice_date'])
-            invoice_lag_days = (paid_at - invoice_date).dt.days.mean()
-        else:
-            invoice_lag_days = 0
-    else:
-        invoice_lag_days = 0
-    
-    # Timesheet volatility (stddev of hours/day last 14 days)
-    if len(timesheets) > 0 and 'worked_on' in timesheets.columns and 'hours' in timesheets.columns:
-        last_14_days = snapshot_date - timedelta(days=14)
-        recent_timesheets = timesheets[pd.to_datetime(timesheets['worked_on']).dt.date >= last_14_days]
-        if len(recent_timesheets) > 0:
-            daily_hours = recent_timesheets.groupby('worked_on')['hours'].sum()
-            timesheet_volatility = daily_hours.std() if len(daily_hours) > 1 else 0
-        else:
-            timesheet_volatility = 0
-    else:
-        timesheet_volatility = 0
-    
-    # Team mix
-    if len(user_rates) > 0 and 'bill_rate' in user_rates.columns:
-        avg_rate = to_float(user_rates['bill_rate'].mean())
-    else:
-        avg_rate = 0.0
-    
-    # # people active last 7 days
-    if len(timesheets) > 0 and 'worked_on' in timesheets.columns:
-        last_7_days = snapshot_date - timedelta(days=7)
-        recent_timesheets = timesheets[pd.to_datetime(timesheets['worked_on']).dt.date >= last_7_days]
-        people_active_7d = recent_timesheets['worked_on'].nunique() if len(recent_timesheets) > 0 else 0
-    else:
-        people_active_7d = 0
-    
-    return {
-        'cpi': cpi,
-        'spi': spi,
-        'vac_pct': vac_pct,
-        'burn_rate_ratio': burn_rate,
-        'overdue_pct': overdue_pct,
-        'blocker_density': blocker_density,
-        'progress_pct': progress_pct,
-        'days_elapsed_pct': days_elapsed_pct,
-        'scope_creep_proxy': scope_creep_proxy,
-        'finance_gaps': finance_gaps,
-        'invoice_lag_days': invoice_lag_days,
-        'timesheet_volatility': timesheet_volatility,
-        'avg_team_rate': avg_rate,
-        'people_active_7d': people_active_7d
-    }
+    """Calculate features for one project's data (same engine as training, see feature_engine.py)"""
+    
+    def with_project(frame: pd.DataFrame) -> pd.DataFrame:
+        return frame.assign(project_id='project') if len(frame) > 0 else None
+    
+    projects = pd.DataFrame([{
+        'project_id': 'project',
+        'start_date': project_data['start_date'],
+        'end_date': project_data['end_date'],
+        'budget_amount': project_data['budget_amount'],
+        'progress_pct': project_data['progress_pct']
+    }])
+    features = compute_features(
+        projects, with_project(timesheets), with_project(tasks), with_project(blockers),
+        with_project(expenses), with_project(purchase_orders), with_project(vendor_bills),
+        with_project(invoices), with_project(user_rates)
+    )
+    return _feature_dicts(features)[0]
+
+
+def _feature_dicts(features: pd.DataFrame) -> List[Dict]:
+    """Rows of compute_features() output as plain-Python feature dicts"""
+    columns = {name: features[name].tolist() for name in FEATURE_NAMES}
+    return [{name: columns[name][i] for name in FEATURE_NAMES} for i in range(len(features))]
+
+
+def _fetch_frame(cursor, query: str, params: tuple = ()) -> pd.DataFrame:
+    """Run a query and return all rows as a DataFrame (columns kept when empty)"""
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    frame = pd.DataFrame.from_records(rows, columns=[col[0] for col in cursor.description])
+    if 'project_id' in frame.columns:
+        frame['project_id'] = frame['project_id'].astype(str)
+    return frame
 
 
 def fetch_project_data_from_db(connection, project_ids: List[str] = None) -> List[Dict]:
-    """Fetch project data from PostgreSQL database"""
+    """
+    Fetch project data from PostgreSQL database.
+    
+    Each source table is read once for the whole project set (project_id = ANY(...))
+    and features are computed for all projects in one pass (feature_engine.py).
+    """
     
     if not DB_AVAILABLE:
         raise ImportError("psycopg2 not available. Cannot connect to database.")
@@ -179,8 +84,10 @@ def fetch_project_data_from_db(connection, project_ids: List[str] = None) -> Lis
     
     # Build project filter
     project_filter = ""
+    params = ()
     if project_ids:
-        project_filter = f"AND p.id IN ({','.join([f"'{pid}'" for pid in project_ids])})"
+        project_filter = "AND p.id = ANY(%s::uuid[])"
+        params = ([str(pid) for pid in project_ids],)
     
     # Fetch projects
     query = f"""
@@ -193,153 +100,241 @@ def fetch_project_data_from_db(connection, project_ids: List[str] = None) -> Lis
         {project_filter}
         ORDER BY p.created_at DESC
     """
-    cursor.execute(query)
+    cursor.execute(query, params)
     projects = cursor.fetchall()
+    if not projects:
+        cursor.close()
+        return []
+    
+    ids = ([str(project['id']) for project in projects],)
+    
+    # Fetch related data for all projects at once
+    # Timesheets
+    timesheets_all = _fetch_frame(cursor, """
+        SELECT project_id, user_id, worked_on, hours, cost_rate
+        FROM project.timesheets
+        WHERE project_id = ANY(%s::uuid[])
+    """, ids)
+    
+    # Tasks
+    tasks_all = _fetch_frame(cursor, """
+        SELECT project_id, created_at, due_date, state
+        FROM project.tasks
+        WHERE project_id = ANY(%s::uuid[])
+    """, ids)
+    
+    # Blockers
+    blockers_all = _fetch_frame(cursor, """
+        SELECT t.project_id, b.resolved_at
+        FROM project.task_blockers b
+        JOIN project.tasks t ON t.id = b.task_id
+        WHERE t.project_id = ANY(%s::uuid[])
+    """, ids)
+    
+    # Expenses
+    expenses_all = _fetch_frame(cursor, """
+        SELECT project_id, amount, status
+        FROM finance.expenses
+        WHERE project_id = ANY(%s::uuid[]) AND status IN ('approved', 'reimbursed', 'paid')
+    """, ids)
+    
+    # Purchase Orders
+    purchase_orders_all = _fetch_frame(cursor, """
+        SELECT project_id, status, grand_total
+        FROM finance.purchase_orders
+        WHERE project_id = ANY(%s::uuid[])
+    """, ids)
+    
+    # Vendor Bills
+    vendor_bills_all = _fetch_frame(cursor, """
+        SELECT project_id, grand_total, status
+        FROM finance.vendor_bills
+        WHERE project_id = ANY(%s::uuid[]) AND status IN ('posted', 'partially_paid', 'paid')
+    """, ids)
+    
+    # Invoices
+    invoices_all = _fetch_frame(cursor, """
+        SELECT project_id, invoice_date, paid_at
+        FROM finance.customer_invoices
+        WHERE project_id = ANY(%s::uuid[]) AND paid_at IS NOT NULL
+    """, ids)
+    
+    # User Rates: current rates of everyone with timesheets on the projects,
+    # joined to their projects in memory
+    user_ids = timesheets_all['user_id'].dropna().astype(str).unique().tolist() if len(timesheets_all) > 0 else []
+    rates = _fetch_frame(cursor, """
+        SELECT user_id, bill_rate
+        FROM project.user_rates
+        WHERE user_id = ANY(%s::uuid[])
+        AND valid_from <= CURRENT_DATE
+        AND (valid_to IS NULL OR valid_to >= CURRENT_DATE)
+    """, (user_ids,))
+    if len(timesheets_all) > 0 and len(rates) > 0:
+        project_users = timesheets_all[['project_id', 'user_id']].dropna().astype(str).drop_duplicates()
+        rates['user_id'] = rates['user_id'].astype(str)
+        user_rates_all = project_users.merge(rates, on='user_id')[['project_id', 'bill_rate']]
+    else:
+        user_rates_all = pd.DataFrame(columns=['project_id', 'bill_rate'])
     
-    results = []
-    for project in projects:
-        project_id = str(project['id'])
-        
-        # Fetch related data
-        # Timesheets
-        cursor.execute("""
-            SELECT worked_on, hours, cost_rate
-            FROM project.timesheets
-            WHERE project_id = %s
-        """, (project_id,))
-        timesheets_df = cursor.fetchall()
-        timesheets = pd.DataFrame(timesheets_df)
-        if len(timesheets) > 0:
-            timesheets['cost'] = timesheets['hours'] * timesheets['cost_rate'].fillna(0)
-        else:
-            timesheets = pd.DataFrame(columns=['worked_on', 'hours', 'cost_rate', 'cost'])
-        
-        # Tasks
-        cursor.execute("""
-            SELECT created_at, due_date, state
-            FROM project.tasks
-            WHERE project_id = %s
-        """, (project_id,))
-        tasks = pd.DataFrame(cursor.fetchall())
-        
-        # Blockers
-        cursor.execute("""
-            SELECT resolved_at
-            FROM project.task_blockers
-            WHERE task_id IN (SELECT id FROM project.tasks WHERE project_id = %s)
-        """, (project_id,))
-        blockers = pd.DataFrame(cursor.fetchall())
-        
-        # Expenses
-        cursor.execute("""
-            SELECT amount, status
-            FROM finance.expenses
-            WHERE project_id = %s AND status IN ('approved', 'reimbursed', 'paid')
-        """, (project_id,))
-        expenses = pd.DataFrame(cursor.fetchall())
-        
-        # Purchase Orders
-        cursor.execute("""
-            SELECT status, grand_total
-            FROM finance.purchase_orders
-            WHERE project_id = %s
-        """, (project_id,))
-        purchase_orders = pd.DataFrame(cursor.fetchall())
-        
-        # Vendor Bills
-        cursor.execute("""
-            SELECT grand_total, status
-            FROM finance.vendor_bills
-            WHERE project_id = %s AND status IN ('posted', 'partially_paid', 'paid')
-        """, (project_id,))
-        vendor_bills = pd.DataFrame(cursor.fetchall())
-        
-        # Invoices
-        cursor.execute("""
-            SELECT invoice_date, paid_at
-            FROM finance.customer_invoices
-            WHERE project_id = %s AND paid_at IS NOT NULL
-        """, (project_id,))
-        invoices = pd.DataFrame(cursor.fetchall())
-        
-        # User Rates
-        cursor.execute("""
-            SELECT bill_rate
-            FROM project.user_rates
-            WHERE user_id IN (
-                SELECT DISTINCT user_id FROM project.timesheets WHERE project_id = %s
-            )
-            AND valid_from <= CURRENT_DATE
-            AND (valid_to IS NULL OR valid_to >= CURRENT_DATE)
-        """, (project_id,))
-        user_rates = pd.DataFrame(cursor.fetchall())
-        
-        # Calculate features
-        features = calculate_features_from_db(
-            project, timesheets, tasks, blockers, expenses,
-            purchase_orders, vendor_bills, invoices, user_rates
-        )
-        
-        results.append({
-            'project_id': project_id,
-            'project_name': project['name'],
-            'project_code': project['code'],
-            'budget_amount': float(project['budget_amount']),
-            'features': features
-        })
+    cursor.close()
     
+    projects_frame = pd.DataFrame({
+        'project_id': ids[0],
+        'start_date': [project['start_date'] for project in projects],
+        'end_date': [project['end_date'] for project in projects],
+        'budget_amount': [project['budget_amount'] for project in projects],
+        'progress_pct': [project['progress_pct'] for project in projects]
+    })
+    features = compute_features(
+        projects_frame, timesheets_all, tasks_all, blockers_all, expenses_all,
+        purchase_orders_all, vendor_bills_all, invoices_all, user_rates_all
+    )
+    
+    return [{
+        'project_id': str(project['id']),
+        'project_name': project['name'],
+        'project_code': project['code'],
+        'budget_amount': float(project['budget_amount']),
+        'features': project_features
+    } for project, project_features in zip(projects, _feature_dicts(features))]
+
+
+def fetch_project_features_from_view(connection, project_ids: List[str] = None) -> List[Dict]:
+    """
+    Fetch precomputed features from the ml.project_features view
+    (project_features_view.sql) in a single query.
+    
+    Returns the same structure as fetch_project_data_from_db.
+    """
+    
+    if not DB_AVAILABLE:
+        raise ImportError("psycopg2 not available. Cannot connect to database.")
+    
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    
+    project_filter = ""
+    params = ()
+    if project_ids:
+        project_filter = "AND project_id = ANY(%s::uuid[])"
+        params = ([str(pid) for pid in project_ids],)
+    
+    cursor.execute(f"""
+        SELECT project_id, project_name, project_code, budget_amount, {', '.join(FEATURE_NAMES)}
+        FROM ml.project_features
+        WHERE status IN ('in_progress', 'planned')
+        {project_filter}
+        ORDER BY created_at DESC
+    """, params)
+    rows = cursor.fetchall()
     cursor.close()
-    return results
+    
+    return [{
+        'project_id': str(row['project_id']),
+        'project_name': row['project_name'],
+        'project_code': row['project_code'],
+        'budget_amount': float(row['budget_amount']),
+        'features': {name: row[name] for name in FEATURE_NAMES}
+    } for row in rows]
 
 
-def predict_overrun(projects_data: List[Dict], model_path: str = 'project_overrun_model.pkl',
-                    scaler_path: str = 'feature_scaler.pkl',
-                    feature_cols_path: str = 'feature_columns.pkl') -> List[Dict]:
-    """Predict overrun for projects using trained model"""
+def load_feature_medians(scaler, feature_cols: List[str], medians_path: str = None) -> np.ndarray:
+    """
+    Training-set medians used to impute missing/infinite features, in feature_cols order.
     
-    # Load model and scaler
+    Read from feature_medians.pkl next to the scaler (saved by the training notebook);
+    falls back to the scaler's training means for models saved without it.
+    """
+    if medians_path and os.path.exists(medians_path):
+        medians = joblib.load(medians_path)
+        return np.array([medians[col] for col in feature_cols], dtype=float)
+    print(f"Warning: {medians_path} not found. Imputing with training means from the scaler.")
+    return np.asarray(scaler.mean_, dtype=float)
+
+
+def build_feature_matrix(projects_data: List[Dict], feature_cols: List[str],
+                         medians: np.ndarray) -> np.ndarray:
+    """Stack project features into one float matrix, imputing missing/infinite values"""
+    X = np.array([[project['features'].get(col) for col in feature_cols] for project in projects_data],
+                 dtype=float).reshape(len(projects_data), len(feature_cols))
+    missing = ~np.isfinite(X)
+    if missing.any():
+        X[missing] = np.broadcast_to(medians, X.shape)[missing]
+    return X
+
+
+def load_scoring_artifacts(model_path: str = 'project_overrun_model.pkl',
+                           scaler_path: str = 'feature_scaler.pkl',
+                           feature_cols_path: str = 'feature_columns.pkl',
+                           medians_path: str = None) -> Dict:
+    """Load the model, scaler, feature columns and imputation medians"""
+    if medians_path is None:
+        medians_path = os.path.join(os.path.dirname(scaler_path), 'feature_medians.pkl')
     model = joblib.load(model_path)
     scaler = joblib.load(scaler_path)
     feature_cols = joblib.load(feature_cols_path)
+    return {
+        'model': model,
+        'scaler': scaler,
+        'feature_cols': feature_cols,
+        'medians': load_feature_medians(scaler, feature_cols, medians_path)
+    }
+
+
+def score_projects(projects_data: List[Dict], artifacts: Dict, threshold: float = None) -> List[Dict]:
+    """
+    Score projects with loaded artifacts as one feature matrix (one transform, one predict_proba).
+    
+    Args:
+        projects_data: Project dicts with a 'features' mapping
+        artifacts: Output of load_scoring_artifacts()
+        threshold: Overrun probability above which a project is flagged
+                   (default: OVERRUN_THRESHOLD env, 0.5)
+    """
+    if threshold is None:
+        threshold = float(os.getenv('OVERRUN_THRESHOLD', '0.5'))
+    if not projects_data:
+        return []
+    
+    feature_cols = artifacts['feature_cols']
+    X = build_feature_matrix(projects_data, feature_cols, artifacts['medians'])
+    X_scaled = artifacts['scaler'].transform(pd.DataFrame(X, columns=feature_cols))
+    probabilities = artifacts['model'].predict_proba(X_scaled)[:, 1]  # Probability of overrun
+    predicted = probabilities > threshold
+    
+    return [{
+        'project_id': project['project_id'],
+        'project_name': project['project_name'],
+        'project_code': project['project_code'],
+        'budget_amount': project['budget_amount'],
+        'predicted_overrun': bool(flag),
+        'overrun_probability': float(probability),
+        'features': project['features']
+    } for project, flag, probability in zip(projects_data, predicted, probabilities)]
+
+
+def predict_overrun(projects_data: List[Dict], model_path: str = 'project_overrun_model.pkl',
+                    scaler_path: str = 'feature_scaler.pkl',
+                    feature_cols_path: str = 'feature_columns.pkl',
+                    medians_path: str = None, threshold: float = None) -> List[Dict]:
+    """
+    Predict overrun for projects using trained model.
     
-    predictions = []
+    All projects are scored as one batch; see score_projects(). For repeated
+    scoring, keep artifacts loaded (load_scoring_artifacts() or scoring_service.py).
     
-    for project in projects_data:
-        features = project['features']
-        
-        # Prepare feature vector
-        X = pd.DataFrame([features])
-        X = X[feature_cols]
-        
-        # Handle missing values
-        X = X.fillna(X.median())
-        X = X.replace([np.inf, -np.inf], np.nan)
-        X = X.fillna(X.median())
-        
-        # Scale features
-        X_scaled = scaler.transform(X)
-        
-        # Predict
-        prediction = model.predict(X_scaled)[0]
-        probability = model.predict_proba(X_scaled)[0][1]  # Probability of overrun
-        
-        predictions.append({
-            'project_id': project['project_id'],
-            'project_name': project['project_name'],
-            'project_code': project['project_code'],
-            'budget_amount': project['budget_amount'],
-            'predicted_overrun': bool(prediction),
-            'overrun_probability': float(probability),
-            'features': features
-        })
-    
-    return predictions
+    Args:
+        projects_data: Project dicts with a 'features' mapping
+        medians_path: Training medians for imputation (default: feature_medians.pkl next to the scaler)
+        threshold: Overrun probability above which a project is flagged
+                   (default: OVERRUN_THRESHOLD env, 0.5)
+    """
+    artifacts = load_scoring_artifacts(model_path, scaler_path, feature_cols_path, medians_path)
+    return score_projects(projects_data, artifacts, threshold)
 
 
 def main():
     """Main function"""
     
-    import os
     from dotenv import load_dotenv
     
     load_dotenv()
@@ -358,9 +353,12 @@ def main():
             password=os.getenv('DB_PASSWORD', '')
         )
         
-        # Fetch project data
+        # Fetch project data (features aggregated in SQL if the view is installed)
         print("Fetching project data from database...")
-        projects_data = fetch_project_data_from_db(conn)
+        if os.getenv('USE_FEATURE_VIEW', 'false').lower() == 'true':
+            projects_data = fetch_project_features_from_view(conn)
+        else:
+            projects_data = fetch_project_data_from_db(conn)
         conn.close()
         
     else:
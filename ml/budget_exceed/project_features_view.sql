@@ -0,0 +1,165 @@
+-- ============================================================
+-- ml.project_features: overrun-model features per project
+-- ============================================================
+-- One row per project with the 14 features the overrun model
+-- uses, aggregated in Postgres so the scorer reads one row per
+-- project instead of every timesheet, task and bill.
+--
+-- Same definitions as compute_features() in feature_engine.py
+-- (shared with training): snapshot date = today, capped at end_date;
+-- expenses approved/reimbursed/paid; vendor bills
+-- posted/partially_paid/paid; team rates valid today for users
+-- with timesheets on the project.
+--
+-- PREREQUISITES: database/oneflow-schema.sql
+-- USAGE: psql -f project_features_view.sql, then run
+--        predict_overrun.py with USE_FEATURE_VIEW=true
+-- ============================================================
+
+CREATE SCHEMA IF NOT EXISTS ml;
+
+CREATE OR REPLACE VIEW ml.project_features AS
+WITH base AS (
+  SELECT
+    p.id AS project_id,
+    p.name AS project_name,
+    p.code AS project_code,
+    p.status,
+    p.created_at,
+    COALESCE(p.budget_amount, 0)::float8 AS budget_amount,
+    COALESCE(p.progress_pct, 0)::float8 AS progress_pct,
+    p.start_date,
+    LEAST(CURRENT_DATE, p.end_date) AS snapshot_date,
+    COALESCE(LEAST(CURRENT_DATE, p.end_date) - p.start_date, 0) AS days_elapsed,
+    COALESCE(p.end_date - p.start_date, 1) AS total_days
+  FROM project.projects p
+),
+-- Actual cost components
+timesheet_cost AS (
+  SELECT project_id, SUM(hours * COALESCE(cost_rate, 0))::float8 AS cost
+  FROM project.timesheets
+  GROUP BY project_id
+),
+expense_cost AS (
+  SELECT project_id, SUM(amount)::float8 AS cost
+  FROM finance.expenses
+  WHERE status IN ('approved', 'reimbursed', 'paid')
+  GROUP BY project_id
+),
+billed AS (
+  SELECT project_id, SUM(grand_total)::float8 AS cost
+  FROM finance.vendor_bills
+  WHERE status IN ('posted', 'partially_paid', 'paid')
+  GROUP BY project_id
+),
+po_committed AS (
+  SELECT project_id, SUM(grand_total)::float8 AS committed
+  FROM finance.purchase_orders
+  WHERE status = 'confirmed'
+  GROUP BY project_id
+),
+-- Task health
+task_counts AS (
+  SELECT
+    t.project_id,
+    COUNT(*) AS tasks,
+    COUNT(*) FILTER (WHERE t.due_date < b.snapshot_date AND t.state <> 'done') AS overdue,
+    COUNT(*) FILTER (WHERE t.created_at::date > b.start_date) AS added_after_start
+  FROM project.tasks t
+  JOIN base b ON b.project_id = t.project_id
+  GROUP BY t.project_id
+),
+blocker_counts AS (
+  SELECT
+    t.project_id,
+    COUNT(*) AS blockers,
+    COUNT(*) FILTER (WHERE bl.resolved_at IS NULL) AS active
+  FROM project.task_blockers bl
+  JOIN project.tasks t ON t.id = bl.task_id
+  GROUP BY t.project_id
+),
+invoice_lag AS (
+  SELECT project_id, AVG(paid_at::date - invoice_date)::float8 AS lag_days
+  FROM finance.customer_invoices
+  WHERE paid_at IS NOT NULL
+  GROUP BY project_id
+),
+-- Recent activity: hours per day over the 14 days before the snapshot
+daily_hours AS (
+  SELECT t.project_id, t.worked_on, b.snapshot_date, SUM(t.hours)::float8 AS hours
+  FROM project.timesheets t
+  JOIN base b ON b.project_id = t.project_id
+  WHERE t.worked_on >= b.snapshot_date - 14
+  GROUP BY t.project_id, t.worked_on, b.snapshot_date
+),
+activity AS (
+  SELECT
+    project_id,
+    stddev_samp(hours) AS volatility,
+    -- Distinct days with timesheets in the last 7 days (as in the training data)
+    COUNT(*) FILTER (WHERE worked_on >= snapshot_date - 7) AS active_7d
+  FROM daily_hours
+  GROUP BY project_id
+),
+team_rates AS (
+  SELECT pu.project_id, AVG(r.bill_rate)::float8 AS avg_rate
+  FROM (SELECT DISTINCT project_id, user_id FROM project.timesheets) pu
+  JOIN project.user_rates r ON r.user_id = pu.user_id
+  WHERE r.valid_from <= CURRENT_DATE
+    AND (r.valid_to IS NULL OR r.valid_to >= CURRENT_DATE)
+  GROUP BY pu.project_id
+),
+evm AS (
+  SELECT
+    b.*,
+    COALESCE(tc.cost, 0) + COALESCE(ec.cost, 0) + COALESCE(bi.cost, 0) AS actual_cost,
+    b.progress_pct / 100 * b.budget_amount AS ev,
+    CASE WHEN b.total_days > 0
+         THEN b.days_elapsed::float8 / b.total_days * b.budget_amount ELSE 0 END AS pv,
+    COALESCE(po.committed, 0) AS po_committed,
+    COALESCE(bi.cost, 0) AS bills_linked
+  FROM base b
+  LEFT JOIN timesheet_cost tc ON tc.project_id = b.project_id
+  LEFT JOIN expense_cost ec ON ec.project_id = b.project_id
+  LEFT JOIN billed bi ON bi.project_id = b.project_id
+  LEFT JOIN po_committed po ON po.project_id = b.project_id
+),
+indices AS (
+  SELECT
+    evm.*,
+    CASE WHEN actual_cost > 0 THEN ev / actual_cost ELSE 1.0 END AS cpi,
+    CASE WHEN pv > 0 THEN ev / pv ELSE 1.0 END AS spi
+  FROM evm
+)
+SELECT
+  i.project_id,
+  i.project_name,
+  i.project_code,
+  i.status,
+  i.created_at,
+  i.budget_amount,
+  i.cpi,
+  i.spi,
+  CASE WHEN i.budget_amount > 0
+       THEN (i.budget_amount - CASE WHEN i.cpi > 0
+                                    THEN i.actual_cost + (i.budget_amount - i.ev) / i.cpi
+                                    ELSE i.budget_amount END) / i.budget_amount * 100
+       ELSE 0 END AS vac_pct,
+  CASE WHEN i.days_elapsed > 0 THEN i.actual_cost / i.days_elapsed ELSE 0 END AS burn_rate_ratio,
+  CASE WHEN tk.tasks > 0 THEN tk.overdue::float8 / tk.tasks * 100 ELSE 0 END AS overdue_pct,
+  CASE WHEN tk.tasks > 0 AND bc.blockers > 0 THEN bc.active::float8 / tk.tasks ELSE 0 END AS blocker_density,
+  i.progress_pct,
+  CASE WHEN i.total_days > 0 THEN i.days_elapsed::float8 / i.total_days * 100 ELSE 0 END AS days_elapsed_pct,
+  CASE WHEN tk.tasks > 0 AND i.start_date IS NOT NULL
+       THEN tk.added_after_start::float8 / tk.tasks ELSE 0 END AS scope_creep_proxy,
+  GREATEST(0, i.po_committed - i.bills_linked) AS finance_gaps,
+  COALESCE(il.lag_days, 0) AS invoice_lag_days,
+  COALESCE(a.volatility, 0) AS timesheet_volatility,
+  COALESCE(tr.avg_rate, 0) AS avg_team_rate,
+  COALESCE(a.active_7d, 0) AS people_active_7d
+FROM indices i
+LEFT JOIN task_counts tk ON tk.project_id = i.project_id
+LEFT JOIN blocker_counts bc ON bc.project_id = i.project_id
+LEFT JOIN invoice_lag il ON il.project_id = i.project_id
+LEFT JOIN activity a ON a.project_id = i.project_id
+LEFT JOIN team_rates tr ON tr.project_id = i.project_id;
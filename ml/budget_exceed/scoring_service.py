@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Overrun Scoring Service
+=======================
+Long-lived HTTP/JSON scorer for per-project overrun risk. The model, scaler,
+feature columns and medians are loaded once and swapped atomically when the
+.pkl files change on disk; per-project results are cached for a TTL.
+
+Endpoints:
+    GET  /risk/<project_id>                      one project (features read from the database)
+    POST /risk   {"project_ids": [...]}          several projects, one query for the cache misses
+    POST /score  {"projects": [{"project_id": ..., "features": {...}}]}   score given features
+    GET  /health
+    GET  /stats                                  counters, cache, model reloads, latency percentiles
+
+Every response is {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+
+Usage:
+    python scoring_service.py [--host 127.0.0.1] [--port 8765] [--cache-ttl 300]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from predict_overrun import (
+    DB_AVAILABLE, load_scoring_artifacts, score_projects,
+    fetch_project_data_from_db, fetch_project_features_from_view
+)
+
+ProjectFetcher = Callable[[List[str]], List[Dict]]
+
+
+class ArtifactStore:
+    """
+    Model artifacts that follow the .pkl files on disk.
+
+    Files are stat()ed at most every check_interval seconds. A change is loaded
+    once the files have stayed the same for one more check (so a retrain that
+    rewrites them one by one is picked up as a whole), into fresh objects that
+    replace the current set in a single assignment. In-flight requests finish
+    on the set they started with; a failed load keeps the current set.
+    """
+
+    def __init__(self, model_path: str = 'project_overrun_model.pkl',
+                 scaler_path: str = 'feature_scaler.pkl',
+                 feature_cols_path: str = 'feature_columns.pkl',
+                 medians_path: str = None, check_interval: float = 1.0):
+        if medians_path is None:
+            medians_path = os.path.join(os.path.dirname(scaler_path), 'feature_medians.pkl')
+        self.paths = (model_path, scaler_path, feature_cols_path, medians_path)
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._pending = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+        self.loaded_at = None
+
+        # (generation, file versions, artifacts), replaced as a whole
+        self._current = None
+        self._load(self._versions())
+
+    def _versions(self) -> Tuple:
+        versions = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                versions.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                versions.append(None)
+        return tuple(versions)
+
+    def _load(self, versions: Tuple):
+        artifacts = load_scoring_artifacts(*self.paths)
+        if self._versions() != versions:
+            raise RuntimeError("Model files changed while loading")
+        generation = self._current[0] + 1 if self._current else 1
+        self._current = (generation, versions, artifacts)
+        self.loaded_at = time.time()
+
+    def get(self) -> Tuple[int, Dict]:
+        """Current (generation, artifacts), reloading first if the files changed"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self._maybe_reload()
+            finally:
+                self._lock.release()
+        generation, _, artifacts = self._current
+        return generation, artifacts
+
+    def _maybe_reload(self):
+        versions = self._versions()
+        if versions == self._current[1]:
+            self._pending = None
+            return
+        if versions != self._pending:
+            # Changed since the last check: wait for the files to settle
+            self._pending = versions
+            return
+        try:
+            self._load(versions)
+            self.reloads += 1
+            self.last_error = None
+            print(f"🔄 Reloaded model artifacts (generation {self._current[0]})", file=sys.stderr)
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️  Model reload failed, keeping generation {self._current[0]}: {self.last_error}",
+                  file=sys.stderr)
+        finally:
+            self._pending = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "generation": self._current[0],
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
+
+
+class ResultCache:
+    """Per-project results for ttl seconds, dropped when the model generation changes"""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, project_id: str, generation: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None or entry[0] <= time.monotonic() or entry[1] != generation:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def put(self, project_id: str, generation: int, result: Dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[project_id] = (time.monotonic() + self.ttl, generation, result)
+            self._entries.move_to_end(project_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class LatencyStats:
+    """Request latency per endpoint over the most recent requests"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = {endpoint: sorted(values) for endpoint, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        def percentile(values, q):
+            return round(values[int(q * (len(values) - 1))] * 1000, 3)
+
+        return {
+            endpoint: {
+                "requests": counts[endpoint],
+                "window": len(values),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": percentile(values, 0.50),
+                "p90_ms": percentile(values, 0.90),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+            for endpoint, values in samples.items()
+        }
+
+
+class ScoringService:
+    """Scores projects with resident artifacts; database lookups go through a result cache"""
+
+    def __init__(self, store: ArtifactStore, fetch_projects: Optional[ProjectFetcher] = None,
+                 cache_ttl: float = 300.0, threshold: float = None):
+        """
+        Args:
+            store: Model artifacts
+            fetch_projects: Returns project dicts (with features) for project ids;
+                            None disables /risk (see database_fetcher())
+            cache_ttl: Seconds a per-project result is served from the cache (0 disables)
+            threshold: Overrun probability above which a project is flagged
+        """
+        self.store = store
+        self.fetch_projects = fetch_projects
+        self.cache = ResultCache(cache_ttl)
+        self.threshold = threshold
+        self.latency = LatencyStats()
+        self.started_at = time.time()
+
+    def risk(self, project_ids: List[str]) -> Dict[str, Any]:
+        """
+        Predictions for projects by id, fetching and scoring only the cache misses.
+        Ids that are not UUIDs never reach the database; they are reported as missing.
+        """
+        if self.fetch_projects is None:
+            raise RuntimeError("No project database configured")
+        generation, artifacts = self.store.get()
+        project_ids = [str(pid) for pid in project_ids]
+
+        # Requested id -> canonical UUID text, as the database returns it
+        canonical = {}
+        for project_id in dict.fromkeys(project_ids):
+            try:
+                canonical[project_id] = str(uuid.UUID(project_id))
+            except ValueError:
+                pass
+
+        results = {}
+        misses = []
+        for project_id in dict.fromkeys(canonical.values()):
+            cached = self.cache.get(project_id, generation)
+            if cached is not None:
+                results[project_id] = cached
+            else:
+                misses.append(project_id)
+
+        if misses:
+            for prediction in score_projects(self.fetch_projects(misses), artifacts, self.threshold):
+                results[prediction['project_id']] = prediction
+                self.cache.put(prediction['project_id'], generation, prediction)
+
+        return {
+            "predictions": [results[canonical[pid]] for pid in project_ids if canonical.get(pid) in results],
+            "missing": [pid for pid in dict.fromkeys(project_ids) if canonical.get(pid) not in results],
+            "model_generation": generation,
+        }
+
+    def score(self, projects: List[Dict]) -> Dict[str, Any]:
+        """Predictions for caller-supplied features (not cached)"""
+        generation, artifacts = self.store.get()
+        projects_data = []
+        for project in projects:
+            if not isinstance(project, dict) or not isinstance(project.get('features'), dict):
+                raise ValueError("Each project needs a 'features' object")
+            projects_data.append({
+                'project_id': project.get('project_id'),
+                'project_name': project.get('project_name'),
+                'project_code': project.get('project_code'),
+                'budget_amount': project.get('budget_amount'),
+                # Non-finite values are imputed anyway; null keeps the response valid JSON
+                'features': {name: None if isinstance(value, float) and not math.isfinite(value) else value
+                             for name, value in project['features'].items()},
+            })
+        return {
+            "predictions": score_projects(projects_data, artifacts, self.threshold),
+            "model_generation": generation,
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "model_generation": self.store.get()[0],
+            "database": self.fetch_projects is not None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.store.info(),
+            "cache": self.cache.stats(),
+            "latency": self.latency.summary(),
+        }
+
+
+def database_fetcher(use_feature_view: bool = False) -> ProjectFetcher:
+    """
+    Project fetcher backed by PostgreSQL (DB_* env vars, as in predict_overrun.main()).
+    Each server thread keeps its own autocommit connection and reconnects after errors.
+
+    Args:
+        use_feature_view: Read ml.project_features instead of the source tables. The view
+                          aggregates every project per query, so for a handful of ids the
+                          per-table fetch is usually faster.
+    """
+    if not DB_AVAILABLE:
+        raise ImportError("psycopg2 not available. Cannot connect to database.")
+    import psycopg2
+
+    fetch = fetch_project_features_from_view if use_feature_view else fetch_project_data_from_db
+    local = threading.local()
+
+    def fetch_projects(project_ids: List[str]) -> List[Dict]:
+        conn = getattr(local, 'conn', None)
+        if conn is None or conn.closed:
+            conn = psycopg2.connect(
+                host=os.getenv('DB_HOST', 'localhost'),
+                port=os.getenv('DB_PORT', '5432'),
+                database=os.getenv('DB_NAME', 'postgres'),
+                user=os.getenv('DB_USER', 'hetanshwaghela'),
+                password=os.getenv('DB_PASSWORD', '')
+            )
+            conn.autocommit = True
+            local.conn = conn
+        try:
+            return fetch(conn, project_ids)
+        except psycopg2.Error:
+            conn.close()
+            raise
+
+    return fetch_projects
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "OverrunScoring/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        service = self.server.service
+        started = time.perf_counter()
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        endpoint = parts[0] if parts else ""
+
+        try:
+            if method == "GET" and parts == ["health"]:
+                status, body = 200, service.health()
+            elif method == "GET" and parts == ["stats"]:
+                status, body = 200, service.stats()
+            elif method == "GET" and endpoint == "risk" and len(parts) == 2:
+                body = service.risk([parts[1]])
+                status = 200 if body["predictions"] else 404
+                body = body["predictions"][0] if body["predictions"] else f"Unknown or inactive project: {parts[1]}"
+            elif method == "POST" and parts == ["risk"]:
+                project_ids = self._read_json().get('project_ids')
+                if not isinstance(project_ids, list):
+                    raise ValueError("Expected {\"project_ids\": [...]}")
+                status, body = 200, service.risk(project_ids)
+            elif method == "POST" and parts == ["score"]:
+                projects = self._read_json().get('projects')
+                if not isinstance(projects, list):
+                    raise ValueError("Expected {\"projects\": [...]}")
+                status, body = 200, service.score(projects)
+            else:
+                endpoint = "not_found"
+                status, body = 404, f"No route for {method} {self.path}"
+        except ValueError as e:
+            status, body = 400, f"Bad request: {e}"
+        except Exception as e:
+            status, body = 500, f"{type(e).__name__}: {e}"
+
+        self._respond(status, body)
+        service.latency.record(endpoint, time.perf_counter() - started)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def _respond(self, status: int, body: Any):
+        response = {"ok": True, "result": body} if status == 200 else {"ok": False, "error": body}
+        data = json.dumps(response, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: ScoringService, verbose: bool = False):
+        super().__init__(address, _Handler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Long-lived overrun scoring service")
+    parser.add_argument("--host", default=os.getenv('SCORING_HOST', '127.0.0.1'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('SCORING_PORT', '8765')))
+    parser.add_argument("--model-dir", default=os.getenv('SCORING_MODEL_DIR', here),
+                        help="Directory with the model/scaler/feature .pkl files")
+    parser.add_argument("--cache-ttl", type=float, default=float(os.getenv('SCORING_CACHE_TTL', '300')),
+                        help="Seconds to cache per-project results (default: SCORING_CACHE_TTL or 300)")
+    parser.add_argument("--reload-check", type=float, default=float(os.getenv('SCORING_RELOAD_CHECK', '1.0')),
+                        help="Seconds between model file checks (default: SCORING_RELOAD_CHECK or 1)")
+    parser.add_argument("--no-database", action="store_true", help="Serve /score only")
+    parser.add_argument("--feature-view", action="store_true", help="Read features from ml.project_features")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    store = ArtifactStore(
+        os.path.join(args.model_dir, 'project_overrun_model.pkl'),
+        os.path.join(args.model_dir, 'feature_scaler.pkl'),
+        os.path.join(args.model_dir, 'feature_columns.pkl'),
+        check_interval=args.reload_check
+    )
+    fetch_projects = None if args.no_database or not DB_AVAILABLE else database_fetcher(args.feature_view)
+    service = ScoringService(store, fetch_projects, cache_ttl=args.cache_ttl)
+
+    server = ScoringServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"🛰️  Scoring on http://{args.host}:{server.server_address[1]} "
+          f"(model generation {store.get()[0]}, database {'on' if fetch_projects else 'off'})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
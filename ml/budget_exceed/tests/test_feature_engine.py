@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Test the shared feature engine: hand-checked values, batching, and timezone-aware inputs"""
+
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from feature_engine import FEATURE_NAMES, compute_features
+from generate_synthetic_data import SyntheticProjectGenerator
+
+AS_OF = date(2025, 3, 31)
+
+
+def example_tables():
+    projects = pd.DataFrame({
+        'project_id': ['a', 'b', 'idle'],
+        'start_date': [date(2025, 1, 1), date(2025, 3, 1), None],
+        'end_date': [date(2025, 12, 31), date(2025, 3, 21), None],
+        'budget_amount': [100000.0, 5000.0, 0.0],
+        'progress_pct': [20.0, 100.0, 0.0],
+    })
+    timesheets = pd.DataFrame({
+        'project_id': ['a', 'a', 'a', 'b'],
+        'worked_on': [date(2025, 3, 20), date(2025, 3, 30), date(2025, 3, 30), date(2025, 1, 5)],
+        'hours': [8.0, 4.0, 6.0, 8.0],
+        'cost_rate': [100.0, 100.0, None, 50.0],
+    })
+    tasks = pd.DataFrame({
+        'project_id': ['a', 'a', 'a', 'a', 'b'],
+        'created_at': [datetime(2024, 12, 20, 9), datetime(2025, 1, 1, 23), datetime(2025, 2, 2), datetime(2025, 3, 3),
+                       datetime(2025, 3, 2)],
+        'due_date': [date(2025, 3, 1), date(2025, 3, 31), date(2025, 3, 30), date(2025, 2, 1), date(2025, 3, 10)],
+        'state': ['done', 'new', 'in_progress', 'blocked', 'new'],
+    })
+    blockers = pd.DataFrame({'project_id': ['a', 'a'], 'resolved_at': [None, datetime(2025, 3, 1)]})
+    invoices = pd.DataFrame({
+        'project_id': ['a', 'a'],
+        'invoice_date': [date(2025, 2, 1), date(2025, 3, 1)],
+        # Offsets either side of a DST change, as a timestamptz column in a local session
+        'paid_at': [datetime(2025, 3, 3, 23, 30, tzinfo=timezone(timedelta(hours=-5))),
+                    datetime(2025, 3, 20, 0, 30, tzinfo=timezone(timedelta(hours=-4)))],
+    })
+    return dict(projects=projects, timesheets=timesheets, tasks=tasks, blockers=blockers,
+                expenses=pd.DataFrame({'project_id': ['a'], 'amount': [200.0]}),
+                purchase_orders=pd.DataFrame({'project_id': ['a', 'a'], 'status': ['confirmed', 'draft'],
+                                              'grand_total': [3000.0, 9999.0]}),
+                vendor_bills=pd.DataFrame({'project_id': ['a'], 'grand_total': [1000.0]}),
+                invoices=invoices,
+                user_rates=pd.DataFrame({'project_id': ['a', 'a'], 'bill_rate': [150.0, 250.0]}))
+
+
+def test_hand_checked_features():
+    features = compute_features(**example_tables(), as_of=AS_OF)
+    assert list(features.columns) == FEATURE_NAMES and list(features.index) == ['a', 'b', 'idle']
+
+    a = features.loc['a']
+    actual_cost = 800 + 400 + 200 + 1000
+    assert a['cpi'] == pytest.approx(20000 / actual_cost)
+    assert a['spi'] == pytest.approx(20000 / (89 / 364 * 100000))
+    assert a['days_elapsed_pct'] == pytest.approx(89 / 364 * 100)
+    assert a['burn_rate_ratio'] == pytest.approx(actual_cost / 89)
+    assert a['overdue_pct'] == pytest.approx(50.0)       # due 3/30 and 2/1, not done
+    assert a['scope_creep_proxy'] == pytest.approx(0.5)  # created on the start day does not count
+    assert a['blocker_density'] == pytest.approx(0.25)
+    assert a['finance_gaps'] == pytest.approx(2000.0)
+    assert a['invoice_lag_days'] == pytest.approx((30 + 19) / 2)
+    assert a['timesheet_volatility'] == pytest.approx(np.std([8.0, 10.0], ddof=1))
+    assert a['people_active_7d'] == 1
+    assert a['avg_team_rate'] == pytest.approx(200.0)
+
+    b = features.loc['b']  # finished: snapshot is its end date
+    assert b['days_elapsed_pct'] == pytest.approx(100.0)
+    assert b['overdue_pct'] == pytest.approx(100.0) and b['timesheet_volatility'] == 0
+
+    idle = features.loc['idle']
+    assert idle['cpi'] == 1.0 and idle['spi'] == 1.0
+    assert (idle.drop(['cpi', 'spi']) == 0).all()
+
+
+def test_batching_does_not_change_features():
+    one_at_a_time = SyntheticProjectGenerator(n_projects=12, random_seed=7, batch_size=1).generate_projects()
+    batched = SyntheticProjectGenerator(n_projects=12, random_seed=7, batch_size=5).generate_projects()
+    pd.testing.assert_frame_equal(one_at_a_time[FEATURE_NAMES + ['label']], batched[FEATURE_NAMES + ['label']])
+
+
+def test_empty_inputs():
+    tables = example_tables()
+    assert compute_features(tables['projects'].iloc[:0]).empty
+    features = compute_features(tables['projects'], as_of=AS_OF)
+    assert features.loc['a', 'cpi'] == 1.0 and features.loc['a', 'people_active_7d'] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
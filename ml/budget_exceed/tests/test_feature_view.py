@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Parity of the ml.project_features view with calculate_features_from_db.
+
+Needs a Postgres database with database/oneflow-schema.sql loaded, e.g.
+FEATURE_VIEW_TEST_DSN="host=localhost dbname=oneflow_test". The example
+data and the view are created in a transaction that is rolled back.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from predict_overrun import FEATURE_NAMES, fetch_project_data_from_db, fetch_project_features_from_view
+
+DSN = os.getenv("FEATURE_VIEW_TEST_DSN")
+
+
+@pytest.fixture
+def example_db():
+    if not DSN:
+        pytest.skip("FEATURE_VIEW_TEST_DSN not set")
+    conn = psycopg2.connect(DSN)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute((ROOT / "example_projects_data.sql").read_text())
+            cursor.execute((ROOT / "project_features_view.sql").read_text())
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_view_matches_python_features(example_db):
+    expected = fetch_project_data_from_db(example_db)
+    actual = fetch_project_features_from_view(example_db)
+    assert expected, "example data has no active projects"
+
+    assert [p["project_id"] for p in actual] == [p["project_id"] for p in expected]
+    for python_row, view_row in zip(expected, actual):
+        assert view_row["budget_amount"] == pytest.approx(python_row["budget_amount"])
+        for name in FEATURE_NAMES:
+            assert view_row["features"][name] == pytest.approx(python_row["features"][name], rel=1e-9, abs=1e-9), \
+                f"{python_row['project_code']} {name}"
+
+
+def test_view_project_filter(example_db):
+    project_ids = [p["project_id"] for p in fetch_project_data_from_db(example_db)][:2]
+    rows = fetch_project_features_from_view(example_db, project_ids)
+    assert sorted(p["project_id"] for p in rows) == sorted(project_ids)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
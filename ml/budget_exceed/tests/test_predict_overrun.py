@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Test feature imputation, the scaler-mean fallback and the overrun threshold"""
+
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from predict_overrun import build_feature_matrix, load_feature_medians, load_scoring_artifacts, score_projects
+
+FEATURE_COLS = joblib.load(ROOT / "feature_columns.pkl")
+SCALER = joblib.load(ROOT / "feature_scaler.pkl")
+MEDIANS = joblib.load(ROOT / "feature_medians.pkl")
+
+FEATURES = {
+    'cpi': 0.85, 'spi': 0.90, 'vac_pct': -15.0, 'burn_rate_ratio': 1200.0, 'overdue_pct': 40.0,
+    'blocker_density': 0.4, 'progress_pct': 45.5, 'days_elapsed_pct': 60.0, 'scope_creep_proxy': 0.4,
+    'finance_gaps': 0.0, 'invoice_lag_days': 43.0, 'timesheet_volatility': 1.2, 'avg_team_rate': 150.0,
+    'people_active_7d': 2
+}
+
+
+def project(pid, **features):
+    return {'project_id': pid, 'project_name': f'Project {pid}', 'project_code': pid,
+            'budget_amount': 50000.0, 'features': features}
+
+
+def test_imputes_nan_none_and_inf_from_training_medians():
+    medians = load_feature_medians(SCALER, FEATURE_COLS, str(ROOT / "feature_medians.pkl"))
+    assert list(medians) == [MEDIANS[col] for col in FEATURE_COLS]
+
+    gaps = dict(FEATURES, cpi=float('nan'), spi=None, vac_pct=float('inf'), burn_rate_ratio=float('-inf'))
+    del gaps['overdue_pct']
+    X = build_feature_matrix([project('a', **gaps), project('b', **FEATURES)], FEATURE_COLS, medians)
+
+    imputed = {col: X[0, i] for i, col in enumerate(FEATURE_COLS)}
+    for col in ('cpi', 'spi', 'vac_pct', 'burn_rate_ratio', 'overdue_pct'):
+        assert imputed[col] == MEDIANS[col]
+    assert imputed['progress_pct'] == FEATURES['progress_pct']
+    # Complete rows are left alone
+    assert list(X[1]) == [float(FEATURES[col]) for col in FEATURE_COLS]
+    assert np.isfinite(X).all()
+
+
+def test_falls_back_to_scaler_means_without_medians():
+    for path in (None, str(ROOT / "no_such_medians.pkl")):
+        assert np.array_equal(load_feature_medians(SCALER, FEATURE_COLS, path), SCALER.mean_)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A model saved before feature_medians.pkl existed
+        for name in ("project_overrun_model.pkl", "feature_scaler.pkl", "feature_columns.pkl"):
+            shutil.copy(ROOT / name, Path(tmp) / name)
+        artifacts = load_scoring_artifacts(*(str(Path(tmp) / name) for name in
+                                             ("project_overrun_model.pkl", "feature_scaler.pkl",
+                                              "feature_columns.pkl")))
+    assert np.array_equal(artifacts['medians'], SCALER.mean_)
+
+    X = build_feature_matrix([project('a', **dict(FEATURES, cpi=None))], FEATURE_COLS, artifacts['medians'])
+    assert X[0, FEATURE_COLS.index('cpi')] == SCALER.mean_[FEATURE_COLS.index('cpi')]
+
+
+class FixedModel:
+    """Stands in for the classifier: fixed overrun probabilities, one per project"""
+
+    def __init__(self, probabilities):
+        self.probabilities = np.array(probabilities)
+
+    def predict_proba(self, X):
+        assert len(X) == len(self.probabilities)
+        return np.column_stack([1 - self.probabilities, self.probabilities])
+
+
+class IdentityScaler:
+    def transform(self, frame):
+        return frame.to_numpy()
+
+
+PROBABILITIES = [0.0, 0.3, 0.5, 1.0]
+
+
+def fixed_artifacts():
+    return {'model': FixedModel(PROBABILITIES), 'scaler': IdentityScaler(), 'feature_cols': FEATURE_COLS,
+            'medians': np.asarray(SCALER.mean_, dtype=float)}
+
+
+def flags(threshold=None):
+    projects = [project(str(i), **FEATURES) for i in range(len(PROBABILITIES))]
+    return [p['predicted_overrun'] for p in score_projects(projects, fixed_artifacts(), threshold)]
+
+
+def test_threshold_bounds():
+    # A project is flagged when its probability is strictly above the threshold
+    assert flags(0) == [False, True, True, True]
+    assert flags(1) == [False, False, False, False]
+    assert flags(0.5) == [False, False, False, True]
+
+
+def test_threshold_from_env(monkeypatch):
+    monkeypatch.setenv('OVERRUN_THRESHOLD', '0')
+    assert flags() == [False, True, True, True]
+    monkeypatch.setenv('OVERRUN_THRESHOLD', '1')
+    assert flags() == [False, False, False, False]
+    monkeypatch.delenv('OVERRUN_THRESHOLD')
+    assert flags() == flags(0.5)
+    # An explicit threshold wins over the environment
+    monkeypatch.setenv('OVERRUN_THRESHOLD', '1')
+    assert flags(0) == [False, True, True, True]
+
+
+def test_real_model_respects_threshold_bounds():
+    artifacts = load_scoring_artifacts(*(str(ROOT / name) for name in
+                                         ("project_overrun_model.pkl", "feature_scaler.pkl",
+                                          "feature_columns.pkl")))
+    projects = [project('a', **FEATURES), project('b', **dict(FEATURES, cpi=None, spi=float('nan')))]
+    at_zero = score_projects(projects, artifacts, threshold=0)
+    assert [p['predicted_overrun'] for p in at_zero] == [p['overrun_probability'] > 0 for p in at_zero]
+    assert not any(p['predicted_overrun'] for p in score_projects(projects, artifacts, threshold=1))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Test the resident scorer: caching, hot model reload and the HTTP API"""
+
+import sys
+import copy
+import json
+import shutil
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from pathlib import Path
+
+import joblib
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scoring_service import ArtifactStore, ScoringService, ScoringServer
+
+ARTIFACTS = ("project_overrun_model.pkl", "feature_scaler.pkl", "feature_columns.pkl", "feature_medians.pkl")
+
+FEATURES = {
+    'cpi': 0.85, 'spi': 0.90, 'vac_pct': -15.0, 'burn_rate_ratio': 1200.0, 'overdue_pct': 40.0,
+    'blocker_density': 0.4, 'progress_pct': 45.5, 'days_elapsed_pct': 60.0, 'scope_creep_proxy': 0.4,
+    'finance_gaps': 0.0, 'invoice_lag_days': 43.0, 'timesheet_volatility': 1.2, 'avg_team_rate': 150.0,
+    'people_active_7d': 2
+}
+
+# Project ids are UUIDs, as in the database
+A = "6f1c2a4e-0000-4000-8000-00000000000a"
+B = "6f1c2a4e-0000-4000-8000-00000000000b"
+UNKNOWN = "6f1c2a4e-0000-4000-8000-0000000000ff"
+
+
+def model_dir(tmp):
+    for name in ARTIFACTS:
+        shutil.copy(ROOT / name, Path(tmp) / name)
+    return Path(tmp)
+
+
+def store_for(directory, check_interval=0.0):
+    return ArtifactStore(*(str(directory / name) for name in ARTIFACTS), check_interval=check_interval)
+
+
+class Projects:
+    """Stands in for the database: project dicts by id, counting fetches"""
+
+    def __init__(self, ids):
+        self.projects = {pid: {'project_id': pid, 'project_name': f'Project {pid}', 'project_code': pid,
+                               'budget_amount': 50000.0, 'features': dict(FEATURES)} for pid in ids}
+        self.fetched = []
+
+    def __call__(self, project_ids):
+        self.fetched.append(list(project_ids))
+        return [self.projects[pid] for pid in project_ids if pid in self.projects]
+
+
+def rewrite_scaler(directory, shift):
+    """Replace the scaler (atomically, as a retrain would) with shifted training means"""
+    scaler = copy.deepcopy(joblib.load(directory / "feature_scaler.pkl"))
+    scaler.mean_ = scaler.mean_ + shift * scaler.scale_
+    joblib.dump(scaler, directory / "feature_scaler.pkl.tmp")
+    (directory / "feature_scaler.pkl.tmp").replace(directory / "feature_scaler.pkl")
+
+
+def test_cache_and_hot_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = model_dir(tmp)
+        projects = Projects([A, B])
+        service = ScoringService(store_for(directory), projects, cache_ttl=60)
+
+        first = service.risk([A, B, UNKNOWN])
+        assert [p['project_id'] for p in first['predictions']] == [A, B]
+        assert first['missing'] == [UNKNOWN] and first['model_generation'] == 1
+        assert service.risk([A])['predictions'] == first['predictions'][:1]
+        assert projects.fetched == [[A, B, UNKNOWN]]
+        assert service.cache.stats()['hits'] == 1
+
+        rewrite_scaler(directory, shift=-3.0)
+        service.store.get()                  # sees the change, waits for it to settle
+        reloaded = service.risk([A])        # files unchanged since: loads generation 2
+        assert reloaded['model_generation'] == 2
+        assert projects.fetched[-1] == [A]    # cache entry from generation 1 was dropped
+        assert reloaded['predictions'][0]['overrun_probability'] != first['predictions'][0]['overrun_probability']
+
+
+def test_malformed_ids_never_reach_the_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        projects = Projects([A])
+        service = ScoringService(store_for(model_dir(tmp)), projects, cache_ttl=60)
+
+        result = service.risk(["nope", A.upper(), "1; DROP TABLE projects", ""])
+        assert [p['project_id'] for p in result['predictions']] == [A]  # canonical form
+        assert result['missing'] == ["nope", "1; DROP TABLE projects", ""]
+        assert projects.fetched == [[A]]
+
+        assert service.risk(["nope"]) == {"predictions": [], "missing": ["nope"], "model_generation": 1}
+        assert projects.fetched == [[A]]
+
+
+def test_failed_reload_keeps_model():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = model_dir(tmp)
+        store = store_for(directory)
+        (directory / "project_overrun_model.pkl").write_bytes(b"not a pickle")
+        store.get()
+        generation, artifacts = store.get()
+        assert generation == 1 and artifacts['model'] is not None
+        assert store.info()['reload_errors'] == 1
+
+        service = ScoringService(store, cache_ttl=0)
+        assert service.score([{'project_id': 'x', 'features': FEATURES}])['predictions'][0]['project_id'] == 'x'
+
+
+def test_http_api():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = ScoringService(store_for(model_dir(tmp), check_interval=60), Projects([A]), cache_ttl=60)
+        server = ScoringServer(("127.0.0.1", 0), service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        def call(path, body=None):
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    return response.status, json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, json.loads(e.read())
+
+        try:
+            assert call("/health")[1]['result']['status'] == "ok"
+            status, body = call(f"/risk/{A}")
+            assert status == 200 and 0.0 <= body['result']['overrun_probability'] <= 1.0
+            assert call("/risk/nope")[0] == 404
+            status, body = call("/risk", {"project_ids": [A, "nope"]})
+            assert body['result']['missing'] == ["nope"]
+
+            features = dict(FEATURES, cpi=float('nan'))
+            status, body = call("/score", {"projects": [{"project_id": "q", "features": features}]})
+            assert status == 200 and body['result']['predictions'][0]['project_id'] == "q"
+            assert call("/score", {"projects": [{"project_id": "q"}]})[0] == 400
+            assert call("/nowhere")[0] == 404
+
+            stats = call("/stats")[1]['result']
+            assert stats['cache']['hits'] == 1
+            assert stats['latency']['risk']['requests'] == 3
+            assert {'p50_ms', 'p90_ms', 'p99_ms'} <= set(stats['latency']['score'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
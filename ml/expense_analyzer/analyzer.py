@@ -5,86 +5,268 @@ Uses LLM (OpenAI/Gemini) as primary method with intelligent fallback to regex
 Phase 3: Includes fraud detection and receipt storage
 """
 
+import os
 import sys
 import json
+import time
+import importlib
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
-
-# Import analyzers
-try:
-    from analyzer_llm import LLMReceiptAnalyzer, is_available as llm_available
-    LLM_AVAILABLE = True
-except ImportError:
-    LLM_AVAILABLE = False
-
-try:
-    from analyzer_fallback import ReceiptAnalyzer as FallbackAnalyzer
-    FALLBACK_AVAILABLE = True
-except ImportError:
-    FALLBACK_AVAILABLE = False
-
-# Import fraud detection
-try:
-    from receipt_storage import ReceiptStorage
-    from fraud_detector import FraudDetector
-    FRAUD_DETECTION_AVAILABLE = True
-except ImportError:
-    FRAUD_DETECTION_AVAILABLE = False
-    print("Warning: Fraud detection not available")
+from typing import Dict, Any, Optional, Set
+
+from extraction_cache import ExtractionCache
+from image_context import ImageContext
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+# Backends are imported on first use, so e.g. --fallback runs never load the LLM
+# stack and --no-fraud runs never load storage. Seconds spent importing each:
+IMPORT_TIMES: Dict[str, float] = {}
+
+# Backends that are not installed (not retried)
+FAILED_IMPORTS: Set[str] = set()
+
+# Analyzers are built from several threads at once (daemon workers, batch pools);
+# the first import of a backend must finish before anyone else sees the module
+_import_lock = threading.RLock()
+
+# Hedged mode (--hedge) defaults; override with ANALYZER_HEDGE_DELAY / ANALYZER_HEDGE_DEADLINE
+DEFAULT_HEDGE_DELAY = 2.0
+DEFAULT_HEDGE_DEADLINE = 15.0
+
+
+def _import_backend(name: str):
+    """Import a backend module, recording how long it took (None if not installed)"""
+    with _import_lock:
+        if name in FAILED_IMPORTS:
+            return None
+        start = time.perf_counter()
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            FAILED_IMPORTS.add(name)
+            return None
+        finally:
+            IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+
+
+def _start_thread(fn, *args) -> Future:
+    """
+    Run fn(*args) on a new daemon thread and return its Future. Daemon threads let
+    a discarded (hedged-out) LLM call finish in the background without keeping
+    the process alive.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
 
 
 class HybridReceiptAnalyzer:
-    def __init__(self, force_fallback=False, enable_fraud_detection=True):
+    def __init__(self, force_fallback=False, enable_fraud_detection=True, enable_cache=True,
+                 cache: ExtractionCache = None, hedge_delay: Optional[float] = None,
+                 hedge_deadline: Optional[float] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the analyzer.
+
+        Args:
+            force_fallback: Skip the LLM and use regex/OCR extraction only
+            enable_fraud_detection: Run duplicate/anomaly checks and store receipts
+            enable_cache: Reuse results from the extraction cache
+            cache: Cache instance to use (default: ExtractionCache())
+            hedge_delay: If set, start OCR this many seconds after the LLM call
+                (0 = both at once) instead of only after the LLM fails
+            hedge_deadline: Seconds from the start of a hedged extraction after
+                which a finished OCR result is used instead of waiting for the LLM
+            circuit_breaker: Breaker guarding the LLM provider; share one instance
+                between analyzers calling the same endpoint (default: from env)
+        """
         self.force_fallback = force_fallback
         self.enable_fraud_detection = enable_fraud_detection
+        self.hedge_delay = hedge_delay
+        self.hedge_deadline = hedge_deadline
         self.llm_analyzer = None
         self.fallback_analyzer = None
         self.storage = None
         self.fraud_detector = None
+        self.cache = cache
+        self.circuit_breaker = None
         
-        # Initialize fraud detection
-        if enable_fraud_detection and FRAUD_DETECTION_AVAILABLE:
+        # Initialize extraction cache
+        if enable_cache and self.cache is None:
             try:
-                self.storage = ReceiptStorage()
-                self.fraud_detector = FraudDetector(self.storage)
-                print("🔒 Fraud detection enabled")
+                self.cache = ExtractionCache()
             except Exception as e:
-                print(f"Warning: Fraud detection init failed: {e}")
+                print(f"Warning: Extraction cache init failed: {e}")
         
-        if not force_fallback and LLM_AVAILABLE and llm_available():
-            try:
-                self.llm_analyzer = LLMReceiptAnalyzer()
-                print("LLM analyzer initialized (primary)")
-            except Exception as e:
-                print(f"LLM init failed: {e}")
+        # Initialize fraud detection
+        if enable_fraud_detection:
+            receipt_storage = _import_backend("receipt_storage")
+            fraud_detector = _import_backend("fraud_detector")
+            if receipt_storage and fraud_detector:
+                try:
+                    self.storage = receipt_storage.open_storage()
+                    self.fraud_detector = fraud_detector.FraudDetector(self.storage)
+                    print("🔒 Fraud detection enabled")
+                except Exception as e:
+                    print(f"Warning: Fraud detection init failed: {e}")
+            else:
+                print("Warning: Fraud detection not available")
+        
+        if not force_fallback:
+            analyzer_llm = _import_backend("analyzer_llm")
+            if analyzer_llm and analyzer_llm.is_available():
+                try:
+                    breaker = circuit_breaker or CircuitBreaker.from_env()
+                    self.llm_analyzer = analyzer_llm.LLMReceiptAnalyzer(circuit_breaker=breaker)
+                    self.circuit_breaker = breaker
+                    print("LLM analyzer initialized (primary)")
+                except Exception as e:
+                    print(f"LLM init failed: {e}")
+        
+        # With the LLM as primary, the OCR fallback is only loaded if it is needed
+        # (hedged runs need it on every cache miss, so load it up front)
+        if (not self.llm_analyzer or self.hedging) and not self._get_fallback_analyzer():
+            if not self.llm_analyzer:
+                raise RuntimeError("No analyzer available")
+    
+    @property
+    def hedging(self) -> bool:
+        """True when LLM and OCR extraction are raced against each other"""
+        return self.hedge_delay is not None and self.llm_analyzer is not None and not self.force_fallback
+    
+    def _get_fallback_analyzer(self):
+        """OCR fallback analyzer, created on first use (None if unavailable)"""
+        if self.fallback_analyzer is None:
+            analyzer_fallback = _import_backend("analyzer_fallback")
+            if analyzer_fallback:
+                self.fallback_analyzer = analyzer_fallback.ReceiptAnalyzer()
+        return self.fallback_analyzer
+    
+    def _run_llm(self, file_path):
+        """LLM extraction; None if the circuit is open, the call fails or finds no amount"""
+        try:
+            print("Attempting LLM extraction...")
+            result = self.llm_analyzer.analyze(file_path)
+        except CircuitOpenError:
+            print("⚡ LLM circuit open, skipping to fallback")
+            return None
+        except Exception as e:
+            print(f"LLM failed: {e}")
+            return None
+        # The provider answered (the LLM analyzer reported it to the breaker); a
+        # receipt without an amount is not an outage
+        if not result.get("extracted_data", {}).get("amount"):
+            return None
+        return result
+    
+    def _run_fallback(self, file_path, image_context):
+        """Regex/OCR extraction (raises RuntimeError if it fails)"""
+        try:
+            result = self.fallback_analyzer.analyze(file_path, image_context=image_context)
+            if not result.get("timestamp"):
+                result["timestamp"] = datetime.now().isoformat()
+            return result
+        except Exception as e:
+            raise RuntimeError(f"All methods failed: {e}")
+    
+    def _analyze_hedged(self, file_path, image_context):
+        """
+        Race the LLM against local OCR. OCR starts hedge_delay seconds after the LLM
+        (or as soon as the LLM fails). A valid LLM result is preferred; once the LLM
+        has failed or hedge_deadline has passed, a finished OCR result is used.
+        The losing call is discarded (OCR is never started if the LLM wins first).
+        
+        Returns:
+            (result, hedge metadata)
+        """
+        start = time.perf_counter()
+        deadline_at = start + self.hedge_deadline if self.hedge_deadline is not None else None
+        llm = _start_thread(self._run_llm, file_path)
+        fallback = None
         
-        if FALLBACK_AVAILABLE:
-            self.fallback_analyzer = FallbackAnalyzer()
+        # Give the LLM a head start; returns early if it finishes
+        wait([llm], timeout=self.hedge_delay)
+        
+        while True:
+            now = time.perf_counter()
+            past_deadline = deadline_at is not None and now >= deadline_at
+            
+            if llm.done() and llm.result() is not None:
+                winner, result = "llm", llm.result()
+                break
+            
+            if fallback is None:
+                print("⏱️  Hedging: starting OCR fallback alongside LLM")
+                fallback = _start_thread(self._run_fallback, file_path, image_context)
+                continue
+            
+            if fallback.done():
+                if fallback.exception() is None and (llm.done() or past_deadline):
+                    winner, result = "fallback", fallback.result()
+                    break
+                if llm.done():
+                    raise fallback.exception()
+            
+            # Sleep until either call finishes or the deadline passes
+            timeout = None if deadline_at is None or past_deadline else deadline_at - now
+            wait([f for f in (llm, fallback) if not f.done()], timeout=timeout,
+                 return_when=FIRST_COMPLETED)
         
-        if not self.llm_analyzer and not self.fallback_analyzer:
-            raise RuntimeError("No analyzer available")
+        hedge = {
+            "winner": winner,
+            "fallback_started": fallback is not None,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            "delay_s": self.hedge_delay,
+            "deadline_s": self.hedge_deadline,
+        }
+        print(f"🏁 Hedged extraction won by {winner} in {hedge['elapsed_ms']:.0f} ms")
+        return result, hedge
+    
+    def _cache_method(self):
+        """Extraction method whose results this analyzer caches and reuses"""
+        if self.llm_analyzer and not self.force_fallback:
+            return "llm_receipt_ocr"
+        return "fallback"
     
     def analyze(self, file_path):
         result = None
+        cache_method = self._cache_method()
+        digest = None
         
-        if self.llm_analyzer and not self.force_fallback:
+        # One read/decode/hash of the file shared by OCR, fraud checks and storage
+        image_context = ImageContext(file_path)
+        
+        if self.cache:
             try:
-                print("Attempting LLM extraction...")
-                result = self.llm_analyzer.analyze(file_path)
-                if not result.get("extracted_data", {}).get("amount"):
-                    result = None
-            except Exception as e:
-                print(f"LLM failed: {e}")
+                digest = image_context.sha256
+                result = self.cache.get(file_path, cache_method, digest=digest)
+            except OSError:
                 result = None
+            if result is not None:
+                print("⚡ Extraction cache hit")
+                result.setdefault("metadata", {})["cache_hit"] = True
         
-        if result is None and self.fallback_analyzer:
-            try:
-                result = self.fallback_analyzer.analyze(file_path)
-                if not result.get("timestamp"):
-                    result["timestamp"] = datetime.now().isoformat()
-            except Exception as e:
-                raise RuntimeError(f"All methods failed: {e}")
+        hedge = None
+        if result is None and self.hedging and self.fallback_analyzer:
+            result, hedge = self._analyze_hedged(file_path, image_context)
+        
+        if result is None and self.llm_analyzer and not self.force_fallback:
+            result = self._run_llm(file_path)
+        
+        if result is None and self._get_fallback_analyzer():
+            result = self._run_fallback(file_path, image_context)
         
         if result is None:
             raise RuntimeError("No extraction succeeded")
@@ -92,11 +274,30 @@ class HybridReceiptAnalyzer:
         if "metadata" not in result:
             result["metadata"] = {}
         
+        # Cache fresh results from the preferred method only, so an LLM outage
+        # does not pin the weaker fallback result for this file
+        if self.cache and digest and "cache_hit" not in result["metadata"]:
+            result["metadata"]["cache_hit"] = False
+            produced_by = result["metadata"].get("extraction_method")
+            if cache_method == "fallback" or produced_by == cache_method:
+                try:
+                    self.cache.put(file_path, cache_method, result, digest=digest)
+                except OSError as e:
+                    print(f"Warning: Could not cache extraction: {e}")
+        
+        # Added after caching so a later cache hit does not report a stale race
+        if hedge is not None:
+            result["metadata"]["hedge"] = hedge
+        if self.circuit_breaker and not result["metadata"].get("cache_hit"):
+            result["metadata"]["llm_circuit"] = self.circuit_breaker.state
+        
         # Perform fraud checks if enabled
         if self.fraud_detector:
             try:
                 print("\n🔍 Running fraud detection...")
-                fraud_checks = self.fraud_detector.perform_fraud_checks(file_path, result)
+                fraud_checks = self.fraud_detector.perform_fraud_checks(
+                    file_path, result, image_context=image_context
+                )
                 result["fraud_checks"] = fraud_checks
                 
                 # Print fraud warnings
@@ -113,7 +314,11 @@ class HybridReceiptAnalyzer:
                 
                 # Save to storage if not a duplicate
                 if not fraud_checks.get("duplicate_detected"):
-                    receipt_id = self.storage.save_receipt(result, file_path)
+                    receipt_id = self.storage.save_receipt(
+                        result, file_path,
+                        image_hash=fraud_checks.get("image_hash"),
+                        content_hash=fraud_checks.get("content_hash")
+                    )
                     result["receipt_id"] = receipt_id
                     print(f"💾 Saved to storage: {receipt_id}")
                 else:
@@ -127,7 +332,7 @@ class HybridReceiptAnalyzer:
     def print_result(self, result):
         if self.llm_analyzer and result.get("metadata", {}).get("extraction_method") == "llm_receipt_ocr":
             self.llm_analyzer.print_result(result)
-        elif self.fallback_analyzer:
+        elif self._get_fallback_analyzer():
             self.fallback_analyzer.print_result(result)
         
         # Print fraud detection summary
@@ -161,14 +366,19 @@ class HybridReceiptAnalyzer:
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python analyzer.py <file> [--fallback]")
+        print("Usage: python analyzer.py <file> [--fallback] [--hedge] [--no-cache] [--no-fraud] [--import-times]")
         sys.exit(1)
     
     file_path = sys.argv[1]
     force_fallback = "--fallback" in sys.argv
+    enable_cache = "--no-cache" not in sys.argv
+    enable_fraud_detection = "--no-fraud" not in sys.argv
+    hedge_delay, hedge_deadline = hedge_settings() if "--hedge" in sys.argv else (None, None)
     
     try:
-        analyzer = HybridReceiptAnalyzer(force_fallback=force_fallback)
+        analyzer = HybridReceiptAnalyzer(force_fallback=force_fallback, enable_cache=enable_cache,
+                                         enable_fraud_detection=enable_fraud_detection,
+                                         hedge_delay=hedge_delay, hedge_deadline=hedge_deadline)
         result = analyzer.analyze(file_path)
         analyzer.print_result(result)
         
@@ -180,6 +390,27 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if "--import-times" in sys.argv:
+            print_import_times()
+
+
+def hedge_settings():
+    """(delay, deadline) in seconds for hedged mode, from the environment or defaults"""
+    return (float(os.getenv("ANALYZER_HEDGE_DELAY", DEFAULT_HEDGE_DELAY)),
+            float(os.getenv("ANALYZER_HEDGE_DEADLINE", DEFAULT_HEDGE_DEADLINE)))
+
+
+def print_import_times():
+    """Report how long each backend took to import (see also: python -X importtime)"""
+    print("\n⏱️  Backend import times")
+    for name, seconds in IMPORT_TIMES.items():
+        status = "  (not installed)" if name in FAILED_IMPORTS else ""
+        print(f"   {name:<20} {seconds * 1000:8.1f} ms{status}")
+    skipped = [name for name in ("analyzer_llm", "analyzer_fallback", "receipt_storage", "fraud_detector")
+               if name not in IMPORT_TIMES]
+    if skipped:
+        print(f"   Not loaded: {', '.join(skipped)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Receipt Analyzer Daemon
+Keeps HybridReceiptAnalyzer instances warm in a long-lived process and serves
+newline-delimited JSON requests over stdin/stdout or a local Unix socket.
+
+Request lines:
+    {"id": 1, "cmd": "analyze", "file": "/path/to/receipt.jpg"}
+    {"id": 2, "cmd": "health"}
+    {"id": 3, "cmd": "stats"}
+    {"id": 4, "cmd": "shutdown"}
+
+Every request gets exactly one response line carrying the same "id":
+    {"id": 1, "ok": true, "result": {...}}
+    {"id": 1, "ok": false, "error": "..."}
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+from circuit_breaker import CircuitBreaker
+
+
+Responder = Callable[[Dict[str, Any]], None]
+
+
+class AnalyzerDaemon:
+    """
+    Bounded job queue in front of a fixed pool of warm analyzer workers.
+    Each worker thread owns one HybridReceiptAnalyzer for its whole lifetime.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 64,
+                 force_fallback: bool = False, enable_fraud_detection: bool = True,
+                 hedge_delay: Optional[float] = None, hedge_deadline: Optional[float] = None):
+        """
+        Initialize the daemon (workers are started by start()).
+
+        Args:
+            workers: Number of analyzer worker threads
+            queue_size: Maximum pending analyze requests before new ones are rejected
+            force_fallback: Skip the LLM and use regex/OCR extraction only
+            enable_fraud_detection: Run duplicate/anomaly checks and store receipts
+            hedge_delay: Race OCR against the LLM, starting it after this many seconds
+            hedge_deadline: Seconds after which a finished OCR result beats a pending LLM call
+        """
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.force_fallback = force_fallback
+        self.enable_fraud_detection = enable_fraud_detection
+        self.hedge_delay = hedge_delay
+        self.hedge_deadline = hedge_deadline
+        # One breaker for all workers: they share the same LLM endpoint
+        self.circuit_breaker = CircuitBreaker.from_env()
+
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._ready = threading.Barrier(self.workers + 1)
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._init_errors = []
+        self._fraud_workers = 0
+        self._started_at = None
+        self._counters = {
+            "received": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+
+    def start(self):
+        """Start worker threads and wait until every analyzer is initialized"""
+        self._started_at = time.time()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"analyzer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._ready.wait()
+        if self._init_errors:
+            self.stop()
+            raise RuntimeError(f"Analyzer worker failed to start: {self._init_errors[0]}")
+
+    def stop(self, timeout: float = 30.0):
+        """Let queued work drain, then stop the workers"""
+        self._stop.set()
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _worker_loop(self):
+        from analyzer import HybridReceiptAnalyzer
+
+        try:
+            analyzer = HybridReceiptAnalyzer(
+                force_fallback=self.force_fallback,
+                enable_fraud_detection=self.enable_fraud_detection,
+                hedge_delay=self.hedge_delay,
+                hedge_deadline=self.hedge_deadline,
+                circuit_breaker=self.circuit_breaker
+            )
+        except Exception as e:
+            self._init_errors.append(f"{type(e).__name__}: {e}")
+            self._ready.wait()
+            return
+        if getattr(analyzer, 'fraud_detector', None) is not None:
+            with self._stats_lock:
+                self._fraud_workers += 1
+        self._ready.wait()
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            request, respond, enqueued_at = job
+            started = time.perf_counter()
+            try:
+                result = analyzer.analyze(request['file'])
+                response = {"id": request.get('id'), "ok": True, "result": result}
+                counter = "completed"
+            except Exception as e:
+                response = {"id": request.get('id'), "ok": False, "error": f"{type(e).__name__}: {e}"}
+                counter = "failed"
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._counters[counter] += 1
+                self._latencies.append((started - enqueued_at, finished - started))
+
+            respond(response)
+
+    def handle(self, request: Dict[str, Any], respond: Responder):
+        """
+        Dispatch one request. Analyze requests are queued; everything else is answered inline.
+
+        Args:
+            request: Parsed request object
+            respond: Callable that writes a response object back to the client
+        """
+        cmd = request.get('cmd', 'analyze')
+        req_id = request.get('id')
+
+        if cmd == 'health':
+            respond({"id": req_id, "ok": True, "result": self.health()})
+        elif cmd == 'stats':
+            respond({"id": req_id, "ok": True, "result": self.stats()})
+        elif cmd == 'shutdown':
+            respond({"id": req_id, "ok": True, "result": {"status": "shutting_down"}})
+            self._stop.set()
+        elif cmd == 'analyze':
+            if not request.get('file'):
+                respond({"id": req_id, "ok": False, "error": "Missing 'file'"})
+                return
+            if self.stopped:
+                respond({"id": req_id, "ok": False, "error": "Daemon is shutting down"})
+                return
+
+            with self._stats_lock:
+                self._counters["received"] += 1
+            try:
+                self._jobs.put_nowait((request, respond, time.perf_counter()))
+            except queue.Full:
+                with self._stats_lock:
+                    self._counters["rejected"] += 1
+                respond({"id": req_id, "ok": False, "error": "Queue full", "retryable": True})
+        else:
+            respond({"id": req_id, "ok": False, "error": f"Unknown command: {cmd}"})
+
+    def health(self) -> Dict[str, Any]:
+        """Liveness information"""
+        alive = sum(1 for t in self._threads if t.is_alive())
+        # Fraud detection can fail to initialize without stopping a worker
+        fraud_ok = not self.enable_fraud_detection or self._fraud_workers == self.workers
+        return {
+            "status": "ok" if alive == self.workers and fraud_ok and not self.stopped else "degraded",
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "workers_alive": alive,
+            "fraud_detection_workers": self._fraud_workers,
+            "queue_depth": self._jobs.qsize(),
+            "queue_size": self.queue_size,
+            "uptime_seconds": round(time.time() - self._started_at, 1) if self._started_at else 0.0,
+            "llm_circuit": self.circuit_breaker.state,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters and latency over the most recent requests"""
+        with self._stats_lock:
+            counters = dict(self._counters)
+            samples = list(self._latencies)
+
+        def summary(values):
+            if not values:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+            values = sorted(values)
+            return {
+                "mean": round(sum(values) / len(values), 4),
+                "p50": round(values[int(0.50 * (len(values) - 1))], 4),
+                "p95": round(values[int(0.95 * (len(values) - 1))], 4),
+                "max": round(values[-1], 4),
+            }
+
+        return {
+            **counters,
+            "in_queue": self._jobs.qsize(),
+            "window": len(samples),
+            "queue_wait_seconds": summary([s[0] for s in samples]),
+            "service_seconds": summary([s[1] for s in samples]),
+            "llm_circuit": self.circuit_breaker.stats(),
+        }
+
+
+def _parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one request line, returning None for blank lines"""
+    line = line.strip()
+    if not line:
+        return None
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+    return request
+
+
+def serve_stdio(daemon: AnalyzerDaemon):
+    """Serve newline-delimited JSON on stdin/stdout until EOF or shutdown"""
+    out = sys.stdout
+    # Analyzer progress output must not corrupt the response stream
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def respond(response: Dict[str, Any]):
+        line = json.dumps(response, ensure_ascii=False, default=str)
+        with write_lock:
+            out.write(line + "\n")
+            out.flush()
+
+    for line in sys.stdin:
+        try:
+            request = _parse_line(line)
+        except ValueError as e:
+            respond({"id": None, "ok": False, "error": f"Bad request: {e}"})
+            continue
+        if request is not None:
+            daemon.handle(request, respond)
+        if daemon.stopped:
+            break
+
+    daemon.stop()
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    """One client connection; requests may be pipelined and answered out of order"""
+
+    def handle(self):
+        daemon = self.server.daemon
+        write_lock = threading.Lock()
+        pending = threading.Semaphore(0)
+        outstanding = [0]
+
+        def respond(response: Dict[str, Any]):
+            line = json.dumps(response, ensure_ascii=False, default=str) + "\n"
+            try:
+                with write_lock:
+                    self.wfile.write(line.encode('utf-8'))
+                    self.wfile.flush()
+            except OSError:
+                pass
+            pending.release()
+
+        for raw in self.rfile:
+            try:
+                request = _parse_line(raw.decode('utf-8'))
+            except ValueError as e:
+                outstanding[0] += 1
+                respond({"id": None, "ok": False, "error": f"Bad request: {e}"})
+                continue
+            if request is None:
+                continue
+            outstanding[0] += 1
+            daemon.handle(request, respond)
+            if daemon.stopped:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                break
+
+        # Keep the connection open until every request on it has been answered
+        for _ in range(outstanding[0]):
+            pending.acquire()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_unix_socket(daemon: AnalyzerDaemon, socket_path: str):
+    """Serve newline-delimited JSON on a Unix domain socket until shutdown"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = _UnixServer(socket_path, _SocketHandler)
+    server.daemon = daemon
+    os.chmod(socket_path, 0o600)
+    print(f"🛰️  Listening on {socket_path}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived receipt analysis worker")
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('ANALYZER_WORKERS', '2')),
+                        help="Warm analyzer workers (default: ANALYZER_WORKERS or 2)")
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv('ANALYZER_QUEUE_SIZE', '64')),
+                        help="Max pending requests before rejecting (default: ANALYZER_QUEUE_SIZE or 64)")
+    parser.add_argument("--fallback", action="store_true", help="Force regex/OCR extraction (no LLM)")
+    parser.add_argument("--no-fraud", action="store_true", help="Disable fraud detection and storage")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Race OCR against slow LLM calls (ANALYZER_HEDGE_DELAY / ANALYZER_HEDGE_DEADLINE)")
+    args = parser.parse_args()
+
+    from analyzer import hedge_settings
+    hedge_delay, hedge_deadline = hedge_settings() if args.hedge else (None, None)
+
+    daemon = AnalyzerDaemon(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        force_fallback=args.fallback,
+        enable_fraud_detection=not args.no_fraud,
+        hedge_delay=hedge_delay,
+        hedge_deadline=hedge_deadline
+    )
+
+    # Analyzer init chatter goes to stderr in both modes
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    daemon.start()
+    sys.stdout = stdout
+    print(f"✅ {daemon.workers} analyzer worker(s) ready", file=sys.stderr)
+
+    if args.socket:
+        serve_unix_socket(daemon, args.socket)
+    else:
+        serve_stdio(daemon)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,29 @@ Expense Analyzer - Phase 1: Basic Extraction
 Extracts amount, vendor, date from receipt images/PDFs
 """
 
-import re
 import json
 import sys
+import time
+import importlib.util
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
 
 try:
-    import pytesseract
     from PIL import Image
-    from pdf2image import convert_from_path
+    # pytesseract pulls in pandas when installed, so it is imported on first OCR
+    # call; cache hits and --import-times runs never pay for it
+    if importlib.util.find_spec("pytesseract") is None:
+        raise ImportError("No module named 'pytesseract'")
 except ImportError as e:
     print(f"Error: Missing required library - {e}")
-    print("Install with: pip install pytesseract pillow pdf2image")
+    print("Install with: pip install pytesseract pillow")
     sys.exit(1)
 
+from image_context import ImageContext, ensure_context
+from ocr_preprocess import OCRPreprocessor
+from receipt_lexer import tokenize, parse_date, TOTAL_PATTERNS, DATE_PATTERNS, VENDOR_SKIP_KEYWORDS
+
 # Import keyword classifier for fallback categorization
 try:
     from keyword_classifier import KeywordClassifier
@@ -31,38 +38,25 @@ except ImportError:
 class ReceiptAnalyzer:
     """Analyzes receipt images and extracts key information"""
     
-    def __init__(self):
+    def __init__(self, preprocessor: Optional[OCRPreprocessor] = None):
         self.currency_symbols = ['₹', 'Rs.', 'Rs', 'INR', 'USD', '$', '€', '£']
         # Initialize keyword classifier if available
         self.classifier = KeywordClassifier() if CLASSIFIER_AVAILABLE else None
+        # Image preparation before OCR (configured by OCR_PREPROCESS unless given)
+        self.preprocessor = preprocessor if preprocessor is not None else OCRPreprocessor.from_env()
         
-    def load_image(self, file_path: str) -> Image.Image:
+    def load_image(self, file_path: str, image_context: Optional[ImageContext] = None) -> Image.Image:
         """Load image from file path (supports jpg, png, pdf)"""
-        path = Path(file_path)
-        
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        # Handle PDF
-        if path.suffix.lower() == '.pdf':
-            print("📄 Converting PDF to image...")
-            images = convert_from_path(file_path, first_page=1, last_page=1)
-            return images[0]
-        
-        # Handle images
-        elif path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
-            return Image.open(file_path)
-        
-        else:
-            raise ValueError(f"Unsupported file format: {path.suffix}")
+        return ensure_context(file_path, image_context).image
     
     def extract_text(self, image: Image.Image) -> str:
         """Extract text from image using OCR"""
         print("🔍 Running OCR extraction...")
+        import pytesseract
         text = pytesseract.image_to_string(image)
         return text
     
-    def extract_amount(self, text: str) -> Optional[Dict[str, Any]]:
+    def extract_amount(self, text) -> Optional[Dict[str, Any]]:
         """Extract monetary amount using a two-stage hybrid approach.
         
         Stage 1: Look for explicit TOTAL/GRAND TOTAL/AMOUNT DUE labels
@@ -72,158 +66,115 @@ class ReceiptAnalyzer:
         - TOTAL is clearly labeled (most common)
         - Final amount appears after subtotal/tax/fees without explicit TOTAL label
         - Multiple amounts exist (items, subtotal, tax, delivery, total)
+        
+        Accepts raw OCR text or a ReceiptText table from tokenize().
         """
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+        receipt = tokenize(text)
+        lines = receipt.lines
         
         # Stage 1: Explicit total patterns (highest confidence)
-        total_patterns = [
-            # Match "TOTAL: 649" or "Total: ₹649" or "Grand Total: 649.00"
-            (r'(?:^|\b)(?:grand\s+)?total\s*[:=]\s*(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)', 100),
-            # Match "Amount Due: 649" or "Net Amount: 649"
-            (r'(?:amount\s+due|net\s+amount|amount\s+payable|balance\s+due)\s*[:=]\s*(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)', 100),
-            # Match "649 TOTAL" or "₹649 (Total)"
-            (r'(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)\s*(?:\()?(?:total|grand\s+total)(?:\))?', 90),
-        ]
-        
-        for pattern, confidence in total_patterns:
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            if matches:
-                # Prefer the last match (usually the final total)
-                match = matches[-1]
-                amt_str = match.group(1).replace(',', '')
+        for pattern_index in range(len(TOTAL_PATTERNS)):
+            # Prefer the last match (usually the final total)
+            match = receipt.total_match(pattern_index)
+            if match:
+                idx, amt_str = match
                 try:
-                    amount = float(amt_str)
-                    # Get the line containing this match
-                    for idx, line in enumerate(lines):
-                        if match.group(0) in line:
-                            return {
-                                "amount": amount,
-                                "currency": self._detect_currency(text),
-                                "raw_amounts_found": self._get_all_amounts(text),
-                                "chosen_line": line,
-                                "chosen_line_index": idx,
-                                "extraction_method": "explicit_total_pattern"
-                            }
+                    amount = float(amt_str.replace(',', ''))
                 except ValueError:
                     continue
+                return {
+                    "amount": amount,
+                    "currency": receipt.currency,
+                    "raw_amounts_found": receipt.all_amounts(),
+                    "chosen_line": lines[idx],
+                    "chosen_line_index": idx,
+                    "extraction_method": "explicit_total_pattern"
+                }
         
         # Stage 2: Smart heuristics (when no explicit TOTAL label exists)
         # Build candidates with contextual scoring
         candidates = []
-        num_re = re.compile(r'(\d{1,3}(?:[,\d]*)?(?:\.\d{1,2})?)')
         
-        for idx, line in enumerate(lines):
-            line_lower = line.lower()
+        for raw, amt, idx in receipt.numbers:
+            # Skip very small amounts (<10) or very large (likely IDs)
+            if amt < 10 or amt > 1000000:
+                continue
+            
+            # Skip obvious years
+            if 1900 <= amt <= 2100:
+                continue
+            
+            # Skip long numeric strings (likely invoice/order numbers)
+            if len(raw.replace(',', '').replace('.', '')) >= 6:
+                continue
+            
+            flags = receipt.line_flags(idx)
             
             # Skip lines that are clearly not totals
-            if any(skip in line_lower for skip in ['invoice no', 'order no', 'bill no', 'receipt no', 'gst no', 'date:', 'time:']):
+            if 'id_line' in flags:
                 continue
             
-            for m in num_re.finditer(line):
-                amt_str = m.group(0).replace(',', '')
-                try:
-                    amt = float(amt_str)
-                except ValueError:
-                    continue
-                
-                # Skip very small amounts (<10) or very large (likely IDs)
-                if amt < 10 or amt > 1000000:
-                    continue
-                
-                # Skip obvious years
-                if 1900 <= amt <= 2100:
-                    continue
-                
-                # Skip long numeric strings (likely invoice/order numbers)
-                if len(m.group(0).replace(',', '').replace('.', '')) >= 6:
-                    continue
-                
-                score = 0
-                
-                # Positive signals
-                # Bottom 20% of receipt (totals usually at bottom)
-                if idx >= len(lines) * 0.8:
-                    score += 50
-                
-                # Amount is larger (totals are usually the largest amount)
-                score += min(amt / 20.0, 30)
-                
-                # Line contains total-related keywords (even if not explicit pattern)
-                if any(kw in line_lower for kw in ['total', 'amount due', 'balance', 'payable']):
-                    score += 40
-                
-                # Negative signals
-                # Item lines (1x, 2x, etc.)
-                if re.search(r'\b\d+\s*x\b', line_lower):
-                    score -= 80
-                
-                # Subtotal, tax, delivery, discount lines (not the final total)
-                if any(kw in line_lower for kw in ['subtotal', 'sub total', 'sub-total']):
-                    score -= 60
-                if any(kw in line_lower for kw in ['tax', 'gst', 'vat', 'cgst', 'sgst']):
-                    score -= 50
-                if any(kw in line_lower for kw in ['delivery', 'shipping', 'service charge', 'tip']):
-                    score -= 50
-                if any(kw in line_lower for kw in ['discount', 'coupon', 'promo']):
-                    score -= 50
-                
-                candidates.append((amt, idx, line, score))
+            score = 0
+            
+            # Positive signals
+            # Bottom 20% of receipt (totals usually at bottom)
+            if idx >= len(lines) * 0.8:
+                score += 50
+            
+            # Amount is larger (totals are usually the largest amount)
+            score += min(amt / 20.0, 30)
+            
+            # Line contains total-related keywords (even if not explicit pattern)
+            if 'total' in flags:
+                score += 40
+            
+            # Negative signals
+            # Item lines (1x, 2x, etc.)
+            if 'item' in flags:
+                score -= 80
+            
+            # Subtotal, tax, delivery, discount lines (not the final total)
+            if 'subtotal' in flags:
+                score -= 60
+            if 'tax' in flags:
+                score -= 50
+            if 'fee' in flags:
+                score -= 50
+            if 'discount' in flags:
+                score -= 50
+            
+            candidates.append((amt, idx, lines[idx], score))
         
         if not candidates:
             return None
         
-        # Sort by score (desc), then by line index (desc - prefer later lines)
-        candidates.sort(key=lambda x: (x[3], x[1]), reverse=True)
-        best = candidates[0]
+        # Highest score, then highest line index (prefer later lines)
+        best = max(candidates, key=lambda x: (x[3], x[1]))
         
         return {
             "amount": best[0],
-            "currency": self._detect_currency(text),
-            "raw_amounts_found": self._get_all_amounts(text),
+            "currency": receipt.currency,
+            "raw_amounts_found": receipt.all_amounts(),
             "chosen_line": best[2],
             "chosen_line_index": best[1],
             "extraction_method": "smart_heuristics"
         }
     
-    def _get_all_amounts(self, text: str) -> list:
+    def _get_all_amounts(self, text) -> list:
         """Extract all numeric amounts from text for metadata"""
-        num_re = re.compile(r'(\d{1,3}(?:[,\d]*)?(?:\.\d{1,2})?)')
-        amounts = set()
-        for m in num_re.finditer(text):
-            amt_str = m.group(0).replace(',', '')
-            try:
-                amt = float(amt_str)
-                if amt >= 1 and amt < 1000000:  # Reasonable amount range
-                    amounts.add(amt)
-            except ValueError:
-                continue
-        return sorted(amounts)
+        return tokenize(text).all_amounts()
     
-    def _detect_currency(self, text: str) -> str:
+    def _detect_currency(self, text) -> str:
         """Detect currency from text"""
-        if '₹' in text or 'INR' in text or 'Rs' in text:
-            return 'INR'
-        elif '$' in text or 'USD' in text:
-            return 'USD'
-        elif '€' in text or 'EUR' in text:
-            return 'EUR'
-        elif '£' in text or 'GBP' in text:
-            return 'GBP'
-        return 'INR'  # Default to INR
+        return tokenize(text).currency
     
-    def extract_date(self, text: str) -> Optional[Dict[str, Any]]:
+    def extract_date(self, text) -> Optional[Dict[str, Any]]:
         """Extract date from text"""
-        date_patterns = [
-            r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b',  # DD-MM-YYYY or DD/MM/YYYY
-            r'\b(\d{2,4}[-/]\d{1,2}[-/]\d{1,2})\b',  # YYYY-MM-DD
-            r'\b(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4})\b',  # DD Month YYYY
-            r'\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{2,4})\b',  # Month DD, YYYY
-        ]
+        receipt = tokenize(text)
         
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                date_str = match.group(1)
+        for pattern_index in range(len(DATE_PATTERNS)):
+            date_str = receipt.date_match(pattern_index)
+            if date_str:
                 parsed_date = self._parse_date(date_str)
                 if parsed_date:
                     return {
@@ -235,35 +186,17 @@ class ReceiptAnalyzer:
     
     def _parse_date(self, date_str: str) -> Optional[datetime]:
         """Parse date string to datetime object"""
-        date_formats = [
-            "%d-%m-%Y", "%d/%m/%Y", "%d-%m-%y", "%d/%m/%y",
-            "%Y-%m-%d", "%Y/%m/%d",
-            "%d %b %Y", "%d %B %Y",
-            "%b %d, %Y", "%B %d, %Y",
-            "%b %d %Y", "%B %d %Y",
-        ]
-        
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        
-        return None
+        return parse_date(date_str)
     
-    def extract_vendor(self, text: str) -> Optional[Dict[str, Any]]:
+    def extract_vendor(self, text) -> Optional[Dict[str, Any]]:
         """Extract vendor/merchant name from text"""
-        lines = text.strip().split('\n')
-        
         # Usually vendor name is in the first few lines
         vendor_candidates = []
-        for i, line in enumerate(lines[:5]):  # Check first 5 lines
-            line = line.strip()
+        for line in tokenize(text).head_lines(5):  # Check first 5 lines
             # Skip empty lines and lines with only numbers/symbols
             if line and len(line) > 3 and not line.replace(' ', '').isdigit():
                 # Skip common receipt keywords
-                skip_keywords = ['tax', 'invoice', 'bill', 'receipt', 'gst', 'date', 'time']
-                if not any(keyword in line.lower() for keyword in skip_keywords):
+                if not any(keyword in line.lower() for keyword in VENDOR_SKIP_KEYWORDS):
                     vendor_candidates.append(line)
         
         if vendor_candidates:
@@ -276,24 +209,32 @@ class ReceiptAnalyzer:
         
         return None
     
-    def analyze(self, file_path: str) -> Dict[str, Any]:
+    def analyze(self, file_path: str, image_context: Optional[ImageContext] = None) -> Dict[str, Any]:
         """Main analysis function"""
         print(f"\n{'='*50}")
         print(f"🧾 Analyzing Receipt: {Path(file_path).name}")
         print(f"{'='*50}\n")
         
         # Load image
-        image = self.load_image(file_path)
+        image = self.load_image(file_path, image_context)
         print(f"✅ Image loaded: {image.size[0]}x{image.size[1]} pixels")
         
+        # Prepare image for OCR
+        ocr_image, preprocessing = self.preprocessor.process(image)
+        if ocr_image.size != image.size:
+            print(f"✅ Preprocessed for OCR: {ocr_image.size[0]}x{ocr_image.size[1]} pixels")
+        
         # Extract text
-        extracted_text = self.extract_text(image)
+        ocr_start = time.perf_counter()
+        extracted_text = self.extract_text(ocr_image)
+        preprocessing["ocr_ms"] = round((time.perf_counter() - ocr_start) * 1000, 2)
         print(f"✅ Text extracted: {len(extracted_text)} characters\n")
         
-        # Parse information
-        amount_data = self.extract_amount(extracted_text)
-        date_data = self.extract_date(extracted_text)
-        vendor_data = self.extract_vendor(extracted_text)
+        # Parse information (one lexer pass shared by all extractors)
+        receipt_text = tokenize(extracted_text)
+        amount_data = self.extract_amount(receipt_text)
+        date_data = self.extract_date(receipt_text)
+        vendor_data = self.extract_vendor(receipt_text)
         
         # Classify using keywords (fallback method)
         category_data = {'category': 'other', 'confidence': 0.0}
@@ -325,6 +266,7 @@ class ReceiptAnalyzer:
                 "classification_method": category_data.get("method", "none"),  # NEW
                 "classification_confidence": category_data.get("confidence", 0.0),  # NEW
                 "matched_keywords": category_data.get("matched_keywords", []),  # NEW
+                "preprocessing": preprocessing,
             }
         }
         
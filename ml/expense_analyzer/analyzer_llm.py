@@ -4,10 +4,17 @@ Uses receipt-ocr library with OpenAI/Gemini for structured data extraction
 """
 
 import os
+import time
+import random
+import asyncio
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Union, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
 try:
     from receipt_ocr.processors import ReceiptProcessor
     from receipt_ocr.providers import OpenAIProvider
@@ -17,13 +24,67 @@ except ImportError:
     print("Warning: receipt-ocr not installed. Install with: pip install receipt-ocr")
 
 
+# HTTP statuses worth retrying: request timeout, conflict, rate limit, server errors
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM call failure is transient (timeouts, connection drops, 429/5xx)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return any(cls.__name__ in ('APIConnectionError', 'APITimeoutError') for cls in type(error).__mro__)
+
+
+class CallTimeoutError(TimeoutError):
+    """An LLM call outlived its timeout; `finished` is set once the abandoned call ends"""
+
+    def __init__(self, message: str, finished: threading.Event):
+        super().__init__(message)
+        self.finished = finished
+
+
+def call_with_timeout(fn, timeout: Optional[float], *args):
+    """
+    Run fn(*args), raising CallTimeoutError if it takes longer than timeout seconds.
+    The call runs on a daemon thread that is abandoned on timeout (the HTTP client's
+    own timeout eventually ends it).
+    """
+    if timeout is None:
+        return fn(*args)
+
+    outcome = {}
+    done = threading.Event()
+
+    def run():
+        try:
+            outcome['result'] = fn(*args)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=run, name="llm-call", daemon=True).start()
+    if not done.wait(timeout):
+        raise CallTimeoutError(f"LLM request timed out after {timeout}s", done)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
 class LLMReceiptAnalyzer:
     """
     Advanced receipt analyzer using LLM (OpenAI/Gemini) for extraction.
     Provides higher accuracy than regex-based methods.
     """
     
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, model: Optional[str] = None,
+                 timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
         """
         Initialize LLM analyzer with API credentials.
         
@@ -31,6 +92,12 @@ class LLMReceiptAnalyzer:
             api_key: OpenAI/Gemini API key (defaults to env var OPENAI_API_KEY)
             base_url: API base URL (defaults to env var OPENAI_BASE_URL)
             model: Model name (defaults to env var OPENAI_MODEL or 'gpt-4o-mini')
+            timeout: Default per-attempt timeout in seconds (env LLM_TIMEOUT, default 60)
+            max_retries: Default retries after a transient failure (env LLM_MAX_RETRIES, default 2)
+            backoff_base: First retry waits up to this many seconds, doubling per attempt
+            backoff_max: Upper bound on a single retry wait
+            circuit_breaker: Breaker consulted once per request (sync or async);
+                CircuitOpenError is raised while it is open
         """
         if not RECEIPT_OCR_AVAILABLE:
             raise ImportError("receipt-ocr package is not installed")
@@ -41,6 +108,11 @@ class LLMReceiptAnalyzer:
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
         self.model = model or os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        self.timeout = timeout if timeout is not None else float(os.getenv('LLM_TIMEOUT', '60'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', '2'))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker
         
         if not self.api_key:
             raise ValueError(
@@ -49,6 +121,10 @@ class LLMReceiptAnalyzer:
         
         # Initialize provider and processor
         self.provider = OpenAIProvider(api_key=self.api_key, base_url=self.base_url)
+        # Retries are done here (with jitter, visible to the circuit breaker), not by the client
+        client = getattr(self.provider, 'client', None)
+        if client is not None and hasattr(client, 'with_options'):
+            self.provider.client = client.with_options(timeout=self.timeout, max_retries=0)
         self.processor = ReceiptProcessor(self.provider)
         
         # Define extraction schema
@@ -72,60 +148,222 @@ class LLMReceiptAnalyzer:
             ]
         }
     
-    def analyze(self, file_path: str) -> Dict[str, Any]:
+    def analyze(self, file_path: str, timeout: Optional[float] = None,
+                retries: Optional[int] = None) -> Dict[str, Any]:
         """
         Analyze receipt using LLM-based OCR.
         
         Args:
             file_path: Path to receipt image
+            timeout: Per-attempt timeout in seconds (defaults to self.timeout)
+            retries: Retries after transient failures (defaults to self.max_retries)
             
         Returns:
             Dictionary with extracted receipt data
+            
+        Raises:
+            CircuitOpenError: The circuit breaker is open (no call is made)
         """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.max_retries if retries is None else retries
+        self._admit()
+        
         print(f"\n{'='*50}")
         print(f"🤖 Analyzing Receipt with LLM: {Path(file_path).name}")
         print(f"{'='*50}\n")
         print(f"📡 Using model: {self.model}")
         print(f"🔍 Extracting structured data...\n")
         
-        try:
-            # Process receipt with LLM
-            result = self.processor.process_receipt(
-                file_path,
-                self.json_schema,
-                self.model,
-                response_format_type="json_object"
-            )
-            
-            # Normalize the result to match our expected format
-            normalized_result = {
-                "file": str(Path(file_path).name),
-                "timestamp": None,  # Will be set by orchestrator
-                "extracted_data": {
-                    "amount": result.get("total_amount"),
-                    "currency": result.get("currency", "INR"),
-                    "date": result.get("transaction_date"),
-                    "vendor": result.get("merchant_name"),
-                    "category": result.get("category", "other"),  # NEW: LLM-provided category
-                    "subtotal": result.get("subtotal"),
-                    "tax_amount": result.get("tax_amount"),
-                },
-                "raw_text": None,  # LLM doesn't provide raw text
-                "metadata": {
-                    "merchant_address": result.get("merchant_address"),
-                    "transaction_time": result.get("transaction_time"),
-                    "line_items": result.get("line_items", []),
-                    "extraction_method": "llm_receipt_ocr",
-                    "model_used": self.model,
-                }
+        for attempt in range(retries + 1):
+            try:
+                raw = call_with_timeout(self._extract, timeout, file_path)
+                normalized_result = self._normalize_result(raw, file_path)
+                normalized_result["metadata"]["llm_attempts"] = attempt + 1
+                print("✅ LLM extraction successful!")
+                self._record(True)
+                return normalized_result
+                
+            except Exception as e:
+                if attempt >= retries or not is_retryable(e):
+                    print(f"❌ LLM extraction failed: {str(e)}")
+                    self._record(False)
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⏳ LLM attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                # A timed-out call is still running on its abandoned thread; another
+                # attempt now would put a second call beside it on a slow endpoint
+                if isinstance(e, CallTimeoutError) and not e.finished.is_set():
+                    print("❌ LLM extraction failed: timed-out call still running, not retrying")
+                    self._record(False)
+                    raise
+    
+    def _admit(self):
+        """Ask the circuit breaker for one request; CircuitOpenError if it is open"""
+        breaker = self.circuit_breaker
+        if breaker and not breaker.allow_request():
+            raise CircuitOpenError(f"LLM circuit '{breaker.name}' is open")
+    
+    def _record(self, ok: bool):
+        """Report the outcome of an admitted request to the circuit breaker"""
+        if self.circuit_breaker:
+            if ok:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+    
+    def _backoff(self, attempt: int) -> float:
+        """Wait before retry number attempt + 1; full jitter keeps workers out of lockstep"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def _extract(self, file_path: str) -> Dict[str, Any]:
+        """Run the blocking LLM request for one receipt (no console output)"""
+        return self.processor.process_receipt(
+            file_path,
+            self.json_schema,
+            self.model,
+            response_format_type="json_object"
+        )
+    
+    def _normalize_result(self, result: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+        """Normalize the raw LLM response to match our expected format"""
+        return {
+            "file": str(Path(file_path).name),
+            "timestamp": None,  # Will be set by orchestrator
+            "extracted_data": {
+                "amount": result.get("total_amount"),
+                "currency": result.get("currency", "INR"),
+                "date": result.get("transaction_date"),
+                "vendor": result.get("merchant_name"),
+                "category": result.get("category", "other"),  # NEW: LLM-provided category
+                "subtotal": result.get("subtotal"),
+                "tax_amount": result.get("tax_amount"),
+            },
+            "raw_text": None,  # LLM doesn't provide raw text
+            "metadata": {
+                "merchant_address": result.get("merchant_address"),
+                "transaction_time": result.get("transaction_time"),
+                "line_items": result.get("line_items", []),
+                "extraction_method": "llm_receipt_ocr",
+                "model_used": self.model,
             }
+        }
+    
+    async def iter_analyze_async(self, file_paths: List[str], max_in_flight: int = 4,
+                                 timeout: Optional[float] = 60.0, retries: Optional[int] = None
+                                 ) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+        """
+        Analyze many receipts concurrently, yielding results as they complete.
+        
+        At most max_in_flight LLM calls are ever open against the endpoint. A call
+        keeps its slot until the provider call itself ends, so a call abandoned after
+        its timeout still counts (the HTTP client's own timeout eventually ends it).
+        The timeout is a deadline for the whole request, time spent waiting for a
+        slot and retries included, so a hung endpoint cannot stall a request past it.
+        Transient failures are retried and the circuit breaker is consulted exactly
+        as in analyze(); the breaker is asked once a request first gets a slot.
+        
+        Args:
+            file_paths: Receipt image paths
+            max_in_flight: Maximum concurrent LLM requests
+            timeout: Per-request deadline in seconds (None disables it)
+            retries: Retries after transient failures (defaults to self.max_retries)
             
-            print("✅ LLM extraction successful!")
-            return normalized_result
+        Yields:
+            (index into file_paths, normalized result or the exception raised)
+        """
+        retries = self.max_retries if retries is None else retries
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max_in_flight)
+        # Never more threads than slots: a call that gets a slot starts right away
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm")
+        
+        def remaining(deadline: Optional[float]) -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - loop.time())
+        
+        async def open_call(file_path: str, deadline: Optional[float]) -> Dict[str, Any]:
+            """One provider call (caller holds a slot); TimeoutError at the deadline"""
+            future = loop.run_in_executor(executor, self._extract, file_path)
+            future.add_done_callback(lambda _: slots.release())
+            done, _ = await asyncio.wait([future], timeout=remaining(deadline))
+            if not done:
+                raise TimeoutError
+            return future.result()
+        
+        async def run_one(index: int, file_path: str):
+            deadline = None if timeout is None else loop.time() + timeout
+            admitted = False
+            try:
+                for attempt in range(retries + 1):
+                    await asyncio.wait_for(slots.acquire(), remaining(deadline))
+                    if not admitted:
+                        try:
+                            self._admit()
+                        except CircuitOpenError:
+                            slots.release()
+                            raise
+                        admitted = True
+                    try:
+                        raw = await open_call(file_path, deadline)
+                    except Exception as e:
+                        delay = self._backoff(attempt)
+                        if (attempt >= retries or not is_retryable(e)
+                                or (deadline is not None and delay >= remaining(deadline))):
+                            raise
+                        await asyncio.sleep(delay)
+                        continue
+                    result = self._normalize_result(raw, file_path)
+                    result["metadata"]["llm_attempts"] = attempt + 1
+                    self._record(True)
+                    return index, result
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"LLM request timed out after {timeout}s: {file_path}")
+            except asyncio.CancelledError:
+                # Stopped early by the caller; a probe left unreported would keep the
+                # circuit half-open for good
+                if admitted:
+                    self._record(False)
+                raise
+            except Exception as e:
+                error = e
+            if admitted:
+                self._record(False)
+            return index, error
+        
+        tasks = [asyncio.ensure_future(run_one(i, p)) for i, p in enumerate(file_paths)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def analyze_many_async(self, file_paths: List[str], max_in_flight: int = 4,
+                                 timeout: Optional[float] = 60.0, retries: Optional[int] = None
+                                 ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Analyze many receipts concurrently and return results in input order.
+        
+        Args:
+            file_paths: Receipt image paths
+            max_in_flight: Maximum concurrent LLM requests
+            timeout: Per-request deadline in seconds (None disables it)
+            retries: Retries after transient failures (defaults to self.max_retries)
             
-        except Exception as e:
-            print(f"❌ LLM extraction failed: {str(e)}")
-            raise
+        Returns:
+            One entry per input path: the normalized result, or the exception raised
+        """
+        results = [None] * len(file_paths)
+        async for index, outcome in self.iter_analyze_async(file_paths, max_in_flight, timeout, retries):
+            results[index] = outcome
+        return results
+    
+    def analyze_many(self, file_paths: List[str], max_in_flight: int = 4,
+                     timeout: Optional[float] = 60.0,
+                     retries: Optional[int] = None) -> List[Union[Dict[str, Any], Exception]]:
+        """Synchronous wrapper around analyze_many_async for non-async callers"""
+        return asyncio.run(self.analyze_many_async(file_paths, max_in_flight, timeout, retries))
     
     def print_result(self, result: Dict[str, Any]):
         """Pretty print the analysis result"""
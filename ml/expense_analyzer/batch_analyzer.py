@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Batch Receipt Analyzer
+Analyzes a directory, glob or manifest of receipts across a process pool.
+Each worker process builds one HybridReceiptAnalyzer and reuses it for every file it handles.
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Iterable, Callable
+
+
+SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.pdf'}
+
+# Per-process analyzer, created once by _init_worker
+_ANALYZER = None
+
+
+def collect_files(inputs: Iterable[str], manifest: Optional[str] = None,
+                  recursive: bool = False) -> List[str]:
+    """
+    Expand directories, glob patterns and manifest entries into a list of receipt files.
+
+    Args:
+        inputs: Files, directories or glob patterns
+        manifest: Optional text file with one receipt path per line ('#' starts a comment)
+        recursive: Descend into sub-directories when an input is a directory
+
+    Returns:
+        De-duplicated list of file paths, in discovery order
+    """
+    candidates = []
+
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            walker = path.rglob('*') if recursive else path.iterdir()
+            candidates.extend(sorted(str(p) for p in walker if p.is_file()))
+        elif path.is_file():
+            candidates.append(str(path))
+        else:
+            candidates.extend(sorted(glob.glob(item, recursive=recursive)))
+
+    if manifest:
+        base_dir = Path(manifest).parent
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                entry = Path(line)
+                if not entry.is_absolute():
+                    entry = base_dir / entry
+                candidates.append(str(entry))
+
+    files = []
+    seen = set()
+    for candidate in candidates:
+        if Path(candidate).suffix.lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        if candidate not in seen:
+            seen.add(candidate)
+            files.append(candidate)
+
+    return files
+
+
+def _init_worker(force_fallback: bool, enable_fraud_detection: bool, verbose: bool):
+    """Process pool initializer: build the analyzer once per worker"""
+    global _ANALYZER
+
+    if not verbose:
+        # The analyzers narrate every step; keep worker output off the console
+        sys.stdout = open(os.devnull, 'w')
+
+    from analyzer import HybridReceiptAnalyzer
+    _ANALYZER = HybridReceiptAnalyzer(
+        force_fallback=force_fallback,
+        enable_fraud_detection=enable_fraud_detection
+    )
+
+
+def _analyze_one(file_path: str) -> Dict[str, Any]:
+    """Analyze a single file with the worker's analyzer, never raising"""
+    start = time.perf_counter()
+    try:
+        result = _ANALYZER.analyze(file_path)
+        return {
+            "file": file_path,
+            "status": "ok",
+            "elapsed": time.perf_counter() - start,
+            "worker_pid": os.getpid(),
+            "result": result,
+        }
+    except Exception as e:
+        return {
+            "file": file_path,
+            "status": "error",
+            "elapsed": time.perf_counter() - start,
+            "worker_pid": os.getpid(),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float, workers: int) -> Dict[str, Any]:
+    """
+    Build the batch summary (throughput, latency and failures).
+
+    Args:
+        records: Per-file records returned by _analyze_one (without results is fine)
+        wall_time: Total elapsed seconds for the batch
+        workers: Number of worker processes used
+
+    Returns:
+        Summary dictionary
+    """
+    succeeded = [r for r in records if r['status'] == 'ok']
+    failed = [r for r in records if r['status'] != 'ok']
+    latencies = sorted(r['elapsed'] for r in records)
+
+    methods = {}
+    for record in succeeded:
+        method = record.get('extraction_method') or 'unknown'
+        methods[method] = methods.get(method, 0) + 1
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "workers": workers,
+        "total_files": len(records),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "duplicates_detected": sum(1 for r in succeeded if r.get('duplicate_detected')),
+        "wall_time_seconds": round(wall_time, 3),
+        "throughput_files_per_second": round(len(records) / wall_time, 3) if wall_time > 0 else 0.0,
+        "latency_seconds": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 3),
+            "p95": round(_percentile(latencies, 95), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "extraction_methods": methods,
+        "failures": [{"file": r['file'], "error": r['error']} for r in failed],
+    }
+
+
+def run_batch(files: List[str], workers: int = None, force_fallback: bool = False,
+              enable_fraud_detection: bool = True, output_dir: str = "batch_output",
+              verbose: bool = False,
+              on_record: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Analyze files across a process pool and write results to output_dir.
+
+    Per-file results are streamed to <output_dir>/results.jsonl as they complete and
+    the summary is written to <output_dir>/summary.json.
+
+    Args:
+        files: Receipt files to analyze
+        workers: Worker processes (defaults to CPU count; 1 runs in-process)
+        force_fallback: Skip the LLM and use regex/OCR extraction only
+        enable_fraud_detection: Run duplicate/anomaly checks and store receipts
+        output_dir: Directory for results.jsonl and summary.json
+        verbose: Let workers print their analyzer output
+        on_record: Optional callback invoked with each per-file record
+
+    Returns:
+        Summary dictionary
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    records = []
+    start = time.perf_counter()
+
+    with open(out_dir / "results.jsonl", 'w', encoding='utf-8') as results_file:
+        def handle(record: Dict[str, Any]):
+            results_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+            # Keep only the light-weight fields in memory for the summary
+            result = record.get('result') or {}
+            records.append({
+                "file": record['file'],
+                "status": record['status'],
+                "elapsed": record['elapsed'],
+                "error": record.get('error'),
+                "extraction_method": result.get('metadata', {}).get('extraction_method'),
+                "duplicate_detected": result.get('fraud_checks', {}).get('duplicate_detected', False),
+            })
+            if on_record:
+                on_record(record)
+
+        if workers == 1:
+            # In-process: silence the analyzer around its own calls only (not the caller's
+            # stdout for good, as _init_worker does in a worker process)
+            with open(os.devnull, 'w') as devnull:
+                quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+                with quiet:
+                    _init_worker(force_fallback, enable_fraud_detection, verbose=True)
+                for file_path in files:
+                    with quiet:
+                        record = _analyze_one(file_path)
+                    handle(record)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(force_fallback, enable_fraud_detection, verbose)
+            ) as executor:
+                futures = [executor.submit(_analyze_one, f) for f in files]
+                for future in as_completed(futures):
+                    handle(future.result())
+
+    summary = summarize(records, time.perf_counter() - start, workers)
+    with open(out_dir / "summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many receipts across a process pool")
+    parser.add_argument("inputs", nargs="*", help="Receipt files, directories or glob patterns")
+    parser.add_argument("--manifest", help="Text file listing one receipt path per line")
+    parser.add_argument("--recursive", action="store_true", help="Descend into sub-directories")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output-dir", default="batch_output", help="Where results.jsonl/summary.json go")
+    parser.add_argument("--fallback", action="store_true", help="Force regex/OCR extraction (no LLM)")
+    parser.add_argument("--no-fraud", action="store_true", help="Disable fraud detection and storage")
+    parser.add_argument("--verbose", action="store_true", help="Show analyzer output from workers")
+    args = parser.parse_args()
+
+    files = collect_files(args.inputs, manifest=args.manifest, recursive=args.recursive)
+    if not files:
+        print("No receipt files found")
+        sys.exit(1)
+
+    print(f"📦 Analyzing {len(files)} receipt(s) with {args.workers or os.cpu_count()} worker(s)...")
+
+    done = [0]
+
+    def progress(record):
+        done[0] += 1
+        if record['status'] != 'ok':
+            print(f"❌ {record['file']}: {record['error']}")
+        if done[0] % 100 == 0:
+            print(f"   {done[0]}/{len(files)} done")
+
+    summary = run_batch(
+        files,
+        workers=args.workers,
+        force_fallback=args.fallback,
+        enable_fraud_detection=not args.no_fraud,
+        output_dir=args.output_dir,
+        verbose=args.verbose,
+        on_record=progress
+    )
+
+    print("\n" + "="*50)
+    print("📊 BATCH SUMMARY")
+    print("="*50)
+    print(f"Files:       {summary['total_files']}")
+    print(f"Succeeded:   {summary['succeeded']}")
+    print(f"Failed:      {summary['failed']}")
+    print(f"Wall time:   {summary['wall_time_seconds']:.1f}s")
+    print(f"Throughput:  {summary['throughput_files_per_second']:.2f} files/s")
+    print(f"Latency p50: {summary['latency_seconds']['p50']:.2f}s  p95: {summary['latency_seconds']['p95']:.2f}s")
+    print("="*50)
+    print(f"Results saved to: {Path(args.output_dir) / 'results.jsonl'}")
+
+    if summary['failed']:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
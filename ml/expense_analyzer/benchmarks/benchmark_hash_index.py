@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate image-hash search: multi-index hashing (HammingIndex) vs a
+full Hamming scan of every stored hash, at 1M stored 64-bit hashes.
+
+Stored hashes are random plus clusters of near copies (a few bits flipped), like
+re-photographed receipts. Also checks that the index returns exactly what the
+scan finds.
+
+Usage:
+    python benchmarks/benchmark_hash_index.py [--hashes 1000000] [--queries 200] [--distance 5] [--seed 7]
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from hash_index import HammingIndex
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = hasattr(np, "bitwise_count")
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+def make_hashes(n, seed):
+    rng = random.Random(seed)
+    hashes = [rng.getrandbits(64) for _ in range(n * 9 // 10)]
+    while len(hashes) < n:
+        value = rng.choice(hashes)
+        for p in rng.sample(range(64), rng.randint(1, 8)):
+            value ^= 1 << p
+        hashes.append(value)
+    rng.shuffle(hashes)
+    return hashes
+
+
+def scan(hashes, query, max_distance):
+    """What every search costs without an index"""
+    return sorted((d, i) for i, h in enumerate(hashes) if (d := (h ^ query).bit_count()) <= max_distance)
+
+
+def numpy_scan(array, query, max_distance):
+    distances = np.bitwise_count(array ^ np.uint64(query))
+    hits = np.flatnonzero(distances <= max_distance)
+    return sorted(zip(distances[hits].tolist(), hits.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hashes", type=int, default=1000000, help="Stored hashes")
+    parser.add_argument("--queries", type=int, default=200, help="Near-duplicate searches to time")
+    parser.add_argument("--distance", type=int, default=5, help="Max Hamming distance")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    args = parser.parse_args()
+
+    hashes = make_hashes(args.hashes, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = []
+    for _ in range(args.queries):
+        value = rng.choice(hashes)
+        for p in rng.sample(range(64), rng.randint(0, args.distance + 2)):
+            value ^= 1 << p
+        queries.append(value)
+
+    start = time.perf_counter()
+    index = HammingIndex()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [index.search(q, args.distance) for q in queries]
+    index_s = time.perf_counter() - start
+    found = sum(len(r) for r in results)
+
+    # The Python scan is slow at 1M; time it on a sample of the queries
+    sample = queries[:max(1, min(10, len(queries)))]
+    start = time.perf_counter()
+    expected = [scan(hashes, q, args.distance) for q in sample]
+    scan_s = (time.perf_counter() - start) / len(sample)
+    mismatches = sum(1 for q, e in zip(sample, expected)
+                     if index.search(q, args.distance) != [(i, d) for d, i in e])
+
+    n = args.hashes
+    print(f"\nStored hashes:  {n}  (max distance {args.distance}, {len(queries)} queries, {found} matches)")
+    print(f"Index build:    {build_s:9.2f} s")
+    print(f"Index search:   {index_s / len(queries) * 1000:9.3f} ms/query")
+    print(f"Python scan:    {scan_s * 1000:9.3f} ms/query  ({scan_s / (index_s / len(queries)):.1f}x index time)")
+
+    if NUMPY_AVAILABLE:
+        array = np.array(hashes, dtype=np.uint64)
+        start = time.perf_counter()
+        numpy_results = [numpy_scan(array, q, args.distance) for q in queries]
+        numpy_s = (time.perf_counter() - start) / len(queries)
+        mismatches += sum(1 for r, e in zip(results, numpy_results) if r != [(i, d) for d, i in e])
+        print(f"NumPy scan:     {numpy_s * 1000:9.3f} ms/query  ({numpy_s / (index_s / len(queries)):.1f}x index time)")
+
+    print(f"Mismatches:     {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
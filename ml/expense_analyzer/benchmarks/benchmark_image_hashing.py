@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark image-hash throughput: the previous full-decode LANCZOS aHash built from
+Python lists vs image_hashing (draft-mode JPEG decode, NumPy aHash/dHash/pHash).
+
+Every receipt in samples/ is hashed as-is and as a simulated phone photo
+(~3000px JPEG). Also reports how many bits the draft-decoded hashes differ from
+the full-decode ones.
+
+Usage:
+    python benchmarks/benchmark_image_hashing.py [--repeat 3]
+"""
+
+import io
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from PIL import Image
+
+from image_hashing import compute_hashes, HASH_KINDS
+from hash_index import hamming_distance
+
+
+def legacy_average_hash(data: bytes) -> str:
+    """Previous ReceiptStorage.generate_image_hash"""
+    with Image.open(io.BytesIO(data)) as img:
+        small = img.convert('L').resize((8, 8), Image.Resampling.LANCZOS)
+        pixels = list(small.tobytes())
+        avg = sum(pixels) / len(pixels)
+        bits = ''.join(['1' if p > avg else '0' for p in pixels])
+        return hex(int(bits, 2))[2:].zfill(16)
+
+
+def phone_photo(data: bytes) -> bytes:
+    """Re-encode a receipt as a ~3000px tall JPEG"""
+    with Image.open(io.BytesIO(data)) as img:
+        scale = 3000 / img.height
+        big = img.convert('RGB').resize((int(img.width * scale), 3000), Image.Resampling.BICUBIC)
+    out = io.BytesIO()
+    big.save(out, 'JPEG', quality=90)
+    return out.getvalue()
+
+
+def throughput(fn, images, repeat):
+    """Best images/second over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in images:
+            fn(data)
+        best = min(best, time.perf_counter() - start)
+    return len(images) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs (best reported)")
+    args = parser.parse_args()
+
+    originals = [p.read_bytes() for p in sorted((ROOT / "samples").iterdir())
+                 if p.suffix.lower() in ('.jpg', '.jpeg', '.png')]
+    sets = {"original": originals, "phone_photo": [phone_photo(d) for d in originals]}
+
+    runs = {
+        "legacy aHash": legacy_average_hash,
+        "aHash (full decode)": lambda d: compute_hashes(d, kinds=('ahash',), draft=False),
+        "aHash (draft)": lambda d: compute_hashes(d, kinds=('ahash',)),
+        "aHash+dHash+pHash (draft)": lambda d: compute_hashes(d),
+    }
+
+    for name, images in sets.items():
+        print(f"\n{name} ({len(images)} images)")
+        baseline = None
+        for label, fn in runs.items():
+            rate = throughput(fn, images, args.repeat)
+            baseline = baseline or rate
+            print(f"  {label:28s} {rate:9.1f} images/s  ({rate / baseline:5.1f}x)")
+
+        worst = {kind: 0 for kind in HASH_KINDS}
+        for data in images:
+            full, draft = compute_hashes(data, draft=False), compute_hashes(data)
+            for kind in HASH_KINDS:
+                worst[kind] = max(worst[kind], hamming_distance(full[kind], draft[kind]))
+        legacy_same = all(legacy_average_hash(d) == compute_hashes(d, kinds=('ahash',), draft=False)['ahash']
+                          for d in images)
+        print(f"  draft vs full decode, max bits differing: {worst}")
+        print(f"  full-decode aHash identical to legacy: {legacy_same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyword categorisation: one combined trie matcher vs the previous
+per-category regex scans, over synthetic expense descriptions.
+
+Also checks that both implementations pick the same category, confidence and
+matched keywords for every description, and that classify_many() (one scan over
+the whole batch) returns exactly what classify() returns.
+
+Usage:
+    python benchmarks/benchmark_keyword_classifier.py [--descriptions 100000] [--repeat 3] [--seed 7]
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from keyword_classifier import KeywordClassifier
+
+
+# ---------------------------------------------------------------------------
+# Previous implementation (one findall per category, set-deduplicated)
+# ---------------------------------------------------------------------------
+
+def legacy_classify(classifier, text):
+    if not text.strip():
+        return 'other', 0.0, set()
+    category_scores = {}
+    category_matches = {}
+    for category, pattern in classifier.patterns.items():
+        matches = pattern.findall(text)
+        if matches:
+            unique_matches = set(m.lower() for m in matches)
+            category_scores[category] = len(unique_matches)
+            category_matches[category] = unique_matches
+    if not category_scores:
+        return 'other', 0.0, set()
+    best_category = max(category_scores, key=category_scores.get)
+    best_score = category_scores[best_category]
+    return best_category, min(0.5 + (best_score - 1) * 0.2, 0.9), category_matches[best_category]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic descriptions
+# ---------------------------------------------------------------------------
+
+FILLER = [
+    'store', 'pvt', 'ltd', 'inc', 'india', 'order', 'invoice', 'payment', 'ref', 'no',
+    'the', 'and', 'services', 'mart', 'centre', 'express', 'plus', 'daily', 'city',
+    'ubereats', 'cabin', 'parking', 'showroom', 'pens', 'gasoline', 'railways', 'idealab',
+]
+
+
+def random_description(rng, keywords) -> str:
+    words = []
+    for _ in range(rng.randint(1, 8)):
+        if rng.random() < 0.3:
+            word = rng.choice(keywords)
+        else:
+            word = rng.choice(FILLER)
+        style = rng.random()
+        if style < 0.3:
+            word = word.upper()
+        elif style < 0.5:
+            word = word.title()
+        words.append(word)
+    sep = rng.choice([' ', ' ', ' - ', ', ', '/'])
+    text = sep.join(words)
+    if rng.random() < 0.2:
+        text += f" #{rng.randint(1000, 99999)}"
+    return text
+
+
+def make_corpus(n, seed):
+    rng = random.Random(seed)
+    keywords = [kw for kws in KeywordClassifier.CATEGORIES.values() for kw in kws]
+    return [random_description(rng, keywords) for _ in range(n)]
+
+
+# ---------------------------------------------------------------------------
+
+def agrees(legacy, result) -> bool:
+    category, confidence, matched = legacy
+    if (category, confidence) != (result['category'], result['confidence']):
+        return False
+    # The old code listed up to 5 keywords in set order; compare as sets
+    ours = set(result['matched_keywords'])
+    return ours == matched if len(matched) <= 5 else ours <= matched
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--descriptions", type=int, default=100000, help="Synthetic descriptions to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs (best reported)")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus random seed")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.descriptions, args.seed)
+    classifier = KeywordClassifier()
+
+    mismatches = [text for text in corpus
+                  if not agrees(legacy_classify(classifier, text), classifier.classify(description=text))]
+    batch_mismatches = sum(a != b for a, b in zip(classifier.classify_many(corpus),
+                                                   (classifier.classify(description=text) for text in corpus)))
+
+    legacy_s = timed(lambda: [legacy_classify(classifier, text) for text in corpus], args.repeat)
+    single_s = timed(lambda: [classifier.classify(description=text) for text in corpus], args.repeat)
+    batch_s = timed(lambda: classifier.classify_many(corpus), args.repeat)
+
+    n = len(corpus)
+    print(f"\nDescriptions:   {n} ({len(set(corpus))} distinct)")
+    print(f"Legacy regexes: {legacy_s * 1000:9.1f} ms  ({legacy_s / n * 1e6:6.2f} µs/description)")
+    print(f"Combined:       {single_s * 1000:9.1f} ms  ({single_s / n * 1e6:6.2f} µs/description)")
+    print(f"classify_many:  {batch_s * 1000:9.1f} ms  ({batch_s / n * 1e6:6.2f} µs/description)")
+    print(f"Speedup:        {legacy_s / single_s:9.2f}x (batch {legacy_s / batch_s:.2f}x)")
+    print(f"Mismatches:     {len(mismatches)} (classify_many vs classify: {batch_mismatches})")
+    for text in mismatches[:5]:
+        print("-" * 40)
+        print(repr(text))
+        print("legacy:  ", legacy_classify(classifier, text))
+        print("combined:", classifier.classify(description=text))
+
+    sys.exit(1 if mismatches or batch_mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
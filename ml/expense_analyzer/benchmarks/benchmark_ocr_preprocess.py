@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark OCR latency and amount-extraction accuracy with and without preprocessing.
+
+Runs every receipt in samples/ as-is and as a simulated phone photo (upscaled to
+~4000px and slightly rotated), through each preprocessing configuration.
+Expected amounts come from the LLM analyses saved as <stem>_analysis.json.
+
+Usage:
+    python benchmarks/benchmark_ocr_preprocess.py [--repeat 3]
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+from statistics import median
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pytesseract
+from PIL import Image
+
+from analyzer_fallback import ReceiptAnalyzer
+from ocr_preprocess import OCRPreprocessor, STAGES, DEFAULT_STAGES
+
+CONFIGS = {
+    "raw": (),
+    "default": DEFAULT_STAGES,
+    "downscale": ("grayscale", "downscale"),
+    "all": STAGES,
+}
+
+
+def load_expected():
+    """Map image file name -> expected total from saved LLM analyses"""
+    expected = {}
+    for path in list(ROOT.glob("*_analysis.json")) + list((ROOT / "samples").glob("*_analysis.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("metadata", {}).get("extraction_method") == "llm_receipt_ocr":
+            expected[data["file"]] = data["extracted_data"]["amount"]
+    return expected
+
+
+def phone_photo(image: Image.Image) -> Image.Image:
+    """Simulate a large, slightly skewed phone photo of a receipt"""
+    scale = 4000 / max(image.size)
+    big = image.convert("RGB").resize((round(image.size[0] * scale), round(image.size[1] * scale)),
+                                      Image.Resampling.BICUBIC)
+    return big.rotate(2.0, resample=Image.Resampling.BICUBIC, expand=True, fillcolor="white")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3, help="OCR runs per image/config (median reported)")
+    args = parser.parse_args()
+
+    if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        print("Tesseract is not installed; see README for installation")
+        sys.exit(1)
+
+    expected = load_expected()
+    images = [p for p in sorted((ROOT / "samples").iterdir()) if p.name in expected]
+    analyzer = ReceiptAnalyzer(preprocessor=OCRPreprocessor(stages=()))
+
+    rows = []
+    for variant in ("original", "phone_photo"):
+        for config_name, stages in CONFIGS.items():
+            preprocessor = OCRPreprocessor(stages=stages)
+            latencies, correct = [], 0
+            for path in images:
+                image = Image.open(path)
+                image.load()
+                if variant == "phone_photo":
+                    image = phone_photo(image)
+
+                runs = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    prepared, _ = preprocessor.process(image)
+                    text = pytesseract.image_to_string(prepared)
+                    runs.append(time.perf_counter() - start)
+                latencies.append(median(runs))
+
+                amount = (analyzer.extract_amount(text) or {}).get("amount")
+                if amount is not None and abs(amount - expected[path.name]) < 0.01:
+                    correct += 1
+
+            rows.append((variant, config_name, sum(latencies) / len(latencies), correct, len(images)))
+
+    print(f"\n{'Variant':<12} {'Config':<8} {'Mean OCR+prep (s)':>18} {'Amount accuracy':>16}")
+    print("-" * 58)
+    for variant, config_name, latency, correct, total in rows:
+        print(f"{variant:<12} {config_name:<8} {latency:>18.3f} {correct:>10}/{total:<5}")
+
+
+if __name__ == "__main__":
+    main()
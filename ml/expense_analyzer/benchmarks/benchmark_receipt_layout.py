@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare receipt file layouts: disk usage, write rate, get_receipt latency and the
+time to list the history, for the flat pretty-printed layout vs hash/month shards
+with compact and compressed JSON.
+
+Receipts are synthetic (vendor, amount, date, 1-8 line items, hashes) and written
+straight through ReceiptLayout, so the numbers are the file layout's alone.
+
+Usage:
+    python benchmarks/benchmark_receipt_layout.py [--receipts 20000] [--reads 2000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from receipt_layout import ReceiptLayout, ZSTD_AVAILABLE
+
+VENDORS = ["SWIGGY", "Zomato", "Uber India", "Ola Cabs", "Airtel", "BigBasket", "Amazon", "Starbucks"]
+ITEMS = ["Chicken Biryani", "Paneer Tikka", "Coffee", "Ride fare", "Monthly plan", "Groceries", "Delivery fee"]
+
+
+def synthetic_receipt(rng: random.Random, n: int) -> dict:
+    month = 1 + n * 24 // 100000 % 12
+    items = [{"item_name": rng.choice(ITEMS), "quantity": rng.randint(1, 3),
+              "item_total": round(rng.uniform(20, 900), 2)} for _ in range(rng.randint(1, 8))]
+    return {
+        "receipt_id": f"receipt_2025{month:02d}{rng.randint(1, 28):02d}_{n // 1000000:06d}_{n % 1000000:06d}",
+        "stored_at": "2025-11-08T10:10:10.123456",
+        "original_file": f"IMG_{n}.jpg",
+        "image_hash": f"{rng.getrandbits(64):016x}",
+        "content_hash": f"{rng.getrandbits(64):016x}",
+        "content_minhash": "A" * 344,
+        "file": f"IMG_{n}.jpg",
+        "timestamp": "2025-11-08T10:10:09",
+        "extracted_data": {"amount": round(sum(i["item_total"] for i in items), 2), "currency": "INR",
+                           "date": f"2025-{month:02d}-08", "vendor": rng.choice(VENDORS), "category": "food"},
+        "metadata": {"extraction_method": "llm", "line_items": items},
+        "fraud_check": {"duplicate_detected": False, "risk_level": "low", "flags": []},
+    }
+
+
+def disk_usage(root: Path):
+    """(apparent bytes, allocated bytes, files, seconds to walk) of a directory tree"""
+    start = time.perf_counter()
+    apparent = allocated = files = 0
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    stat = entry.stat(follow_symlinks=False)
+                    apparent += stat.st_size
+                    allocated += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+                    files += 1
+    return apparent, allocated, files, time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--receipts", type=int, default=20000, help="Receipts per layout")
+    parser.add_argument("--reads", type=int, default=2000, help="Random get_receipt calls")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    receipts = [synthetic_receipt(rng, n) for n in range(args.receipts)]
+    sample_ids = [r["receipt_id"] for r in rng.sample(receipts, min(args.reads, len(receipts)))]
+
+    layouts = [ReceiptLayout(), ReceiptLayout("hash"), ReceiptLayout("hash", "gzip"),
+               ReceiptLayout("month", "gzip")]
+    if ZSTD_AVAILABLE:
+        layouts += [ReceiptLayout("hash", "zstd"), ReceiptLayout("month", "zstd")]
+    else:
+        print("(zstandard not installed: zstd layouts skipped)")
+
+    print(f"\n{args.receipts} receipts, {len(sample_ids)} random reads\n")
+    print(f"{'layout':16s} {'compr.':6s} {'MB':>8s} {'on disk':>8s} {'writes/s':>9s} "
+          f"{'read p50':>9s} {'read p95':>9s} {'list':>8s}")
+    baseline = None
+    for layout in layouts:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for receipt in receipts:
+                layout.write(tmp, receipt)
+            write_rate = len(receipts) / (time.perf_counter() - start)
+
+            latencies = []
+            for receipt_id in sample_ids:
+                start = time.perf_counter()
+                assert layout.read(tmp, receipt_id)["receipt_id"] == receipt_id
+                latencies.append(time.perf_counter() - start)
+
+            apparent, allocated, files, list_seconds = disk_usage(Path(tmp))
+            baseline = baseline or allocated
+            print(f"{layout.layout:16s} {layout.compression:6s} {apparent / 1e6:8.1f} {allocated / 1e6:8.1f} "
+                  f"{write_rate:9.0f} {percentile(latencies, 0.5) * 1e6:7.0f}us "
+                  f"{percentile(latencies, 0.95) * 1e6:7.0f}us {list_seconds * 1e3:6.0f}ms"
+                  f"  ({allocated / baseline:.0%} of flat on disk)")
+
+
+if __name__ == "__main__":
+    main()
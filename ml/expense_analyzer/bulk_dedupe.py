@@ -0,0 +1,390 @@
+"""
+Bulk Dedupe
+Offline duplicate clustering over a whole receipt history. Online checks only compare
+a new receipt with what is already stored, so histories imported in bulk (or saved
+before fraud detection was enabled) are never cross-checked; this job is.
+
+One pass over the index finds four kinds of evidence with sorts and NumPy array
+comparisons instead of pairwise Python loops:
+
+- exact_image / same_content: receipts sharing an image hash or content hash
+- similar_image: image hashes within max_distance bits. With max_distance + 1 chunks,
+  two such hashes agree exactly on at least one chunk (pigeonhole), so only pairs
+  sharing a chunk value are compared
+- similar_content: MinHash signatures sharing an LSH band, verified by their
+  estimated Jaccard similarity and an exact amount and date match
+
+Receipts linked by any evidence form one cluster (connected components).
+
+    python bulk_dedupe.py receipt_history --out duplicates.json
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from hash_index import parse_hash
+from content_minhash import NUM_PERM, amount_date_key, decode_signature, lsh_bands
+
+
+MATCH_TYPES = ("exact_image", "same_content", "similar_image", "similar_content")
+
+# Candidate pairs verified per NumPy batch (bounds memory for signature comparisons)
+BATCH_PAIRS = 1 << 18
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_bytes(values: np.ndarray) -> np.ndarray:
+    """Set bits per uint64, summed from a per-byte table (for NumPy < 2)"""
+    as_bytes = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8).reshape(len(values), 8)
+    return _BYTE_BITS[as_bytes].sum(axis=1, dtype=np.uint8)
+
+
+# Set bits per element of a uint64 array; np.bitwise_count needs NumPy 2
+popcount = np.bitwise_count if hasattr(np, "bitwise_count") else _popcount_bytes
+
+
+def _same_key_pairs(keys: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Every pair of positions sharing a key. Sorts once, then compares each element with
+    the one k places later for k = 1, 2, ...; only runs that are still going are kept,
+    so the work is proportional to the number of pairs, not n^2.
+
+    Yields:
+        (order, i, j): i < j index the sorted order, i.e. the pairs are
+        (order[i], order[j]); one batch per k
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    n = len(keys)
+    active = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+    k = 1
+    while active.size:
+        yield order, active, active + k
+        k += 1
+        active = active[active + k < n]
+        active = active[sorted_keys[active + k] == sorted_keys[active]]
+
+
+def _row_keys(matrix: np.ndarray) -> np.ndarray:
+    """One 64-bit key per row of a uint32 matrix (collisions are rare and get verified)"""
+    keys = np.zeros(len(matrix), dtype=np.uint64)
+    for column in matrix.T:
+        keys = keys * _MIX + column.astype(np.uint64)
+    return keys
+
+
+def _chunk_shifts(chunks: int, bits: int = 64) -> List[Tuple[int, int]]:
+    """(shift, width) of `chunks` nearly equal slices of a `bits`-bit hash"""
+    widths = [bits // chunks + (1 if i < bits % chunks else 0) for i in range(chunks)]
+    return [(sum(widths[:i]), width) for i, width in enumerate(widths)]
+
+
+class _Edges:
+    """Evidence pairs collected by the detectors"""
+
+    def __init__(self):
+        self.a, self.b, self.kind, self.value = [], [], [], []
+
+    def add(self, a: np.ndarray, b: np.ndarray, kind: str, value: Optional[np.ndarray] = None):
+        if not len(a):
+            return
+        self.a.append(a.astype(np.int64))
+        self.b.append(b.astype(np.int64))
+        self.kind.append(np.full(len(a), MATCH_TYPES.index(kind), dtype=np.int8))
+        self.value.append(np.full(len(a), np.nan) if value is None else value.astype(np.float64))
+
+    def arrays(self):
+        if not self.a:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.int8), np.zeros(0)
+        return (np.concatenate(self.a), np.concatenate(self.b), np.concatenate(self.kind),
+                np.concatenate(self.value))
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Union-find over edge arrays: every node repeatedly hooks to the smallest label
+    among its edges, with pointer jumping (path compression) between rounds.
+
+    Args:
+        n: Number of nodes
+        a, b: Edge endpoints
+
+    Returns:
+        Component label (smallest node index in the component) per node
+    """
+    labels = np.arange(n, dtype=np.int64)
+    if not len(a):
+        return labels
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        previous = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        # Path compression: point each node at its root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def _group_edges(keys: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Star edges (first member -> each other member) of receipts sharing a key"""
+    positions = np.flatnonzero(valid)
+    if not positions.size:
+        return positions, positions
+    _, first, inverse = np.unique(keys[positions], return_index=True, return_inverse=True)
+    root = positions[first][inverse]
+    linked = root != positions
+    return root[linked], positions[linked]
+
+
+class BulkDeduper:
+    """Finds duplicate clusters in a list of receipt index entries"""
+
+    def __init__(self, max_distance: Optional[int] = None, min_similarity: Optional[float] = None,
+                 lsh_threshold: Optional[float] = None):
+        """
+        Args:
+            max_distance: Largest image-hash Hamming distance linking two receipts
+                (default: FRAUD_HASH_DISTANCE or 5; 0 = exact hashes only)
+            min_similarity: Smallest content MinHash similarity linking two receipts with
+                the same amount and date (default: FRAUD_CONTENT_SIMILARITY or 0.7; 0 = off)
+            lsh_threshold: Similarity around which LSH bands collide
+                (default: CONTENT_LSH_THRESHOLD or 0.5)
+        """
+        if max_distance is None:
+            max_distance = int(os.getenv('FRAUD_HASH_DISTANCE', '5'))
+        if min_similarity is None:
+            min_similarity = float(os.getenv('FRAUD_CONTENT_SIMILARITY', '0.7'))
+        if lsh_threshold is None:
+            lsh_threshold = float(os.getenv('CONTENT_LSH_THRESHOLD', '0.5'))
+        self.max_distance = max_distance
+        self.min_similarity = min_similarity
+        self.lsh_threshold = lsh_threshold
+
+    def run(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Cluster duplicates.
+
+        Args:
+            entries: Index entries (receipt_id, image_hash, content_hash, content_minhash, ...)
+
+        Returns:
+            {'clusters': [...], 'stats': {...}}; each cluster lists its receipts (in
+            history order) and the evidence pairs linking them
+        """
+        timings = {}
+        start = time.perf_counter()
+        n = len(entries)
+
+        image_values = [parse_hash(e.get('image_hash')) for e in entries]
+        has_image = np.array([v is not None for v in image_values], dtype=bool)
+        image_hashes = np.array([v or 0 for v in image_values], dtype=np.uint64)
+        content_hashes = np.array([e.get('content_hash') or '' for e in entries], dtype=object)
+        has_content = content_hashes != ''
+        signatures = np.zeros((n, NUM_PERM), dtype=np.uint32)
+        has_signature = np.zeros(n, dtype=bool)
+        amount_dates = np.array([amount_date_key(e.get('amount'), e.get('date')) or '' for e in entries],
+                                dtype=object)
+        for position, entry in enumerate(entries):
+            signature = decode_signature(entry.get('content_minhash'))
+            if signature is not None:
+                signatures[position] = signature
+                has_signature[position] = True
+        timings["load"] = time.perf_counter() - start
+
+        edges = _Edges()
+        step = time.perf_counter()
+        edges.add(*_group_edges(image_hashes, has_image), "exact_image")
+        edges.add(*_group_edges(content_hashes.astype(str), has_content), "same_content")
+        timings["exact"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        if self.max_distance > 0:
+            self._near_images(image_hashes, has_image, edges)
+        timings["similar_image"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        if self.min_similarity > 0:
+            self._similar_content(signatures, has_signature & (amount_dates != ''), amount_dates, edges)
+        timings["similar_content"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        a, b, kind, value = edges.arrays()
+        labels = connected_components(n, a, b)
+        clusters = self._clusters(entries, labels, a, b, kind, value)
+        timings["cluster"] = time.perf_counter() - step
+        timings["total"] = time.perf_counter() - start
+
+        counts = np.bincount(kind, minlength=len(MATCH_TYPES)) if len(kind) else np.zeros(len(MATCH_TYPES), int)
+        return {
+            "clusters": clusters,
+            "stats": {
+                "receipts": n,
+                "with_image_hash": int(has_image.sum()),
+                "with_content_signature": int(has_signature.sum()),
+                "evidence": {t: int(c) for t, c in zip(MATCH_TYPES, counts)},
+                "clusters": len(clusters),
+                "receipts_in_clusters": sum(c["size"] for c in clusters),
+                "max_distance": self.max_distance,
+                "min_similarity": self.min_similarity,
+                "seconds": {k: round(v, 3) for k, v in timings.items()},
+            },
+        }
+
+    def _near_images(self, hashes: np.ndarray, valid: np.ndarray, edges: _Edges):
+        """similar_image edges between distinct hashes within max_distance bits"""
+        positions = np.flatnonzero(valid)
+        # Equal hashes are already linked; compare one representative per distinct hash
+        unique, first = np.unique(hashes[positions], return_index=True)
+        representatives = positions[first]
+
+        found_a, found_b, found_d = [], [], []
+        for shift, width in _chunk_shifts(self.max_distance + 1):
+            keys = (unique >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+            sorted_hashes = None
+            for order, i, j in _same_key_pairs(keys):
+                if sorted_hashes is None:
+                    sorted_hashes = unique[order]
+                distance = popcount(sorted_hashes[i] ^ sorted_hashes[j])
+                close = distance <= self.max_distance
+                if close.any():
+                    found_a.append(order[i[close]])
+                    found_b.append(order[j[close]])
+                    found_d.append(distance[close])
+        if not found_a:
+            return
+
+        # The same pair can share several chunks; keep it once
+        a, b = np.concatenate(found_a), np.concatenate(found_b)
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        _, keep = np.unique(low * len(unique) + high, return_index=True)
+        edges.add(representatives[low[keep]], representatives[high[keep]], "similar_image",
+                  np.concatenate(found_d)[keep])
+
+    def _similar_content(self, signatures: np.ndarray, valid: np.ndarray, amount_dates: np.ndarray,
+                         edges: _Edges):
+        """similar_content edges between signatures sharing an LSH band, with the same amount and date"""
+        positions = np.flatnonzero(valid)
+        if positions.size < 2:
+            return
+        # Identical signatures (so identical amount and date shingles): link them directly,
+        # then search one per distinct signature
+        full_keys = _row_keys(signatures[positions])
+        _, first, inverse = np.unique(full_keys, return_index=True, return_inverse=True)
+        root = positions[first][inverse]
+        linked = root != positions
+        edges.add(root[linked], positions[linked], "similar_content", np.ones(int(linked.sum())))
+        representatives = positions[first]
+        distinct = signatures[representatives]
+
+        bands, rows = lsh_bands(self.lsh_threshold, NUM_PERM)
+        candidates_a, candidates_b = [], []
+        for band in range(bands):
+            keys = _row_keys(distinct[:, band * rows:(band + 1) * rows])
+            for order, i, j in _same_key_pairs(keys):
+                candidates_a.append(order[i])
+                candidates_b.append(order[j])
+        if not candidates_a:
+            return
+
+        a, b = np.concatenate(candidates_a), np.concatenate(candidates_b)
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        pair_keys = np.unique(low * len(distinct) + high)
+        low, high = pair_keys // len(distinct), pair_keys % len(distinct)
+
+        for begin in range(0, len(low), BATCH_PAIRS):
+            x, y = low[begin:begin + BATCH_PAIRS], high[begin:begin + BATCH_PAIRS]
+            similarity = (distinct[x] == distinct[y]).mean(axis=1)
+            close = (similarity >= self.min_similarity) & (amount_dates[representatives[x]] ==
+                                                           amount_dates[representatives[y]])
+            edges.add(representatives[x[close]], representatives[y[close]], "similar_content",
+                      similarity[close])
+
+    @staticmethod
+    def _clusters(entries, labels, a, b, kind, value) -> List[Dict[str, Any]]:
+        """Clusters with more than one receipt, largest first"""
+        sizes = np.bincount(labels, minlength=len(labels))
+        members = np.flatnonzero(sizes[labels] > 1)
+        if not members.size:
+            return []
+
+        by_label = {}
+        for position in members:
+            by_label.setdefault(int(labels[position]), []).append(int(position))
+        evidence = {}
+        for x, y, k, v in zip(a.tolist(), b.tolist(), kind.tolist(), value.tolist()):
+            item = {"a": entries[x]["receipt_id"], "b": entries[y]["receipt_id"], "match_type": MATCH_TYPES[k]}
+            if MATCH_TYPES[k] == "similar_image":
+                item["distance"] = int(v)
+            elif MATCH_TYPES[k] == "similar_content":
+                item["similarity"] = round(v, 4)
+            evidence.setdefault(int(labels[x]), []).append(item)
+
+        clusters = []
+        for label, positions in by_label.items():
+            clusters.append({
+                "cluster_id": entries[label]["receipt_id"],
+                "size": len(positions),
+                "receipts": [{field: entries[p].get(field) for field in
+                              ("receipt_id", "stored_at", "vendor", "amount", "date", "image_hash")}
+                             for p in positions],
+                "evidence": evidence.get(label, []),
+            })
+        clusters.sort(key=lambda c: -c["size"])
+        return clusters
+
+
+def dedupe_storage(storage, **options) -> Dict[str, Any]:
+    """
+    Cluster duplicates across a ReceiptStorage's whole history.
+
+    Args:
+        storage: ReceiptStorage (any backend)
+        **options: BulkDeduper arguments (max_distance, min_similarity, lsh_threshold)
+
+    Returns:
+        BulkDeduper.run() result
+    """
+    return BulkDeduper(**options).run(storage.get_all_receipts())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster duplicate receipts across a whole history")
+    parser.add_argument("storage_dir", nargs="?", default="receipt_history", help="History directory")
+    parser.add_argument("--backend", default=None, help="Storage backend (json/sqlite)")
+    parser.add_argument("--out", default=None, help="Write the clusters as JSON to this file")
+    parser.add_argument("--max-distance", type=int, default=None, help="Image hash bits (default 5)")
+    parser.add_argument("--min-similarity", type=float, default=None, help="Content similarity (default 0.7)")
+    args = parser.parse_args()
+
+    from receipt_storage import open_storage
+    report = dedupe_storage(open_storage(args.storage_dir, backend=args.backend),
+                            max_distance=args.max_distance, min_similarity=args.min_similarity)
+    stats = report["stats"]
+    print(f"🔍 {stats['receipts']} receipts: {stats['clusters']} duplicate cluster(s) "
+          f"covering {stats['receipts_in_clusters']} receipts ({stats['seconds']['total']:.1f}s)")
+    print(f"   Evidence: {stats['evidence']}")
+    for cluster in report["clusters"][:5]:
+        vendors = sorted({str(r['vendor']) for r in cluster['receipts']})
+        print(f"   {cluster['size']} x {', '.join(vendors)} ({cluster['cluster_id']})")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Clusters written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
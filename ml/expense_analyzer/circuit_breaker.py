@@ -0,0 +1,147 @@
+"""
+Circuit Breaker
+Remembers LLM provider failures across requests. After enough consecutive failures
+or timeouts the circuit opens and requests go straight to the regex/OCR fallback
+until a cooldown passes; then a few probe requests decide whether it closes again.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the protected service while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe closed -> open -> half-open circuit breaker.
+
+    Callers ask allow_request() before calling the protected service and report the
+    outcome with record_success() / record_failure().
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0,
+                 half_open_probes: int = 1, name: str = "llm"):
+        """
+        Initialize the breaker (closed).
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown_seconds: How long the circuit stays open before probing
+            half_open_probes: Concurrent probe requests allowed while half-open
+            name: Label used in stats and log lines
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._consecutive_failures = 0
+        self._counters = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+
+    @classmethod
+    def from_env(cls, name: str = "llm") -> 'CircuitBreaker':
+        """Build from LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN and LLM_BREAKER_PROBES"""
+        return cls(
+            failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', '5')),
+            cooldown_seconds=float(os.getenv('LLM_BREAKER_COOLDOWN', '30')),
+            half_open_probes=int(os.getenv('LLM_BREAKER_PROBES', '1')),
+            name=name,
+        )
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open"""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        """Move open -> half-open once the cooldown has passed (caller holds the lock)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+
+    def allow_request(self) -> bool:
+        """
+        Whether the protected service may be called now. Every True must be followed
+        by record_success() or record_failure().
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        """Report a successful call; a successful probe closes the circuit"""
+        with self._lock:
+            self._counters["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                print(f"✅ Circuit '{self.name}' closed (probe succeeded)")
+                self._state = CLOSED
+                self._probes_in_flight = 0
+
+    def record_failure(self):
+        """Report a failed or timed-out call; may open the circuit"""
+        with self._lock:
+            self._counters["failures"] += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        """Open the circuit (caller holds the lock)"""
+        print(f"⚡ Circuit '{self.name}' opened after {self._consecutive_failures} consecutive "
+              f"failure(s); using fallback for {self.cooldown_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._counters["opened"] += 1
+
+    def reset(self):
+        """Force the circuit closed and clear the failure streak"""
+        with self._lock:
+            self._state = CLOSED
+            self._opened_at = None
+            self._probes_in_flight = 0
+            self._consecutive_failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """State and failure counters"""
+        with self._lock:
+            self._maybe_half_open()
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": round(retry_in, 1),
+                **self._counters,
+            }
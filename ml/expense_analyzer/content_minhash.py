@@ -0,0 +1,275 @@
+"""
+Content MinHash
+Fuzzy content fingerprints for duplicate detection. A receipt's vendor, amount, date
+and line items become a set of normalized shingles; a MinHash signature estimates
+the Jaccard similarity of two such sets, and an LSH banding index finds stored
+receipts with similar signatures without comparing against every one.
+
+Unlike the exact content hash, "SW1GGY" / "SWIGGY" or 649.0 / 649 still match. The
+amount and date still have to agree exactly (amount_date_key) for a match to count.
+"""
+
+import re
+import base64
+import hashlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+NUM_PERM = 64
+
+# Same shingle appears this many times (as distinct tokens) to weigh it against
+# the vendor's character trigrams
+AMOUNT_WEIGHT = 3
+DATE_WEIGHT = 3
+
+# Characters OCR commonly reads in place of letters in merchant names
+OCR_CONFUSIONS = str.maketrans({
+    '0': 'o', '1': 'i', 'l': 'i', '|': 'i', '5': 's', '8': 'b', '$': 's', '@': 'a',
+})
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Permutation constants (a in [1, p), b in [0, p)), written out rather than drawn from
+# a seeded RNG: stored signatures must stay comparable across NumPy versions
+_PERM_A = np.array([
+    0x1060d7be6f245c9f, 0x1e6a32d7782a550b, 0x049cf49ec11d831a, 0x1e5b5615da558df9,
+    0x09fa85f407f9ae55, 0x0d8be3e8bbcf0e09, 0x1a7c8a2668bdcda3, 0x0d1828c988394759,
+    0x11964580549a3f45, 0x00e1c3a642be604d, 0x181cc785dbb2e646, 0x113878535acff394,
+    0x0a8d29875a295329, 0x193aced50e7c5aa0, 0x09b3c5a483f72329, 0x0e830e0183fb4185,
+    0x044a11d03f42d042, 0x0ce64d34ac4416ab, 0x0682b4909cec84ab, 0x0864def250127fbd,
+    0x1802fcc620a262dd, 0x08f91bc9a1fc12e9, 0x0f86af38eff19f8e, 0x1f6232fae3bdf4c8,
+    0x1ec5e54e97f8a69f, 0x17317aac82f2847b, 0x1151bafb89617421, 0x08dc4af13d9908f7,
+    0x05240fae773a5e43, 0x1f09a1052a5289ff, 0x1083a2442d79cb25, 0x03b52bcd095fff9b,
+    0x13f3a0c9ad9651e8, 0x18da968bee9443b3, 0x139db9194b9c7a1a, 0x1d5a80b758bab195,
+    0x01445847cdac8c59, 0x10ea3407d6fe2dba, 0x0eb2e12a5be834bc, 0x01fec48b6bc74e41,
+    0x1485c2a70ea12783, 0x1b48c4a998a46cee, 0x12f95f7126e00065, 0x0852b7e1f9bdffa5,
+    0x1ae04f362b07442b, 0x104dca4e929c40ab, 0x105933a5558ecd47, 0x1818d2ce5f63df0e,
+    0x04bbc6fe41bb6ffe, 0x1a3a61d031713c86, 0x15dd7c8062356056, 0x192fe5ecd84dc6c7,
+    0x0621b86bbbf27330, 0x19acf79af1c4dc13, 0x061f535aab74b726, 0x029c143c0f57f90d,
+    0x1b5e04f5a70a3c2a, 0x1b8fa268155d3346, 0x1c0c97865ae161b0, 0x0f19e26969eff671,
+    0x08c5012053c1e532, 0x003a18a47d6c0646, 0x14a9bede1ad2cc11, 0x17097f67481b832b,
+], dtype=np.uint64)
+_PERM_B = np.array([
+    0x1abcfba74d377870, 0x090524a63ff19a43, 0x06e31135af0a82e1, 0x1475671516294c17,
+    0x19c3025a7b0695d2, 0x1ed6644c5f42f7fa, 0x04d11972fca30c8a, 0x0f6e48aca159c20d,
+    0x1ca18328eb0a4e35, 0x0d86e59b598070b8, 0x12dd336db26ae406, 0x00c8a0ac5c8213cb,
+    0x158cfbbfcfabd09a, 0x1d692c896e7f65a5, 0x1a755a64be6ad13b, 0x1c562e992edc852a,
+    0x1521a19b62585630, 0x07db906da89446c3, 0x1897b0f615be4eca, 0x06c60a1c1c6e64bb,
+    0x1a99cdae9be4b474, 0x0201c9044a107753, 0x1a6a656b38b32fc7, 0x0543a4be2ebd6b77,
+    0x0c01344624a99ae4, 0x0a22b814583aad43, 0x161f6ed8a1020604, 0x05b6dc5f17d0aed8,
+    0x0cae216731ef068f, 0x002fb70fb009fef8, 0x08665b4fd44ea53d, 0x0d7a60f6d1bd801e,
+    0x0363b4eef383c1fd, 0x1442d8a5aba70ab8, 0x0c2c6f84b88e0042, 0x17359ba200c8aa73,
+    0x14ec7869b026bbcd, 0x0dcc9c09e5198a6d, 0x1bc116eedc450d04, 0x143a736d0a1f6af9,
+    0x19edc47a62b14dcc, 0x0aeffb7d28948d91, 0x1165bd235ee5ee87, 0x06481067bbfc312f,
+    0x1fe0637d3841be6f, 0x07c86bcc2277da55, 0x0838421f64b23e37, 0x025792b4e9f44ce9,
+    0x083fec539cba9dda, 0x186b8c873d7a4ff4, 0x165524e5c5851c0d, 0x041e1748d8c092c8,
+    0x0c0a255364269e0c, 0x0d7830250232e736, 0x15478d0acf5ac10e, 0x0e96f856324e9830,
+    0x12c4c215070cac85, 0x1adeb23eee906fd8, 0x173f4595b65b9535, 0x0bae23b6724b7dfd,
+    0x0e59433789035a86, 0x0bc431e3524c9b5d, 0x0382f24524ae9428, 0x0680f4692167b777,
+], dtype=np.uint64)
+
+
+def _normalize_name(text: str) -> str:
+    """Lowercase, undo common OCR digit/letter swaps, keep letters/digits/single spaces"""
+    text = str(text).lower().translate(OCR_CONFUSIONS)
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', text).split())
+
+
+def _amount_token(value) -> Optional[str]:
+    try:
+        return f"{float(str(value).replace(',', '')):.2f}"
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_token(value) -> Optional[str]:
+    return re.sub(r'\D', '', str(value or '')) or None
+
+
+def amount_date_key(amount, date) -> Optional[str]:
+    """
+    Normalized amount and date, which must agree exactly before a fuzzy content match
+    counts: a long vendor name outweighs them in the signature, so two visits to the
+    same merchant can look similar. "649" / 649.0 and 08-11-2025 / 08/11/2025 agree.
+
+    Returns:
+        Key string, or None if either the amount or the date is missing
+    """
+    amount, date = _amount_token(amount), _date_token(date)
+    if amount is None or date is None:
+        return None
+    return f"{amount}|{date}"
+
+
+def content_shingles(receipt_data: Dict[str, Any]) -> Set[str]:
+    """
+    Normalized shingles of a receipt's content.
+
+    Args:
+        receipt_data: Analyzed receipt data (extracted_data + metadata.line_items)
+
+    Returns:
+        Set of shingle strings (empty if the receipt has no usable content)
+    """
+    data = receipt_data.get('extracted_data', {}) or {}
+    shingles = set()
+
+    vendor = _normalize_name(data.get('vendor') or '')
+    if vendor:
+        padded = f" {vendor} "
+        shingles.update(f"v:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+    amount = _amount_token(data.get('amount'))
+    if amount:
+        shingles.update(f"a{k}:{amount}" for k in range(AMOUNT_WEIGHT))
+
+    date_digits = _date_token(data.get('date'))
+    if date_digits:
+        shingles.update(f"d{k}:{date_digits}" for k in range(DATE_WEIGHT))
+
+    line_items = (receipt_data.get('metadata', {}) or {}).get('line_items') or []
+    for item in line_items:
+        if not isinstance(item, dict):
+            continue
+        shingles.update(f"i:{word}" for word in _normalize_name(item.get('item_name') or '').split())
+        total = _amount_token(item.get('item_total'))
+        if total:
+            shingles.add(f"t:{total}")
+
+    return shingles
+
+
+def minhash(shingles: Set[str]) -> Optional[np.ndarray]:
+    """
+    MinHash signature of a shingle set.
+
+    Args:
+        shingles: Set of strings
+
+    Returns:
+        uint32 array of NUM_PERM values, or None for an empty set
+    """
+    if not shingles:
+        return None
+    # Stable 32-bit hashes (Python's hash() is salted per process)
+    values = np.array([int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+                       for s in shingles], dtype=np.uint64)
+    permuted = ((values[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def encode_signature(signature: Optional[np.ndarray]) -> Optional[str]:
+    """Compact text form of a signature for storage"""
+    if signature is None:
+        return None
+    return base64.b64encode(signature.astype('<u4').tobytes()).decode('ascii')
+
+
+def decode_signature(value: Optional[str]) -> Optional[np.ndarray]:
+    """Signature from its stored text form (None if missing or malformed)"""
+    if not value:
+        return None
+    try:
+        signature = np.frombuffer(base64.b64decode(value), dtype='<u4')
+    except (ValueError, TypeError):
+        return None
+    return signature if len(signature) == NUM_PERM else None
+
+
+def content_signature(receipt_data: Dict[str, Any]) -> Optional[str]:
+    """Stored MinHash signature of a receipt's content (None if it has no content)"""
+    return encode_signature(minhash(content_shingles(receipt_data)))
+
+
+def similarity(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> Optional[float]:
+    """Estimated Jaccard similarity of the two shingle sets"""
+    if a is None or b is None:
+        return None
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    Bands x rows split of the signature whose collision S-curve, (1/b)^(1/r),
+    sits closest to the threshold.
+
+    Args:
+        threshold: Similarity at which pairs should start becoming candidates
+        num_perm: Signature length
+
+    Returns:
+        (bands, rows)
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class MinHashLSH:
+    """
+    LSH banding index over MinHash signatures: a signature is cut into bands, and
+    two signatures become candidates if any band is identical.
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = NUM_PERM):
+        """
+        Initialize an empty index.
+
+        Args:
+            threshold: Similarity around which pairs start colliding (sets bands/rows)
+            num_perm: Signature length
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._tables = [{} for _ in range(self.bands)]
+        self._signatures = []
+        self._keys = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        raw = signature.astype('<u4').tobytes()
+        width = self.rows * 4
+        return [raw[i * width:(i + 1) * width] for i in range(self.bands)]
+
+    def add(self, signature: np.ndarray, key: Any):
+        """
+        Add a signature.
+
+        Args:
+            signature: uint32 MinHash signature
+            key: Returned with matches (receipt entry, row id, ...)
+        """
+        position = len(self._keys)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            table.setdefault(band, []).append(position)
+
+    def query(self, signature: np.ndarray, min_similarity: float) -> Tuple[List[Tuple[Any, float]], int]:
+        """
+        Find stored signatures at least min_similarity similar to `signature`.
+
+        Args:
+            signature: uint32 MinHash signature
+            min_similarity: Smallest estimated Jaccard similarity to report
+
+        Returns:
+            ((key, similarity) pairs, most similar first; number of LSH candidates checked)
+        """
+        candidates = set()
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            bucket = table.get(band)
+            if bucket:
+                candidates.update(bucket)
+
+        matches = []
+        for position in candidates:
+            score = similarity(signature, self._signatures[position])
+            if score >= min_similarity:
+                matches.append((-score, position))
+        matches.sort()
+        return [(self._keys[position], -score) for score, position in matches], len(candidates)
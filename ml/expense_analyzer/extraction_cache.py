@@ -0,0 +1,215 @@
+"""
+Extraction Cache
+Content-addressed cache of extraction results so re-uploads and retries of the
+same receipt skip image decoding, OCR and the LLM call entirely
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+# Bump whenever extraction output or the result schema changes so stale entries stop matching
+ANALYZER_VERSION = "3"
+
+
+def file_sha256(file_path: str) -> str:
+    """Full SHA256 hex digest of a file's bytes"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent extraction cache keyed by (file SHA256, extraction method, analyzer version).
+    Entries are individual JSON files; least recently used entries are evicted once
+    the entry or byte budget is exceeded, and entries older than max_age_days expire.
+    """
+
+    def __init__(self, cache_dir: str = ".extraction_cache", max_entries: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024, max_age_days: float = 30,
+                 version: str = ANALYZER_VERSION):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding cache entry files
+            max_entries: Maximum number of cached results
+            max_bytes: Maximum total size of cached results
+            max_age_days: Entries older than this are treated as misses and removed
+            version: Analyzer/schema version mixed into every key
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.version = version
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        # key -> size in bytes, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._load_entries()
+
+    def _load_entries(self):
+        """Rebuild the LRU order from entry file mtimes (touched on every hit)"""
+        now = time.time()
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self.max_age:
+                self._remove_file(entry.path)
+                continue
+            found.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def make_key(self, digest: str, method: str) -> str:
+        """Cache key for a file digest and extraction method"""
+        return hashlib.sha256(f"{self.version}:{method}:{digest}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, file_path: str, method: str, digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            file_path: Receipt file (hashed unless digest is given)
+            method: Extraction method the result must come from
+            digest: Precomputed SHA256 of the file bytes
+
+        Returns:
+            Cached result, or None on a miss
+        """
+        key = self.make_key(digest or file_sha256(file_path), method)
+        path = self._path(key)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get('cached_at', 0) > self.max_age:
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            self._remove_file(path)
+            return None
+
+        # Touch so the LRU order survives restarts
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                # Written by another process sharing the directory
+                self._entries[key] = path.stat().st_size
+                self._total_bytes += self._entries[key]
+
+        return entry['result']
+
+    def put(self, file_path: str, method: str, result: Dict[str, Any], digest: Optional[str] = None):
+        """
+        Store a result.
+
+        Args:
+            file_path: Receipt file (hashed unless digest is given)
+            method: Extraction method that produced the result
+            result: Extraction result (must be JSON serializable)
+            digest: Precomputed SHA256 of the file bytes
+        """
+        key = self.make_key(digest or file_sha256(file_path), method)
+        payload = json.dumps({
+            "cached_at": time.time(),
+            "version": self.version,
+            "method": method,
+            "result": result,
+        }, ensure_ascii=False, default=str).encode('utf-8')
+
+        # Write-then-rename so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            self._remove_file(tmp_path)
+            raise
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(payload)
+            self._total_bytes += len(payload)
+            self._evict()
+
+    def _forget(self, key: str):
+        """Drop a key from the in-memory index (caller holds the lock)"""
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Evict least recently used entries until within budget"""
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            self._remove_file(self._path(key))
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_file(self._path(key))
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "version": self.version,
+            }
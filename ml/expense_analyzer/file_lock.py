@@ -0,0 +1,128 @@
+"""
+File Lock
+Advisory inter-process lock on a lock file (fcntl.flock on POSIX, msvcrt.locking on
+Windows), plus an atomic write-then-rename helper for JSON files. Together they let
+several worker processes share one receipt history directory.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    import msvcrt
+    FCNTL_AVAILABLE = False
+
+
+class FileLock:
+    """
+    Exclusive lock held through a lock file; usable as a context manager.
+    Re-entrant within one thread, and also serializes threads sharing the object.
+    """
+
+    def __init__(self, path: Union[str, Path], poll_interval: float = 0.05):
+        """
+        Args:
+            path: Lock file (created if missing; its content is never used)
+            poll_interval: Seconds between attempts where locks cannot block (Windows)
+        """
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._lock_fd(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                self._unlock_fd(fd)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def _lock_fd(self, fd: int):
+        if FCNTL_AVAILABLE:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(self.poll_interval)
+
+    def _unlock_fd(self, fd: int):
+        if FCNTL_AVAILABLE:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def atomic_write_bytes(path: Union[str, Path], payload: bytes):
+    """
+    Write to a temporary file in the same directory and rename it over `path`, so
+    readers see either the old or the new file, never a partial one.
+
+    Args:
+        path: Destination file
+        payload: File content
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: Union[str, Path], data: Any, **dump_kwargs):
+    """
+    Atomically write JSON (see atomic_write_bytes).
+
+    Args:
+        path: Destination file
+        data: JSON-serializable value
+        **dump_kwargs: Passed to json.dumps (indent, separators, ...)
+    """
+    atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, **dump_kwargs).encode('utf-8'))
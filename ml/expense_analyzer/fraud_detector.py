@@ -3,43 +3,112 @@ Fraud Detection Module
 Detects duplicate receipts and potential fraud indicators
 """
 
-from typing import Dict, Any, List, Tuple
+import os
+from typing import Dict, Any, List, Tuple, Optional
 from receipt_storage import ReceiptStorage
+from image_context import ImageContext
+from hash_index import hamming_distance
+from content_minhash import amount_date_key, decode_signature, similarity
 
 
 class FraudDetector:
     """
     Detects potential fraud in receipt data.
     - Duplicate detection (image + content)
-    - Anomaly detection (future: statistical analysis)
+    - Anomaly detection (rules + outliers against running vendor/category statistics)
     """
     
-    def __init__(self, storage: ReceiptStorage):
+    def __init__(self, storage: ReceiptStorage, max_hash_distance: Optional[int] = None,
+                 min_content_similarity: Optional[float] = None, zscore_threshold: Optional[float] = None,
+                 outlier_quantile: Optional[float] = None, min_history: Optional[int] = None):
         """
         Initialize fraud detector.
         
         Args:
             storage: ReceiptStorage instance
+            max_hash_distance: Image hashes differing in at most this many bits count as
+                the same receipt (default: FRAUD_HASH_DISTANCE or 5; 0 = exact only)
+            min_content_similarity: Receipts whose content MinHash similarity reaches this,
+                with the same amount and date, count as the same receipt
+                (default: FRAUD_CONTENT_SIMILARITY or 0.7; 0 = off)
+            zscore_threshold: Flag amounts this many standard deviations above the vendor's
+                mean (default: FRAUD_ZSCORE_THRESHOLD or 3.0; 0 = off)
+            outlier_quantile: Flag amounts above this quantile of the category's amounts
+                (default: FRAUD_OUTLIER_QUANTILE or 0.99; 0 = off)
+            min_history: Receipts a vendor/category needs before its statistics are used
+                (default: FRAUD_MIN_HISTORY or 10)
         """
         self.storage = storage
+        if max_hash_distance is None:
+            max_hash_distance = int(os.getenv('FRAUD_HASH_DISTANCE', '5'))
+        if min_content_similarity is None:
+            min_content_similarity = float(os.getenv('FRAUD_CONTENT_SIMILARITY', '0.7'))
+        self.max_hash_distance = max_hash_distance
+        self.min_content_similarity = min_content_similarity
+        if zscore_threshold is None:
+            zscore_threshold = float(os.getenv('FRAUD_ZSCORE_THRESHOLD', '3.0'))
+        if outlier_quantile is None:
+            outlier_quantile = float(os.getenv('FRAUD_OUTLIER_QUANTILE', '0.99'))
+        if min_history is None:
+            min_history = int(os.getenv('FRAUD_MIN_HISTORY', '10'))
+        self.zscore_threshold = zscore_threshold
+        self.outlier_quantile = outlier_quantile
+        self.min_history = min_history
     
-    def check_duplicates(self, image_path: str, receipt_data: Dict[str, Any]) -> Dict[str, Any]:
+    def check_duplicates(self, image_path: str, receipt_data: Dict[str, Any],
+                         image_context: Optional[ImageContext] = None) -> Dict[str, Any]:
         """
         Check for duplicate receipts.
         
         Args:
             image_path: Path to receipt image
             receipt_data: Analyzed receipt data
+            image_context: Shared decoded image/hashes for this analysis (optional)
             
         Returns:
             Dictionary with duplicate detection results
         """
         # Generate hashes
-        image_hash = self.storage.generate_image_hash(image_path)
+        if image_context is not None:
+            image_hash = image_context.image_hash
+        else:
+            image_hash = self.storage.generate_image_hash(image_path)
         content_hash = self.storage.generate_content_hash(receipt_data)
+        content_minhash = self.storage.generate_content_minhash(receipt_data)
         
         # Find duplicates
         duplicates = self.storage.find_duplicates(image_hash, content_hash)
+        seen = {d['receipt_id'] for d in duplicates}
+        
+        # Re-photographed / cropped copies: image hash a few bits away
+        near_duplicates = []
+        if self.max_hash_distance > 0:
+            near_duplicates = [
+                d for d in self.storage.find_near_duplicates(image_hash, self.max_hash_distance)
+                if d['match_type'] == 'similar_image' and d['receipt_id'] not in seen
+            ]
+            seen.update(d['receipt_id'] for d in near_duplicates)
+        
+        # Same receipt read with OCR noise: similar vendor/items, same amount and date
+        fuzzy_duplicates = []
+        content_candidates = 0
+        extracted = receipt_data.get('extracted_data', {}) or {}
+        amount_date = amount_date_key(extracted.get('amount'), extracted.get('date'))
+        if self.min_content_similarity > 0 and content_minhash and amount_date:
+            matches, content_candidates = self.storage.find_similar_content(
+                content_minhash, self.min_content_similarity)
+            fuzzy_duplicates = [
+                d for d in matches
+                if d['receipt_id'] not in seen and amount_date_key(d.get('amount'), d.get('date')) == amount_date
+            ]
+        duplicates = duplicates + near_duplicates + fuzzy_duplicates
+        
+        signature = decode_signature(content_minhash)
+        for dup in duplicates:
+            dup['distance'] = hamming_distance(image_hash, dup.get('image_hash'))
+            if 'similarity' not in dup:
+                score = similarity(signature, decode_signature(dup.get('content_minhash')))
+                dup['similarity'] = round(score, 4) if score is not None else None
         
         # Analyze results
         exact_duplicates = [d for d in duplicates if d['match_type'] == 'exact_image']
@@ -53,6 +122,11 @@ class FraudDetector:
             "content_hash": content_hash,
             "exact_duplicates": len(exact_duplicates),
             "content_duplicates": len(content_duplicates),
+            "near_duplicates": len(near_duplicates),
+            "max_hash_distance": self.max_hash_distance,
+            "fuzzy_content_duplicates": len(fuzzy_duplicates),
+            "min_content_similarity": self.min_content_similarity,
+            "content_candidates": content_candidates,
             "similar_receipts": []
         }
         
@@ -64,7 +138,9 @@ class FraudDetector:
                 "vendor": dup['vendor'],
                 "amount": dup['amount'],
                 "date": dup['date'],
-                "match_type": dup['match_type']
+                "match_type": dup['match_type'],
+                "distance": dup['distance'],
+                "similarity": dup['similarity']
             })
         
         return result
@@ -111,6 +187,10 @@ class FraudDetector:
                 "message": f"Extremely high amount: {amount}"
             })
         
+        # Flags 4-5: Outliers against this vendor's / category's history
+        spend_flags, spend_context = self._check_spend_history(amount, vendor, category)
+        flags.extend(spend_flags)
+        
         # Calculate risk score (0-100)
         risk_score = 0
         for flag in flags:
@@ -132,22 +212,67 @@ class FraudDetector:
         return {
             "anomaly_score": risk_score / 100.0,  # Normalize to 0-1
             "flags": flags,
-            "risk_level": risk_level
+            "risk_level": risk_level,
+            "spend_context": spend_context
         }
     
-    def perform_fraud_checks(self, image_path: str, receipt_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _check_spend_history(self, amount, vendor, category) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Compare an amount with the running statistics of its vendor and category
+        (O(1): no scan of the receipt history).
+        
+        Returns:
+            (flags, context with the vendor/category summaries, z-score and quantile)
+        """
+        flags = []
+        context = {}
+        if not isinstance(amount, (int, float)) or not amount:
+            return flags, context
+        
+        vendor_stats = self.storage.get_spend_stats('vendor', vendor) if vendor else None
+        if vendor_stats is not None:
+            zscore = vendor_stats.zscore(amount)
+            context["vendor"] = {**vendor_stats.summary(),
+                                 "zscore": round(zscore, 2) if zscore is not None else None}
+            if (self.zscore_threshold > 0 and zscore is not None and vendor_stats.count >= self.min_history
+                    and zscore >= self.zscore_threshold):
+                flags.append({
+                    "type": "vendor_outlier",
+                    "severity": "warning",
+                    "message": f"Amount {amount} is {zscore:.1f} std above the usual "
+                               f"{vendor_stats.mean:.2f} for {vendor}"
+                })
+        
+        category_stats = self.storage.get_spend_stats('category', category)
+        if category_stats is not None:
+            limit = category_stats.quantile(self.outlier_quantile) if self.outlier_quantile > 0 else None
+            context["category"] = {**category_stats.summary(), "quantile": self.outlier_quantile,
+                                   "quantile_amount": round(limit, 2) if limit is not None else None}
+            if limit is not None and category_stats.count >= self.min_history and amount > limit:
+                flags.append({
+                    "type": "category_outlier",
+                    "severity": "warning",
+                    "message": f"Amount {amount} is above the {self.outlier_quantile:.0%} quantile "
+                               f"({limit:.2f}) of {category} receipts"
+                })
+        
+        return flags, context
+    
+    def perform_fraud_checks(self, image_path: str, receipt_data: Dict[str, Any],
+                             image_context: Optional[ImageContext] = None) -> Dict[str, Any]:
         """
         Perform all fraud checks.
         
         Args:
             image_path: Path to receipt image
             receipt_data: Analyzed receipt data
+            image_context: Shared decoded image/hashes for this analysis (optional)
             
         Returns:
             Complete fraud check results
         """
         # Check duplicates
-        duplicate_check = self.check_duplicates(image_path, receipt_data)
+        duplicate_check = self.check_duplicates(image_path, receipt_data, image_context)
         
         # Check anomalies
         anomaly_check = self.check_anomalies(receipt_data)
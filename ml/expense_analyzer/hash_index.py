@@ -0,0 +1,142 @@
+"""
+Hamming Index
+Near-duplicate search over 64-bit perceptual hashes by multi-index hashing: each hash
+is split into 16-bit chunks with one lookup table per chunk, so a query only visits
+hashes that agree (or nearly agree) with it on at least one chunk instead of
+scanning the whole history.
+"""
+
+from itertools import combinations
+from typing import Any, List, Optional, Tuple
+
+
+def parse_hash(value, bits: int = 64) -> Optional[int]:
+    """
+    Integer form of a hex hash string.
+
+    Args:
+        value: Hash as hex (e.g. the 16 characters of average_hash)
+        bits: Expected hash width
+
+    Returns:
+        Hash as int, or None if it is not a hex hash of that width
+    """
+    if not isinstance(value, str) or len(value) != bits // 4:
+        return None
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+def hamming_distance(a: str, b: str) -> Optional[int]:
+    """Number of differing bits between two hex hashes (None if either is not a 64-bit hash)"""
+    x, y = parse_hash(a), parse_hash(b)
+    if x is None or y is None:
+        return None
+    return (x ^ y).bit_count()
+
+
+class HammingIndex:
+    """
+    Multi-index hashing (Norouzi et al.) over fixed-width integer hashes.
+
+    If two hashes are within d bits, then by pigeonhole at least one of the m chunks
+    differs by at most d // m bits. A search therefore probes every chunk value within
+    that radius in each table and verifies the candidates with a popcount.
+    """
+
+    def __init__(self, bits: int = 64, chunks: int = 4):
+        """
+        Initialize an empty index.
+
+        Args:
+            bits: Hash width in bits
+            chunks: Number of tables; bits must divide evenly (4 x 16 bits by default)
+        """
+        if bits % chunks:
+            raise ValueError(f"{bits} bits cannot be split into {chunks} equal chunks")
+        self.bits = bits
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+
+        self._tables = [{} for _ in range(chunks)]
+        self._hashes = []
+        self._keys = []
+        self._flip_masks = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _split(self, value: int) -> List[int]:
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def add(self, value: int, key: Any):
+        """
+        Add a hash.
+
+        Args:
+            value: Hash as int (see parse_hash)
+            key: Returned with matches (receipt entry, row id, ...)
+        """
+        position = len(self._hashes)
+        self._hashes.append(value)
+        self._keys.append(key)
+        for table, chunk in zip(self._tables, self._split(value)):
+            bucket = table.get(chunk)
+            if bucket is None:
+                table[chunk] = [position]
+            else:
+                bucket.append(position)
+
+    def _masks(self, radius: int) -> List[int]:
+        """All chunk-wide XOR masks with at most `radius` bits set"""
+        masks = self._flip_masks.get(radius)
+        if masks is None:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for positions in combinations(range(self.chunk_bits), r):
+                    mask = 0
+                    for p in positions:
+                        mask |= 1 << p
+                    masks.append(mask)
+            self._flip_masks[radius] = masks
+        return masks
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[Any, int]]:
+        """
+        Find stored hashes within max_distance bits of `value`.
+
+        Args:
+            value: Query hash as int
+            max_distance: Largest Hamming distance to report
+
+        Returns:
+            (key, distance) pairs, closest first (ties in insertion order)
+        """
+        if max_distance < 0 or not self._hashes:
+            return []
+
+        radius = max_distance // self.chunks
+        masks = self._masks(radius) if radius < self.chunk_bits else None
+        hashes = self._hashes
+
+        if masks is None or len(masks) * self.chunks >= len(hashes):
+            # Probing would touch more buckets than there are hashes; just scan
+            candidates = range(len(hashes))
+        else:
+            candidates = set()
+            for table, chunk in zip(self._tables, self._split(value)):
+                for mask in masks:
+                    bucket = table.get(chunk ^ mask)
+                    if bucket:
+                        candidates.update(bucket)
+
+        matches = []
+        for position in candidates:
+            distance = (hashes[position] ^ value).bit_count()
+            if distance <= max_distance:
+                matches.append((distance, position))
+        matches.sort()
+        return [(self._keys[position], distance) for distance, position in matches]
@@ -0,0 +1,134 @@
+"""
+Image Context
+Per-analysis view of one receipt file. The file is read once, the image is decoded
+once and the file/image hashes are computed once, then shared by OCR, duplicate
+detection and storage.
+"""
+
+import io
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from PIL import Image
+
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+
+
+def average_hash(img: Image.Image) -> str:
+    """
+    Perceptual average hash (64 bits as 16 hex characters) of a decoded image.
+
+    Args:
+        img: Decoded PIL image (any mode)
+
+    Returns:
+        Hash string (16 hex characters)
+    """
+    # NumPy is only needed once something is hashed
+    from image_hashing import average_hash as numpy_average_hash
+    return numpy_average_hash(img)
+
+
+class ImageContext:
+    """
+    Lazily loads and caches everything derived from one receipt file.
+    Safe to share between threads working on the same analysis.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Create a context for a receipt file (nothing is read until first use).
+
+        Args:
+            file_path: Path to receipt image or PDF
+        """
+        self.file_path = str(file_path)
+        self.path = Path(file_path)
+        self._lock = threading.RLock()
+        self._data = None
+        self._sha256 = None
+        self._image = None
+        self._image_hashes = None
+
+    @property
+    def data(self) -> bytes:
+        """Raw file bytes (read once)"""
+        with self._lock:
+            if self._data is None:
+                if not self.path.exists():
+                    raise FileNotFoundError(f"File not found: {self.file_path}")
+                self._data = self.path.read_bytes()
+            return self._data
+
+    @property
+    def sha256(self) -> str:
+        """Full SHA256 hex digest of the file bytes"""
+        with self._lock:
+            if self._sha256 is None:
+                self._sha256 = hashlib.sha256(self.data).hexdigest()
+            return self._sha256
+
+    @property
+    def file_hash(self) -> str:
+        """Short file hash, as used by ReceiptStorage when no image hash is possible"""
+        return self.sha256[:16]
+
+    @property
+    def image(self) -> Image.Image:
+        """Decoded image (first page for PDFs), decoded once"""
+        with self._lock:
+            if self._image is None:
+                self._image = self._decode()
+            return self._image
+
+    def _decode(self) -> Image.Image:
+        suffix = self.path.suffix.lower()
+
+        # Handle PDF
+        if suffix == '.pdf':
+            from pdf2image import convert_from_bytes
+            print("📄 Converting PDF to image...")
+            return convert_from_bytes(self.data, first_page=1, last_page=1)[0]
+
+        # Handle images
+        if suffix in IMAGE_EXTENSIONS:
+            image = Image.open(io.BytesIO(self.data))
+            image.load()
+            return image
+
+        raise ValueError(f"Unsupported file format: {self.path.suffix}")
+
+    @property
+    def image_hash(self) -> str:
+        """
+        Average hash of the image. Falls back to the short file hash for files that
+        are not raster images (e.g. PDFs), matching ReceiptStorage.
+        """
+        return self.image_hashes['ahash']
+
+    @property
+    def image_hashes(self) -> Dict[str, str]:
+        """aHash, dHash and pHash from one reduced-resolution decode (see image_hashing)"""
+        with self._lock:
+            if self._image_hashes is None:
+                self._image_hashes = self._compute_image_hashes()
+            return self._image_hashes
+
+    def _compute_image_hashes(self) -> Dict[str, str]:
+        if self.path.suffix.lower() != '.pdf':
+            try:
+                from image_hashing import compute_hashes
+                # JPEGs get their own draft-mode decode so the hash does not depend on
+                # whether OCR already decoded the full image; other formats reuse it
+                source = self._image if self._image is not None and self._image.format != 'JPEG' else self.data
+                return compute_hashes(source)
+            except Exception as e:
+                print(f"Warning: Could not generate image hash: {e}")
+        return {kind: self.file_hash for kind in ('ahash', 'dhash', 'phash')}
+
+
+def ensure_context(file_path: str, image_context: Optional[ImageContext] = None) -> ImageContext:
+    """Return the given context, or a fresh one for file_path"""
+    return image_context if image_context is not None else ImageContext(file_path)
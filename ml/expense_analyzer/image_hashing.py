@@ -0,0 +1,154 @@
+"""
+Image Hashing
+Perceptual hashes of receipt images computed with NumPy: average hash (aHash),
+difference hash (dHash) and DCT-based perceptual hash (pHash), 64 bits each.
+
+A fingerprint only needs a few dozen pixels, so JPEGs are decoded in Pillow's draft
+mode (DCT scaling to as little as 1/8 of the resolution, straight to grayscale)
+instead of decoding every pixel and then throwing them away in the resize.
+"""
+
+import io
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+import numpy as np
+from PIL import Image
+
+
+HASH_KINDS = ('ahash', 'dhash', 'phash')
+
+# Hash grid size per kind (width, height); pHash takes the 8x8 low-frequency
+# corner of the DCT of a 32x32 thumbnail
+HASH_SIZES = {
+    'ahash': (8, 8),
+    'dhash': (9, 8),
+    'phash': (32, 32),
+}
+
+# Smallest resolution a JPEG draft decode may scale down to. It is the same for every
+# set of kinds: the draft scale changes the pixels the hashes see, so an aHash computed
+# alone must come from the same decode as one computed alongside pHash
+DRAFT_SIZE = HASH_SIZES['phash']
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(x) = D @ x"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _to_hex(bits: np.ndarray) -> str:
+    """Pack a 64-element boolean array (row-major, first bit most significant) into hex"""
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+def _grid(gray: Image.Image, kind: str) -> np.ndarray:
+    """Grayscale thumbnail for one hash kind as a float array (rows x columns)"""
+    small = gray.resize(HASH_SIZES[kind], Image.Resampling.LANCZOS)
+    return np.asarray(small, dtype=np.float64)
+
+
+def load_image(source: Union[str, Path, bytes, Image.Image], draft: bool = True,
+               size=DRAFT_SIZE) -> Image.Image:
+    """
+    Grayscale image for hashing.
+
+    Args:
+        source: File path, encoded file bytes or an already decoded image
+        draft: Let the JPEG decoder scale down (to no less than `size`) while decoding
+        size: Smallest resolution the hashes need
+
+    Returns:
+        Decoded 'L' mode image
+    """
+    if isinstance(source, Image.Image):
+        return source.convert('L')
+
+    if isinstance(source, bytes):
+        image = Image.open(io.BytesIO(source))
+    else:
+        image = Image.open(source)
+    with image:
+        if draft and image.format == 'JPEG':
+            image.draft('L', size)
+        return image.convert('L')
+
+
+def average_hash(image: Image.Image) -> str:
+    """
+    aHash: 8x8 thumbnail, one bit per pixel brighter than the mean.
+
+    Args:
+        image: Decoded PIL image (any mode)
+
+    Returns:
+        Hash string (16 hex characters)
+    """
+    pixels = _grid(image.convert('L'), 'ahash')
+    return _to_hex(pixels > pixels.mean())
+
+
+def difference_hash(image: Image.Image) -> str:
+    """
+    dHash: 9x8 thumbnail, one bit per horizontally adjacent pair (right brighter than left).
+
+    Args:
+        image: Decoded PIL image (any mode)
+
+    Returns:
+        Hash string (16 hex characters)
+    """
+    pixels = _grid(image.convert('L'), 'dhash')
+    return _to_hex(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hash(image: Image.Image) -> str:
+    """
+    pHash: 2D DCT of a 32x32 thumbnail, one bit per low-frequency (8x8) coefficient
+    above their median.
+
+    Args:
+        image: Decoded PIL image (any mode)
+
+    Returns:
+        Hash string (16 hex characters)
+    """
+    pixels = _grid(image.convert('L'), 'phash')
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+    return _to_hex(low > np.median(low))
+
+
+HASH_FUNCTIONS = {
+    'ahash': average_hash,
+    'dhash': difference_hash,
+    'phash': perceptual_hash,
+}
+
+
+def compute_hashes(source: Union[str, Path, bytes, Image.Image],
+                   kinds: Iterable[str] = HASH_KINDS, draft: bool = True) -> Dict[str, str]:
+    """
+    Decode once and compute several hashes.
+
+    Args:
+        source: File path, encoded file bytes or an already decoded image
+        kinds: Any of 'ahash', 'dhash', 'phash'
+        draft: Use reduced-resolution JPEG decoding at DRAFT_SIZE (see load_image)
+
+    Returns:
+        Dictionary of kind -> hash string (16 hex characters)
+    """
+    kinds = list(kinds)
+    unknown = set(kinds) - set(HASH_FUNCTIONS)
+    if unknown:
+        raise ValueError(f"Unknown hash kind(s): {sorted(unknown)} (expected {HASH_KINDS})")
+
+    gray = load_image(source, draft=draft)
+    return {kind: HASH_FUNCTIONS[kind](gray) for kind in kinds}
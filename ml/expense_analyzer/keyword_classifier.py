@@ -4,9 +4,38 @@ Uses predefined keywords to categorize receipts when LLM is unavailable
 """
 
 import re
+from bisect import bisect_left
 from typing import Dict, List, Optional
 
 
+def _trie_pattern(words) -> str:
+    """
+    Regex alternation shaped like a prefix trie of `words`.
+
+    Branches share their common prefixes, so the engine follows one path per
+    character instead of trying every keyword; optional tails are greedy, so the
+    longest word that matches wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        ends_here = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = '|'.join(branches)
+        if len(branches) > 1 or ends_here:
+            body = '(?:' + body + ')'
+        return body + '?' if ends_here else body
+
+    return build(trie)
+
+
 class KeywordClassifier:
     """
     Classifies expenses based on keywords in vendor name and line items.
@@ -83,13 +112,39 @@ class KeywordClassifier:
     
     def __init__(self):
         """Initialize the keyword classifier"""
-        # Pre-compile regex patterns for efficiency
+        # Per-category patterns (kept for callers that match a single category)
         self.patterns = {}
         for category, keywords in self.CATEGORIES.items():
             # Create case-insensitive pattern with word boundaries
             pattern = r'\b(' + '|'.join(re.escape(kw) for kw in keywords) + r')\b'
             self.patterns[category] = re.compile(pattern, re.IGNORECASE)
-    
+
+        # One matcher for all categories: a trie-shaped alternation, tried at every
+        # word boundary, that yields the longest keyword starting there
+        all_keywords = {kw.lower() for keywords in self.CATEGORIES.values() for kw in keywords}
+        self.matcher = re.compile(r'(?=\b(' + _trie_pattern(all_keywords) + r')\b)', re.IGNORECASE)
+        # Same matcher for text that is already lower-case ASCII (about twice as fast)
+        self.lower_matcher = re.compile(r'(?=\b(' + _trie_pattern(all_keywords) + r')\b)')
+        self._credits = {kw: self._credits_for(kw, all_keywords) for kw in all_keywords}
+
+    def _credits_for(self, longest: str, all_keywords) -> tuple:
+        """
+        (category, keyword) pairs a match of `longest` counts for.
+
+        Every keyword that is a whole-word prefix of the longest match also matches at
+        that position ('uber' inside 'uber eats'); each category takes the first of
+        those in its own keyword order, exactly like its separate pattern would.
+        """
+        hits = {kw for kw in all_keywords
+                if kw == longest or re.match(r'\b' + re.escape(kw) + r'\b', longest)}
+        credits = []
+        for category, keywords in self.CATEGORIES.items():
+            for kw in keywords:
+                if kw.lower() in hits:
+                    credits.append((category, kw.lower()))
+                    break
+        return tuple(credits)
+
     def classify(self, vendor: Optional[str] = None, 
                  line_items: Optional[List[Dict]] = None,
                  description: Optional[str] = None) -> Dict[str, any]:
@@ -104,7 +159,96 @@ class KeywordClassifier:
         Returns:
             Dictionary with category, confidence, and matching keywords
         """
-        # Combine all text for matching
+        return self._classify_text(self._combine(vendor, line_items, description))
+
+    def classify_many(self, items):
+        """
+        Classify many expenses in one call (bulk reclassification of receipt history).
+
+        Distinct texts are scored once, with a single matcher scan over all of them.
+
+        Args:
+            items: List (or any iterable) of description strings or dicts of classify()
+                   arguments, or a pandas Series of description strings
+
+        Returns:
+            List of classify() results in input order; a DataFrame with the same
+            index when given a Series
+        """
+        is_series = type(items).__module__.split('.')[0] == 'pandas'
+        texts = []
+        for item in items:
+            if isinstance(item, dict):
+                texts.append(self._combine(item.get('vendor'), item.get('line_items'), item.get('description')))
+            else:
+                texts.append(item if isinstance(item, str) else '')
+
+        # Receipt histories repeat the same merchants; score each text once
+        distinct = list(dict.fromkeys(texts))
+        scored = dict(zip(distinct, map(self._score, self._match_many(distinct))))
+        results = []
+        handed_out = set()
+        for text in texts:
+            result = scored[text]
+            if text in handed_out:
+                # Repeated text: a copy, so results stay independent
+                result = dict(result, matched_keywords=list(result['matched_keywords']))
+            else:
+                handed_out.add(text)
+            results.append(result)
+
+        if is_series:
+            import pandas as pd
+            return pd.DataFrame(results, index=items.index)
+        return results
+
+    def _match_many(self, texts: List[str]) -> List[Dict[str, Dict[str, None]]]:
+        """Keyword matches per category for each text, from one scan over all of them"""
+        # Keywords are letters and spaces, so no match spans the separator
+        blob = '\x00'.join(texts)
+        if blob.isascii():
+            found_in = self.lower_matcher.finditer(blob.lower())
+        else:
+            found_in = self.matcher.finditer(blob)
+
+        ends = []
+        position = -1
+        for text in texts:
+            position += len(text) + 1
+            ends.append(position)
+
+        # _add_match() inlined: this loop runs once per keyword hit in the whole batch
+        credits_for = self._credits
+        matches = [{} for _ in texts]
+        index, end = 0, ends[0] if ends else 0
+        category_matches = matches[0] if matches else None
+        resume_at = {}
+        for match in found_in:
+            start = match.start()
+            if start > end:
+                index = bisect_left(ends, start, index)
+                end = ends[index]
+                category_matches = matches[index]
+            found = match.group(1)
+            credits = credits_for.get(found) or credits_for.get(found.lower()) or credits_for.get(found.casefold(), ())
+            for category, keyword in credits:
+                if start >= resume_at.get(category, 0):
+                    resume_at[category] = start + len(keyword)
+                    category_matches.setdefault(category, {})[keyword] = None
+        return matches
+
+    def _add_match(self, category_matches, resume_at, start: int, found: str):
+        """Credit one matcher hit to every category it counts for"""
+        credits = self._credits.get(found.lower()) or self._credits.get(found.casefold(), ())
+        for category, keyword in credits:
+            # A category's own pattern would not match inside its previous match
+            if start >= resume_at.get(category, 0):
+                resume_at[category] = start + len(keyword)
+                category_matches.setdefault(category, {})[keyword] = None
+
+    @staticmethod
+    def _combine(vendor, line_items, description) -> str:
+        """Join vendor, item names and description into the text that gets matched"""
         text_parts = []
         if vendor:
             text_parts.append(vendor)
@@ -114,32 +258,21 @@ class KeywordClassifier:
                     text_parts.append(item['item_name'])
         if description:
             text_parts.append(description)
-        
-        combined_text = ' '.join(text_parts)
-        
-        # If no text provided, return 'other'
-        if not combined_text.strip():
-            return {
-                'category': 'other',
-                'confidence': 0.0,
-                'method': 'keyword_classifier',
-                'matched_keywords': []
-            }
-        
-        # Score each category
-        category_scores = {}
+        return ' '.join(text_parts)
+
+    def _classify_text(self, combined_text: str) -> Dict[str, any]:
+        """Score all categories in one pass over the combined text"""
+        # Unique keyword matches per category, in order of first appearance
         category_matches = {}
-        
-        for category, pattern in self.patterns.items():
-            matches = pattern.findall(combined_text)
-            if matches:
-                # Score = number of unique keyword matches
-                unique_matches = list(set(m.lower() for m in matches))
-                category_scores[category] = len(unique_matches)
-                category_matches[category] = unique_matches
-        
-        # Select best category
-        if not category_scores:
+        resume_at = {}
+        for match in self.matcher.finditer(combined_text):
+            self._add_match(category_matches, resume_at, match.start(), match.group(1))
+        return self._score(category_matches)
+
+    def _score(self, category_matches: Dict[str, Dict[str, None]]) -> Dict[str, any]:
+        """Pick the best category from the keyword matches of one text"""
+        # No text or no keyword matched: 'other'
+        if not category_matches:
             return {
                 'category': 'other',
                 'confidence': 0.0,
@@ -147,8 +280,13 @@ class KeywordClassifier:
                 'matched_keywords': []
             }
         
-        best_category = max(category_scores, key=category_scores.get)
-        best_score = category_scores[best_category]
+        # Score = number of unique keyword matches; ties go to the earlier category
+        if len(category_matches) == 1:
+            best_category = next(iter(category_matches))
+        else:
+            best_category = max((c for c in self.CATEGORIES if c in category_matches),
+                                key=lambda c: len(category_matches[c]))
+        best_score = len(category_matches[best_category])
         
         # Calculate confidence (simple heuristic)
         # 1 match = 0.5, 2 matches = 0.7, 3+ matches = 0.9
@@ -158,7 +296,7 @@ class KeywordClassifier:
             'category': best_category,
             'confidence': confidence,
             'method': 'keyword_classifier',
-            'matched_keywords': category_matches[best_category][:5]  # Top 5 matches
+            'matched_keywords': list(category_matches[best_category])[:5]  # Top 5 matches
         }
     
     def get_categories(self) -> List[str]:
@@ -0,0 +1,170 @@
+"""
+OCR Preprocessing
+Prepares decoded receipt images for Tesseract: grayscale, DPI-normalizing downscale,
+deskew and adaptive binarization. Tesseract time scales with pixel count, so large
+phone photos are shrunk to the resolution OCR actually needs before recognition.
+"""
+
+import os
+import time
+from typing import Dict, Tuple, Iterable
+
+import numpy as np
+from PIL import Image
+
+
+STAGES = ('grayscale', 'downscale', 'deskew', 'binarize')
+
+# Grayscale is lossless for OCR. Downscale (Tesseract's preferred ~300 DPI), deskew and
+# binarize are opt-in until benchmarks/benchmark_ocr_preprocess.py shows they keep
+# amount accuracy on samples/ with a real Tesseract
+DEFAULT_STAGES = ('grayscale',)
+
+
+class OCRPreprocessor:
+    """
+    Configurable image preprocessing pipeline run before OCR.
+    Each stage is timed; process() returns the prepared image and per-stage timings.
+    """
+
+    def __init__(self, stages: Iterable[str] = DEFAULT_STAGES, target_dpi: int = 300,
+                 max_side: int = 2000, max_skew_degrees: float = 5.0,
+                 skew_step_degrees: float = 0.25, window: int = 31, sauvola_k: float = 0.2):
+        """
+        Initialize the preprocessor.
+
+        Args:
+            stages: Stages to run, in pipeline order (subset of STAGES)
+            target_dpi: Resolution to normalize to when the image carries DPI metadata
+            max_side: Longest side (px) allowed when no DPI metadata is available
+            max_skew_degrees: Largest rotation searched by deskew
+            skew_step_degrees: Angle resolution of the deskew search
+            window: Side (px) of the local window used by adaptive binarization
+            sauvola_k: Sauvola sensitivity; higher values produce thinner text
+        """
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stage(s): {', '.join(sorted(unknown))}")
+
+        self.stages = [s for s in STAGES if s in set(stages)]
+        self.target_dpi = target_dpi
+        self.max_side = max_side
+        self.max_skew_degrees = max_skew_degrees
+        self.skew_step_degrees = skew_step_degrees
+        self.window = window | 1  # Must be odd
+        self.sauvola_k = sauvola_k
+
+    @classmethod
+    def from_env(cls) -> 'OCRPreprocessor':
+        """
+        Build from OCR_PREPROCESS: unset uses the defaults, 'none'/'off' disables,
+        'all' enables every stage, otherwise a comma-separated list of stages.
+        """
+        value = os.getenv('OCR_PREPROCESS', '').strip().lower()
+        if not value:
+            return cls()
+        if value in ('none', 'off', '0', 'false'):
+            return cls(stages=())
+        if value in ('all', '1', 'true'):
+            return cls(stages=STAGES)
+        return cls(stages=[s.strip() for s in value.split(',') if s.strip()])
+
+    def process(self, image: Image.Image) -> Tuple[Image.Image, Dict[str, float]]:
+        """
+        Run the configured stages.
+
+        Args:
+            image: Decoded receipt image
+
+        Returns:
+            (prepared image, {stage: milliseconds, 'deskew_angle': degrees, ...})
+        """
+        timings = {}
+        for stage in self.stages:
+            start = time.perf_counter()
+            image, extra = getattr(self, f'_{stage}')(image)
+            timings[f'{stage}_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            timings.update(extra)
+        timings['output_size'] = list(image.size)
+        return image, timings
+
+    def _grayscale(self, image: Image.Image):
+        return (image if image.mode == 'L' else image.convert('L')), {}
+
+    def _downscale(self, image: Image.Image):
+        width, height = image.size
+        dpi = image.info.get('dpi')
+
+        if dpi and dpi[0] and dpi[0] > self.target_dpi:
+            scale = self.target_dpi / float(dpi[0])
+        else:
+            scale = self.max_side / float(max(width, height))
+
+        # Never upscale, and skip negligible reductions
+        if scale >= 0.9:
+            return image, {'scale': 1.0}
+
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        resized = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return resized, {'scale': round(scale, 4)}
+
+    def _deskew(self, image: Image.Image):
+        angle = self.estimate_skew(image)
+        if abs(angle) < self.skew_step_degrees:
+            return image, {'deskew_angle': 0.0}
+
+        fill = 255 if image.mode == 'L' else 'white'
+        rotated = image.rotate(-angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+        return rotated, {'deskew_angle': round(angle, 2)}
+
+    def estimate_skew(self, image: Image.Image) -> float:
+        """
+        Estimate text skew in degrees (counter-clockwise; rotate by the negative to correct)
+        with a projection profile: the angle at which dark pixels collapse into the
+        sharpest row histogram wins.
+        """
+        small = image.convert('L')
+        longest = max(small.size)
+        if longest > 1000:
+            small = small.resize((max(1, small.size[0] * 1000 // longest),
+                                  max(1, small.size[1] * 1000 // longest)), Image.Resampling.BILINEAR)
+
+        pixels = np.asarray(small, dtype=np.float32)
+        ys, xs = np.nonzero(pixels < pixels.mean() - pixels.std())
+        if len(ys) < 50:
+            return 0.0
+
+        angles = np.arange(-self.max_skew_degrees, self.max_skew_degrees + 1e-9, self.skew_step_degrees)
+        offset = int(np.ceil(np.tan(np.radians(self.max_skew_degrees)) * pixels.shape[1])) + 1
+        best_angle, best_score = 0.0, -1.0
+        for angle in angles:
+            rows = np.rint(ys + xs * np.tan(np.radians(angle))).astype(np.int64) + offset
+            hist = np.bincount(rows)
+            score = float(np.dot(hist, hist))
+            if score > best_score:
+                best_angle, best_score = float(angle), score
+        return best_angle
+
+    def _binarize(self, image: Image.Image):
+        gray = np.asarray(image.convert('L'), dtype=np.float64)
+        h, w = gray.shape
+        r = self.window // 2
+
+        # Integral images of the padded image give O(1) window sums per pixel
+        padded = np.pad(gray, r + 1, mode='edge')
+        integral = padded.cumsum(0).cumsum(1)
+        integral_sq = (padded ** 2).cumsum(0).cumsum(1)
+
+        def window_sum(table):
+            return (table[self.window:self.window + h, self.window:self.window + w]
+                    - table[:h, self.window:self.window + w]
+                    - table[self.window:self.window + h, :w]
+                    + table[:h, :w])
+
+        area = float(self.window * self.window)
+        mean = window_sum(integral) / area
+        variance = np.maximum(window_sum(integral_sq) / area - mean ** 2, 0.0)
+        threshold = mean * (1.0 + self.sauvola_k * (np.sqrt(variance) / 128.0 - 1.0))
+
+        binary = np.where(gray > threshold, 255, 0).astype(np.uint8)
+        return Image.fromarray(binary), {}
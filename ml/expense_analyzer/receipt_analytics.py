@@ -0,0 +1,240 @@
+"""
+Receipt Analytics
+Columnar export of the receipt history and spend reports on pandas.
+
+export_parquet() writes the index (one row per receipt) as a Parquet dataset
+partitioned by receipt month, with compact dtypes: categoricals for vendor and
+category, float32 amounts and datetime64 dates. SpendAnalytics then reads only
+the columns a query needs and only the month partitions in its date range:
+
+    analytics = SpendAnalytics("receipt_parquet")
+    analytics.summary(by=["category"], freq="M", start="2025-01-01", end="2025-06-30")
+
+Parquet needs pyarrow (pip install pyarrow); without it, SpendAnalytics.from_storage()
+runs the same queries on an in-memory frame.
+"""
+
+import shutil
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from receipt_lexer import iso_date
+from spend_stats import vendor_key
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+COLUMNS = ("receipt_id", "stored_at", "date", "month", "vendor", "vendor_key", "category", "amount")
+PARTITION_COLUMN = "month"
+UNKNOWN_MONTH = "unknown"
+
+AGGREGATES = ("receipts", "total", "mean", "median", "max")
+
+
+def receipts_frame(entries: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Index entries as a compactly typed DataFrame.
+
+    Args:
+        entries: ReceiptStorage index entries (get_all_receipts())
+
+    Returns:
+        DataFrame with COLUMNS: datetime64 date/stored_at, categorical
+        month/vendor/vendor_key/category, float32 amount (NaN if missing)
+    """
+    raw = pd.DataFrame.from_records(list(entries), columns=["receipt_id", "stored_at", "vendor", "amount",
+                                                             "date", "category"])
+    # Stored dates are whatever the extractor read ("05/03/2020", "Mar 17, 19", ...)
+    date = pd.to_datetime(raw["date"].map(iso_date), errors="coerce", format="%Y-%m-%d")
+    month = date.dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+    vendors = raw["vendor"].where(raw["vendor"].map(lambda v: isinstance(v, str)))
+
+    return pd.DataFrame({
+        "receipt_id": raw["receipt_id"].astype("string"),
+        "stored_at": pd.to_datetime(raw["stored_at"], errors="coerce", format="ISO8601"),
+        "date": date,
+        "month": month.astype("category"),
+        "vendor": vendors.astype("category"),
+        "vendor_key": vendors.map(vendor_key, na_action="ignore").astype("category"),
+        "category": raw["category"].where(raw["category"].map(lambda c: isinstance(c, str))).astype("category"),
+        "amount": pd.to_numeric(raw["amount"], errors="coerce").astype("float32"),
+    }, columns=list(COLUMNS))
+
+
+def export_parquet(storage, out_dir: Union[str, Path], compression: str = "zstd") -> int:
+    """
+    Write the receipt history as a Parquet dataset partitioned by month
+    (out_dir/month=YYYY-MM/*.parquet). The dataset is built next to out_dir and
+    swapped in, so readers never see a half-written export.
+
+    Args:
+        storage: ReceiptStorage (any backend)
+        out_dir: Dataset directory (replaced)
+        compression: Parquet codec ('zstd', 'snappy', 'gzip' or 'none')
+
+    Returns:
+        Number of receipts exported
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    out_dir = Path(out_dir)
+    frame = receipts_frame(storage.get_all_receipts())
+    staging = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    frame.to_parquet(staging, engine="pyarrow", partition_cols=[PARTITION_COLUMN], index=False,
+                     compression=None if compression == "none" else compression)
+
+    previous = out_dir.with_name(out_dir.name + ".old")
+    if out_dir.exists():
+        shutil.rmtree(previous, ignore_errors=True)
+        out_dir.rename(previous)
+    staging.rename(out_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return len(frame)
+
+
+def _month(value) -> Optional[str]:
+    return pd.Timestamp(value).strftime("%Y-%m") if value is not None else None
+
+
+class SpendAnalytics:
+    """Grouped spend queries over an exported Parquet dataset or an in-memory frame"""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, frame: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            path: Dataset written by export_parquet()
+            frame: Already loaded receipts_frame() (instead of path)
+        """
+        if (path is None) == (frame is None):
+            raise ValueError("Pass either a Parquet dataset path or a frame")
+        if path is not None and not PYARROW_AVAILABLE:
+            raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        self.path = Path(path) if path is not None else None
+        self.frame = frame
+
+    @classmethod
+    def from_storage(cls, storage) -> 'SpendAnalytics':
+        """In-memory analytics over a ReceiptStorage's index (no Parquet needed)"""
+        return cls(frame=receipts_frame(storage.get_all_receipts()))
+
+    def receipts(self, columns: Optional[Sequence[str]] = None, start=None, end=None,
+                 categories: Optional[Sequence[str]] = None, vendor: Optional[str] = None) -> pd.DataFrame:
+        """
+        Receipts matching the filters.
+
+        Args:
+            columns: Columns to return (default: all); only these plus the filter
+                     columns are read from disk
+            start: First receipt date included (anything pd.Timestamp accepts)
+            end: Last receipt date included
+            categories: Categories to keep (case-insensitive)
+            vendor: Keep vendors whose name contains this text (case-insensitive)
+
+        Returns:
+            DataFrame of the matching receipts
+        """
+        columns = list(columns or COLUMNS)
+        needed = set(columns)
+        if start is not None or end is not None:
+            needed.add("date")
+        if categories is not None:
+            needed.add("category")
+        if vendor is not None:
+            needed.add("vendor_key")
+        frame = self._read([c for c in COLUMNS if c in needed], start, end)
+
+        mask = pd.Series(True, index=frame.index)
+        if start is not None:
+            mask &= frame["date"] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= frame["date"] <= pd.Timestamp(end)
+        if categories is not None:
+            wanted = {c.lower() for c in categories}
+            codes = frame["category"].cat.categories
+            mask &= frame["category"].isin(codes[codes.str.lower().isin(wanted)])
+        if vendor is not None:
+            # Substring match over the distinct vendors, not every row
+            names = frame["vendor_key"].cat.categories
+            mask &= frame["vendor_key"].isin(names[names.str.contains(vendor.lower(), regex=False)])
+        return frame.loc[mask, columns].reset_index(drop=True)
+
+    def _read(self, columns: List[str], start, end) -> pd.DataFrame:
+        """Columns of the receipts in the months overlapping [start, end]"""
+        if self.frame is not None:
+            return self.frame[columns]
+
+        filters = []
+        if start is not None:
+            filters.append((PARTITION_COLUMN, ">=", _month(start)))
+        if end is not None:
+            filters.append((PARTITION_COLUMN, "<=", _month(end)))
+        if filters:
+            # Receipts without a date sort after the digits; keep them out of ranges
+            filters.append((PARTITION_COLUMN, "!=", UNKNOWN_MONTH))
+        return pd.read_parquet(self.path, engine="pyarrow", columns=columns, filters=filters or None)
+
+    def summary(self, by: Sequence[str] = ("category",), freq: Optional[str] = None, **filters) -> pd.DataFrame:
+        """
+        Spend per group.
+
+        Args:
+            by: Grouping columns ('category', 'vendor', 'vendor_key', 'month')
+            freq: Also group by receipt date period ('M' month, 'W' week, 'Q', 'Y')
+            **filters: start, end, categories, vendor (see receipts())
+
+        Returns:
+            DataFrame indexed by the groups with receipts, total, mean, median and max
+            amount, largest total first
+        """
+        by = list(by)
+        columns = by + ["amount"] + (["date"] if freq else [])
+        frame = self.receipts(columns=list(dict.fromkeys(columns)), **filters)
+        keys = [frame[column] for column in by]
+        if freq:
+            keys.append(frame["date"].dt.to_period(freq).rename("period"))
+
+        amount = frame["amount"].astype("float64")
+        result = amount.groupby(keys, observed=True, dropna=False).agg(
+            receipts="size", total="sum", mean="mean", median="median", max="max")
+        return result.sort_values("total", ascending=False) if not freq else result.sort_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet export and spend reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write the history as partitioned Parquet")
+    export.add_argument("storage_dir", help="Receipt history directory")
+    export.add_argument("out_dir", help="Parquet dataset directory")
+    export.add_argument("--backend", default=None, help="Storage backend (json/sqlite)")
+
+    report = commands.add_parser("report", help="Spend per group from an exported dataset")
+    report.add_argument("dataset", help="Parquet dataset directory")
+    report.add_argument("--by", nargs="+", default=["category"], help="Grouping columns")
+    report.add_argument("--freq", default=None, help="Date period: M, W, Q or Y")
+    report.add_argument("--start", default=None)
+    report.add_argument("--end", default=None)
+    report.add_argument("--vendor", default=None)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from receipt_storage import open_storage
+        count = export_parquet(open_storage(args.storage_dir, backend=args.backend), args.out_dir)
+        print(f"📦 Exported {count} receipt(s) to {args.out_dir}")
+    else:
+        summary = SpendAnalytics(args.dataset).summary(by=args.by, freq=args.freq, start=args.start,
+                                                       end=args.end, vendor=args.vendor)
+        print(summary.round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Receipt Layout
+Where and how the JSON storage backend writes receipt files.
+
+- flat:  receipt_history/receipt_<id>.json, pretty-printed (the original layout)
+- hash:  receipt_history/receipts/<2 hex chars of a hash of the ID>/receipt_<id>.json
+         (256 evenly filled shards)
+- month: receipt_history/receipts/<YYYY>/<MM>/receipt_<id>.json (month the receipt
+         was stored; old months can be archived as whole directories)
+
+Sharded layouts write compact JSON, optionally gzip or zstd compressed. The layout
+of a history is recorded in layout.json; migrate a history with:
+
+    python receipt_layout.py receipt_history --layout hash --compression gzip
+"""
+
+import re
+import json
+import gzip
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from file_lock import FileLock, atomic_write_bytes, atomic_write_json
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+LAYOUTS = ("flat", "hash", "month")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+LAYOUT_FILENAME = "layout.json"
+SHARD_DIR = "receipts"
+
+_EXTENSIONS = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+_ID_MONTH_RE = re.compile(r'^receipt_(\d{4})(\d{2})')
+
+
+class ReceiptLayout:
+    """File placement and encoding of stored receipts"""
+
+    def __init__(self, layout: str = "flat", compression: str = "none", level: Optional[int] = None):
+        """
+        Args:
+            layout: 'flat', 'hash' or 'month'
+            compression: 'none', 'gzip' or 'zstd' (sharded layouts only)
+            level: Compression level (default: 6 for gzip, 3 for zstd)
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown receipt layout '{layout}' (expected one of {LAYOUTS})")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}' (expected one of {COMPRESSIONS})")
+        if layout == "flat" and compression != "none":
+            raise ValueError("The flat layout stores uncompressed files; pick 'hash' or 'month' to compress")
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+        self.layout = layout
+        self.compression = compression
+        self.level = level if level is not None else {"gzip": 6, "zstd": 3}.get(compression)
+
+    @classmethod
+    def load(cls, storage_dir: Union[str, Path]) -> Optional['ReceiptLayout']:
+        """Layout recorded in a history (None if it has no layout.json)"""
+        try:
+            with open(Path(storage_dir) / LAYOUT_FILENAME, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(config.get("layout", "flat"), config.get("compression", "none"), config.get("level"))
+
+    def save(self, storage_dir: Union[str, Path]):
+        atomic_write_json(Path(storage_dir) / LAYOUT_FILENAME, self.to_dict(), indent=2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": 1, "layout": self.layout, "compression": self.compression, "level": self.level}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ReceiptLayout) and (self.layout, self.compression) == \
+            (other.layout, other.compression)
+
+    def __repr__(self) -> str:
+        return f"ReceiptLayout({self.layout!r}, {self.compression!r})"
+
+    def path(self, storage_dir: Union[str, Path], receipt_id: str) -> Path:
+        """File of a receipt in this layout"""
+        storage_dir = Path(storage_dir)
+        filename = receipt_id + _EXTENSIONS[self.compression]
+        if self.layout == "flat":
+            return storage_dir / filename
+        if self.layout == "hash":
+            shard = hashlib.blake2b(receipt_id.encode('utf-8'), digest_size=1).hexdigest()
+            return storage_dir / SHARD_DIR / shard / filename
+        match = _ID_MONTH_RE.match(receipt_id)
+        year, month = match.groups() if match else ("unknown", "00")
+        return storage_dir / SHARD_DIR / year / month / filename
+
+    def encode(self, storage_data: Dict[str, Any]) -> bytes:
+        if self.layout == "flat":
+            return json.dumps(storage_data, indent=2, ensure_ascii=False).encode('utf-8')
+        payload = json.dumps(storage_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if self.compression == "gzip":
+            # mtime=0 keeps the output a pure function of the receipt
+            return gzip.compress(payload, compresslevel=self.level, mtime=0)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(payload)
+        return payload
+
+    def decode(self, payload: bytes) -> Dict[str, Any]:
+        if self.compression == "gzip":
+            payload = gzip.decompress(payload)
+        elif self.compression == "zstd":
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return json.loads(payload.decode('utf-8'))
+
+    def write(self, storage_dir: Union[str, Path], storage_data: Dict[str, Any]) -> Path:
+        """Atomically write a stored receipt; returns its file"""
+        path = self.path(storage_dir, storage_data["receipt_id"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(path, self.encode(storage_data))
+        return path
+
+    def read(self, storage_dir: Union[str, Path], receipt_id: str) -> Optional[Dict[str, Any]]:
+        """A stored receipt (None if its file does not exist)"""
+        try:
+            with open(self.path(storage_dir, receipt_id), 'rb') as f:
+                return self.decode(f.read())
+        except FileNotFoundError:
+            return None
+
+
+def migrate_layout(storage_dir: Union[str, Path], target: ReceiptLayout) -> Dict[str, int]:
+    """
+    Rewrite every receipt of a JSON history into another layout. Holds the history's
+    write lock; new files are written first, then layout.json is switched, then the
+    old files are removed, so an interrupted run leaves a readable history and can
+    simply be run again.
+
+    Args:
+        storage_dir: History directory (index.json plus receipt files)
+        target: Layout to move to
+
+    Returns:
+        Counts: 'receipts' rewritten, 'missing' files, 'bytes_before', 'bytes_after'
+    """
+    storage_dir = Path(storage_dir)
+    counts = {"receipts": 0, "missing": 0, "bytes_before": 0, "bytes_after": 0}
+
+    with FileLock(storage_dir / "index.lock"):
+        source = ReceiptLayout.load(storage_dir) or ReceiptLayout()
+        with open(storage_dir / "index.json", 'r', encoding='utf-8') as f:
+            receipt_ids = [entry["receipt_id"] for entry in json.load(f)]
+
+        moved = []
+        for receipt_id in receipt_ids:
+            old_path = source.path(storage_dir, receipt_id)
+            try:
+                payload = old_path.read_bytes()
+            except FileNotFoundError:
+                counts["missing"] += 1
+                continue
+            counts["bytes_before"] += len(payload)
+            new_path = target.path(storage_dir, receipt_id)
+            if new_path != old_path:
+                new_path.parent.mkdir(parents=True, exist_ok=True)
+                payload = target.encode(source.decode(payload))
+                atomic_write_bytes(new_path, payload)
+            counts["bytes_after"] += len(payload)
+            counts["receipts"] += 1
+            if new_path != old_path:
+                moved.append(old_path)
+
+        target.save(storage_dir)
+
+        for old_path in moved:
+            old_path.unlink()
+        # Shard directories the old layout no longer uses
+        shard_root = storage_dir / SHARD_DIR
+        if shard_root.exists():
+            directories = [shard_root, *(p for p in shard_root.rglob('*') if p.is_dir())]
+            for directory in sorted(directories, key=lambda p: len(p.parts), reverse=True):
+                if not any(directory.iterdir()):
+                    directory.rmdir()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a JSON receipt history to another file layout")
+    parser.add_argument("storage_dir", nargs="?", default="receipt_history", help="History directory")
+    parser.add_argument("--layout", choices=LAYOUTS, required=True)
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--level", type=int, default=None, help="Compression level")
+    args = parser.parse_args()
+
+    target = ReceiptLayout(args.layout, args.compression, args.level)
+    counts = migrate_layout(args.storage_dir, target)
+    print(f"📦 Rewrote {counts['receipts']} receipt(s) as {target}")
+    if counts["missing"]:
+        print(f"⚠️  {counts['missing']} receipt file(s) listed in the index were missing")
+    if counts["bytes_before"]:
+        print(f"   Size: {counts['bytes_before'] / 1e6:.2f} MB -> {counts['bytes_after'] / 1e6:.2f} MB "
+              f"({counts['bytes_after'] / counts['bytes_before']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
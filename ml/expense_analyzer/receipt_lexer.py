@@ -0,0 +1,236 @@
+"""
+Receipt Lexer
+Single pass over OCR text that builds a line/token table: non-empty lines and every
+number token mapped to its line. Total-pattern matches, date matches, line keyword
+flags and currency markers are derived from the table on first use and memoized,
+so amount, date, vendor and currency extraction never rescan the text for the
+same thing twice.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+# Explicit total patterns with their confidence (highest confidence first)
+TOTAL_PATTERNS = [
+    # Match "TOTAL: 649" or "Total: ₹649" or "Grand Total: 649.00"
+    (re.compile(r'(?:^|\b)(?:grand\s+)?total\s*[:=]\s*(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)', re.IGNORECASE), 100),
+    # Match "Amount Due: 649" or "Net Amount: 649"
+    (re.compile(r'(?:amount\s+due|net\s+amount|amount\s+payable|balance\s+due)\s*[:=]\s*(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)', re.IGNORECASE), 100),
+    # Match "649 TOTAL" or "₹649 (Total)"
+    (re.compile(r'(?:[₹$€£]\s*)?(\d+[,\d]*\.?\d*)\s*(?:\()?(?:total|grand\s+total)(?:\))?', re.IGNORECASE), 90),
+]
+
+# Words one of which must appear (case-insensitively) on a line for each total pattern
+# to match there; other lines skip the backtracking-heavy scans entirely
+TOTAL_PATTERN_KEYWORDS = [
+    ('total',),
+    ('amount', 'balance'),
+    ('total',),
+]
+
+DATE_PATTERNS = [
+    re.compile(r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\b', re.IGNORECASE),  # DD-MM-YYYY or DD/MM/YYYY
+    re.compile(r'\b(\d{2,4}[-/]\d{1,2}[-/]\d{1,2})\b', re.IGNORECASE),  # YYYY-MM-DD
+    re.compile(r'\b(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4})\b', re.IGNORECASE),  # DD Month YYYY
+    re.compile(r'\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{2,4})\b', re.IGNORECASE),  # Month DD, YYYY
+]
+
+# strptime formats for the dates DATE_PATTERNS find, tried in this order
+# (day-first before month-first, four-digit years before two-digit ones)
+_DATE_FORMATS = [
+    "%d-%m-%Y", "%d/%m/%Y", "%d-%m-%y", "%d/%m/%y",
+    "%Y-%m-%d", "%Y/%m/%d",
+    "%d %b %Y", "%d %B %Y",
+    "%b %d, %Y", "%B %d, %Y",
+    "%b %d %Y", "%B %d %Y",
+    "%d %b %y", "%d %B %y",
+    "%b %d, %y", "%B %d, %y",
+    "%b %d %y", "%B %d %y",
+]
+# Formats keyed by which of '-' and '/' they contain, in their original order
+DATE_FORMATS = {
+    (dash, slash): [fmt for fmt in _DATE_FORMATS if ('-' in fmt) == dash and ('/' in fmt) == slash]
+    for dash in (False, True) for slash in (False, True)
+}
+_ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
+
+NUMBER_RE = re.compile(r'(\d{1,3}(?:[,\d]*)?(?:\.\d{1,2})?)')
+ITEM_RE = re.compile(r'\b\d+\s*x\b')
+
+# Currency markers in priority order
+CURRENCY_MARKERS = [
+    ('INR', ('₹', 'INR', 'Rs')),
+    ('USD', ('$', 'USD')),
+    ('EUR', ('€', 'EUR')),
+    ('GBP', ('£', 'GBP')),
+]
+
+# Line keywords by flag; a line has a flag if any of its keywords is a substring of the line
+LINE_KEYWORDS = {
+    'id_line': ('invoice no', 'order no', 'bill no', 'receipt no', 'gst no', 'date:', 'time:'),
+    'total': ('total', 'amount due', 'balance', 'payable'),
+    'subtotal': ('subtotal', 'sub total', 'sub-total'),
+    'tax': ('tax', 'gst', 'vat', 'cgst', 'sgst'),
+    'fee': ('delivery', 'shipping', 'service charge', 'tip'),
+    'discount': ('discount', 'coupon', 'promo'),
+}
+VENDOR_SKIP_KEYWORDS = ('tax', 'invoice', 'bill', 'receipt', 'gst', 'date', 'time')
+
+
+def _overlapping_alternation(words) -> 're.Pattern':
+    """Regex finding every (possibly overlapping) occurrence of any word"""
+    ordered = sorted(set(words), key=len, reverse=True)
+    return re.compile('(?=(' + '|'.join(re.escape(w) for w in ordered) + '))')
+
+
+# One scan finds every currency marker / line keyword. Lookahead matching tries every
+# position, so overlapping markers (the "Rs" in "EURs", the "total" in "subtotal") are seen.
+CURRENCY_RE = _overlapping_alternation(m for _, markers in CURRENCY_MARKERS for m in markers)
+LINE_KEYWORD_RE = _overlapping_alternation(kw for kws in LINE_KEYWORDS.values() for kw in kws)
+
+# At a given position only the longest keyword is reported, so a match also
+# implies the flags of every shorter keyword that is its prefix ("gst no" -> "gst")
+_KEYWORD_FLAGS = {
+    kw: frozenset(flag for flag, kws in LINE_KEYWORDS.items() for other in kws if kw.startswith(other))
+    for kws in LINE_KEYWORDS.values() for kw in kws
+}
+
+
+class ReceiptText:
+    """Line/token table for one OCR text"""
+
+    def __init__(self, text: str):
+        """
+        Lex OCR text into non-empty lines and number tokens.
+
+        Args:
+            text: Raw OCR output
+        """
+        self.text = text
+
+        # Non-empty stripped lines
+        self.lines: List[str] = [line for line in (raw.strip() for raw in text.splitlines()) if line]
+
+        # (raw token, value, line index) for every number, in reading order.
+        # Tokens never contain line breaks, so lexing line by line finds the same
+        # tokens as scanning the whole text; every token is a valid float once
+        # thousands separators are removed.
+        self.numbers = [
+            (raw, float(raw.replace(',', '')), idx)
+            for idx, line in enumerate(self.lines)
+            for raw in NUMBER_RE.findall(line)
+        ]
+
+        self._number_lines = {line for _, _, line in self.numbers}
+        self._lines_lower = None
+        self._total_matches = {}
+        self._date_matches = {}
+        self._line_flags = None
+        self._currency = None
+
+    @property
+    def lines_lower(self) -> List[str]:
+        """Lower-cased non-empty lines"""
+        if self._lines_lower is None:
+            self._lines_lower = [line.lower() for line in self.lines]
+        return self._lines_lower
+
+    def total_match(self, pattern_index: int) -> Optional[Tuple[int, str]]:
+        """
+        Last match of an explicit total pattern, searching line by line from the bottom.
+
+        Returns:
+            (line index, amount string), or None if the pattern does not match
+        """
+        if pattern_index not in self._total_matches:
+            pattern = TOTAL_PATTERNS[pattern_index][0]
+            keywords = TOTAL_PATTERN_KEYWORDS[pattern_index]
+            lines_lower = self.lines_lower
+            result = None
+            # Only lines with a number and one of the pattern's keywords can match
+            for idx in sorted(self._number_lines, reverse=True):
+                if any(kw in lines_lower[idx] for kw in keywords):
+                    last = None
+                    for last in pattern.finditer(self.lines[idx]):
+                        pass
+                    if last is not None:
+                        result = (idx, last.group(1))
+                        break
+            self._total_matches[pattern_index] = result
+        return self._total_matches[pattern_index]
+
+    def date_match(self, pattern_index: int) -> Optional[str]:
+        """First match of a date pattern, or None"""
+        if pattern_index not in self._date_matches:
+            match = DATE_PATTERNS[pattern_index].search(self.text) if self.numbers else None
+            self._date_matches[pattern_index] = match.group(1) if match else None
+        return self._date_matches[pattern_index]
+
+    def line_flags(self, line_index: int) -> frozenset:
+        """Keyword flags of a line (see LINE_KEYWORDS, plus 'item' for "2 x" lines)"""
+        if self._line_flags is None:
+            self._line_flags = [None] * len(self.lines)
+        flags = self._line_flags[line_index]
+        if flags is None:
+            lower = self.lines_lower[line_index]
+            flags = set()
+            for kw in LINE_KEYWORD_RE.findall(lower):
+                flags |= _KEYWORD_FLAGS[kw]
+            if ITEM_RE.search(lower):
+                flags.add('item')
+            flags = self._line_flags[line_index] = frozenset(flags)
+        return flags
+
+    @property
+    def currency(self) -> str:
+        """Detected currency code (defaults to INR)"""
+        if self._currency is None:
+            found = set(CURRENCY_RE.findall(self.text))
+            self._currency = next((code for code, markers in CURRENCY_MARKERS
+                                   if not found.isdisjoint(markers)), 'INR')  # Default to INR
+        return self._currency
+
+    def all_amounts(self) -> list:
+        """All distinct numeric amounts in a reasonable range, sorted"""
+        return sorted({value for _, value, _ in self.numbers
+                       if 1 <= value < 1000000})
+
+    def head_lines(self, count: int = 5) -> List[str]:
+        """First lines of the stripped text (blank lines included), each stripped"""
+        return [line.strip() for line in self.text.strip().split('\n', count)[:count]]
+
+
+def tokenize(text) -> ReceiptText:
+    """Build the line/token table for text (returned unchanged if already tokenized)"""
+    return text if isinstance(text, ReceiptText) else ReceiptText(text)
+
+
+def parse_date(date_str: str) -> Optional[datetime]:
+    """Parse a receipt date in any of the DATE_FORMATS (None if none fits)"""
+    date_str = date_str.strip()
+    # Only formats whose '-'/'/' separators match the string can succeed
+    for fmt in DATE_FORMATS[('-' in date_str, '/' in date_str)]:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def iso_date(value) -> Optional[str]:
+    """
+    'YYYY-MM-DD' of a stored receipt date: ISO dates and timestamps as they are,
+    anything else (an LLM's "05/03/2020" or "Mar 17, 19") through parse_date.
+
+    Returns:
+        ISO date, or None if the value is missing or not a recognizable date
+    """
+    if not isinstance(value, str):
+        return None
+    match = _ISO_DATE_RE.match(value)
+    if match:
+        return match.group(0)
+    parsed = parse_date(value)
+    return parsed.strftime("%Y-%m-%d") if parsed else None
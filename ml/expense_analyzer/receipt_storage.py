@@ -6,32 +6,68 @@ Stores analyzed receipts in JSON format for history tracking and duplicate detec
 import os
 import json
 import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from PIL import Image
+from typing import Dict, Any, List, Optional, Tuple
+
+from image_hashing import compute_hashes
+from hash_index import HammingIndex, parse_hash
+from content_minhash import MinHashLSH, content_signature, decode_signature
+from spend_stats import SpendStatistics, RunningStats, statistics_report
+from file_lock import FileLock, atomic_write_json
+from receipt_layout import ReceiptLayout, LAYOUT_FILENAME
 
 
 class ReceiptStorage:
     """
     Manages receipt storage and retrieval.
     Stores receipts as JSON files with unique IDs and provides query capabilities.
+    Several processes may save into the same directory: writers take index.lock and
+    every file is replaced atomically, so readers never see a partial write.
     """
     
-    def __init__(self, storage_dir: str = "receipt_history"):
+    def __init__(self, storage_dir: str = "receipt_history", layout: Optional[str] = None,
+                 compression: Optional[str] = None):
         """
         Initialize receipt storage.
         
         Args:
             storage_dir: Directory to store receipt JSON files
+            layout: Receipt file layout of a new history: 'flat', 'hash' or 'month'
+                    (default: RECEIPT_LAYOUT, else 'flat'; see receipt_layout.py)
+            compression: 'none', 'gzip' or 'zstd' for sharded layouts
+                         (default: RECEIPT_COMPRESSION, else 'none')
         """
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
         
+        # Serializes writers across processes (and threads sharing this instance)
+        self.lock = FileLock(self.storage_dir / "index.lock")
+        
         # Create index file if it doesn't exist
         self.index_file = self.storage_dir / "index.json"
-        if not self.index_file.exists():
-            self._save_index([])
+        self.layout_file = self.storage_dir / LAYOUT_FILENAME
+        self._layout_version = None
+        with self.lock:
+            if not self.index_file.exists():
+                ReceiptLayout(layout or os.getenv('RECEIPT_LAYOUT', 'flat').lower(),
+                              compression or os.getenv('RECEIPT_COMPRESSION', 'none').lower()
+                              ).save(self.storage_dir)
+                self._save_index([])
+            self.layout = self._current_layout()
+        
+        if (layout or compression) and self.layout != ReceiptLayout(layout or self.layout.layout,
+                                                                   compression or self.layout.compression):
+            raise ValueError(f"{self.storage_dir} is stored as {self.layout}; "
+                             f"migrate it with receipt_layout.py first")
+        
+        # Running spend statistics, rewritten with each save
+        self.stats_file = self.storage_dir / "spend_stats.json"
+        self._spend_stats = None
+        self._spend_stats_version = None
+        
+        self._init_lookup_indexes()
     
     def _load_index(self) -> List[Dict]:
         """Load the receipt index"""
@@ -43,9 +79,8 @@ class ReceiptStorage:
             return []
     
     def _save_index(self, index: List[Dict]):
-        """Save the receipt index"""
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(index, f, indent=2, ensure_ascii=False)
+        """Save the receipt index (caller holds self.lock)"""
+        atomic_write_json(self.index_file, index, indent=2)
     
     def generate_image_hash(self, image_path: str) -> str:
         """
@@ -56,22 +91,10 @@ class ReceiptStorage:
             image_path: Path to receipt image
             
         Returns:
-            Hash string (64 characters)
+            Hash string (16 hex characters)
         """
         try:
-            with Image.open(image_path) as img:
-                # Convert to grayscale and resize to 8x8
-                img = img.convert('L').resize((8, 8), Image.Resampling.LANCZOS)
-                pixels = list(img.getdata())
-                
-                # Calculate average
-                avg = sum(pixels) / len(pixels)
-                
-                # Generate hash bits (1 if pixel > avg, else 0)
-                bits = ''.join(['1' if p > avg else '0' for p in pixels])
-                
-                # Convert to hex
-                return hex(int(bits, 2))[2:].zfill(16)
+            return compute_hashes(image_path, kinds=('ahash',))['ahash']
         except Exception as e:
             print(f"Warning: Could not generate image hash: {e}")
             # Fallback to file content hash
@@ -119,56 +142,97 @@ class ReceiptStorage:
         # Generate hash
         return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
     
-    def save_receipt(self, receipt_data: Dict[str, Any], image_path: str) -> str:
+    def generate_content_minhash(self, receipt_data: Dict[str, Any]) -> Optional[str]:
+        """
+        MinHash signature of the receipt's normalized vendor, amount, date and line
+        items. Tolerates OCR noise that changes the exact content hash.
+        
+        Args:
+            receipt_data: Extracted receipt data
+            
+        Returns:
+            Encoded signature, or None if the receipt has no content to compare
+        """
+        return content_signature(receipt_data)
+    
+    def save_receipt(self, receipt_data: Dict[str, Any], image_path: str,
+                     image_hash: Optional[str] = None, content_hash: Optional[str] = None) -> str:
         """
         Save receipt data to storage.
         
         Args:
             receipt_data: Analyzed receipt data
             image_path: Original image file path
+            image_hash: Precomputed image hash (computed from image_path if omitted)
+            content_hash: Precomputed content hash (computed from receipt_data if omitted)
             
         Returns:
             Receipt ID (timestamp-based)
         """
         # Generate hashes
-        image_hash = self.generate_image_hash(image_path)
-        content_hash = self.generate_content_hash(receipt_data)
+        image_hash = image_hash or self.generate_image_hash(image_path)
+        content_hash = content_hash or self.generate_content_hash(receipt_data)
+        
+        content_minhash = self.generate_content_minhash(receipt_data)
+        
+        # Read-modify-write of the index under the lock: without it, concurrent
+        # writers both append to the same old index and one entry is lost
+        with self.lock:
+            layout = self._current_layout()
+            while True:
+                storage_data = self._storage_record(receipt_data, image_path, image_hash, content_hash,
+                                                    content_minhash)
+                receipt_id = storage_data["receipt_id"]
+                # Another process took the same microsecond timestamp; take the next one
+                if not layout.path(self.storage_dir, receipt_id).exists():
+                    break
+            
+            # Save to file
+            layout.write(self.storage_dir, storage_data)
+            
+            # Update index (receipts saved before content signatures get theirs now)
+            index = self._fill_content_minhash(self._load_index())
+            entry = self._index_entry(storage_data)
+            index.append(entry)
+            self._save_index(index)
+            self._update_spend_stats(index, entry)
         
+        return receipt_id
+    
+    @staticmethod
+    def _storage_record(receipt_data: Dict[str, Any], image_path: str, image_hash: str,
+                        content_hash: str, content_minhash: Optional[str] = None) -> Dict[str, Any]:
+        """Stored form of a receipt: a new timestamp-based ID and hashes plus the analysis"""
         # Generate unique ID
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         receipt_id = f"receipt_{timestamp}"
         
         # Add metadata
-        storage_data = {
+        return {
             "receipt_id": receipt_id,
             "stored_at": datetime.now().isoformat(),
             "original_file": str(Path(image_path).name),
             "image_hash": image_hash,
             "content_hash": content_hash,
+            "content_minhash": content_minhash,
             **receipt_data
         }
-        
-        # Save to file
-        receipt_file = self.storage_dir / f"{receipt_id}.json"
-        with open(receipt_file, 'w', encoding='utf-8') as f:
-            json.dump(storage_data, f, indent=2, ensure_ascii=False)
-        
-        # Update index
-        index = self._load_index()
-        index_entry = {
-            "receipt_id": receipt_id,
+    
+    @staticmethod
+    def _index_entry(storage_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Index fields of a stored receipt"""
+        extracted = storage_data.get('extracted_data', {})
+        return {
+            "receipt_id": storage_data["receipt_id"],
             "stored_at": storage_data["stored_at"],
-            "vendor": receipt_data.get('extracted_data', {}).get('vendor'),
-            "amount": receipt_data.get('extracted_data', {}).get('amount'),
-            "date": receipt_data.get('extracted_data', {}).get('date'),
-            "category": receipt_data.get('extracted_data', {}).get('category'),
-            "image_hash": image_hash,
-            "content_hash": content_hash,
+            "vendor": extracted.get('vendor'),
+            "amount": extracted.get('amount'),
+            "date": extracted.get('date'),
+            "category": extracted.get('category'),
+            "image_hash": storage_data["image_hash"],
+            "content_hash": storage_data["content_hash"],
+            "content_minhash": storage_data.get("content_minhash"),
         }
-        index.append(index_entry)
-        self._save_index(index)
-        
-        return receipt_id
     
     def find_duplicates(self, image_hash: str, content_hash: str) -> List[Dict]:
         """
@@ -181,79 +245,286 @@ class ReceiptStorage:
         Returns:
             List of matching receipts
         """
-        index = self._load_index()
-        duplicates = []
+        with self._index_lock:
+            self._sync_indexes()
+            matches = {}
+            # Content match (same receipt, different photo), unless the image matches too
+            for position, entry in self._content_hash_entries.get(content_hash, ()):
+                matches[position] = (entry, 'same_content')
+            for position, entry in self._image_hash_entries.get(image_hash, ()):
+                matches[position] = (entry, 'exact_image')
+        
+        # In index order, like a scan of the whole index
+        return [{**entry, 'match_type': match_type} for _, (entry, match_type) in sorted(matches.items())]
+    
+    def find_near_duplicates(self, image_hash: str, max_distance: int = 5) -> List[Dict]:
+        """
+        Find receipts whose image hash is within max_distance bits of image_hash
+        (re-photographed or slightly cropped copies).
         
-        for entry in index:
-            match_type = None
+        Args:
+            image_hash: Hash of the image (16 hex characters)
+            max_distance: Largest Hamming distance counted as a match
             
-            # Exact image match
-            if entry['image_hash'] == image_hash:
-                match_type = 'exact_image'
-            # Content match (same receipt, different photo)
-            elif entry['content_hash'] == content_hash:
-                match_type = 'same_content'
+        Returns:
+            List of matching receipts, closest first, each with 'distance' and a
+            'match_type' of 'exact_image' (distance 0) or 'similar_image'
+        """
+        value = parse_hash(image_hash)
+        if value is None:
+            return []
+        
+        with self._index_lock:
+            self._sync_indexes()
+            matches = self._hash_index.search(value, max_distance)
+        
+        entries = self._index_entries([key for key, _ in matches])
+        return [{
+            **entry,
+            'match_type': 'exact_image' if distance == 0 else 'similar_image',
+            'distance': distance
+        } for entry, (_, distance) in zip(entries, matches)]
+    
+    def find_similar_content(self, content_minhash: str,
+                             min_similarity: float = 0.7) -> Tuple[List[Dict], int]:
+        """
+        Find receipts whose content is similar to a MinHash signature (same receipt
+        read with OCR noise), via the LSH banding index.
+        
+        Args:
+            content_minhash: Signature from generate_content_minhash()
+            min_similarity: Smallest estimated Jaccard similarity counted as a match
             
-            if match_type:
-                duplicates.append({
-                    **entry,
-                    'match_type': match_type
-                })
+        Returns:
+            (matching receipts, most similar first, each with 'similarity' and a
+            'match_type' of 'similar_content'; number of LSH candidates compared)
+        """
+        signature = decode_signature(content_minhash)
+        if signature is None:
+            return [], 0
         
-        return duplicates
+        with self._index_lock:
+            self._sync_indexes()
+            matches, candidates = self._content_index.query(signature, min_similarity)
+        
+        entries = self._index_entries([key for key, _ in matches])
+        return [{
+            **entry,
+            'match_type': 'similar_content',
+            'similarity': round(score, 4)
+        } for entry, (_, score) in zip(entries, matches)], candidates
+    
+    def _init_lookup_indexes(self):
+        """In-memory image-hash, exact-hash and content LSH indexes (built on first search)"""
+        # Similarity around which LSH bands start colliding; searches for lower
+        # similarities than this lose recall
+        self.content_lsh_threshold = float(os.getenv('CONTENT_LSH_THRESHOLD', '0.5'))
+        self._hash_index = None
+        self._content_index = None
+        # Exact image/content hash -> [(index position, entry)] (JSON only; SQLite
+        # looks exact hashes up in its table)
+        self._image_hash_entries = {}
+        self._content_hash_entries = {}
+        self._indexed = 0
+        self._index_version = None
+        self._index_lock = threading.Lock()
+    
+    def _reset_lookup_indexes(self):
+        self._hash_index = HammingIndex()
+        self._content_index = MinHashLSH(self.content_lsh_threshold)
+        self._image_hash_entries = {}
+        self._content_hash_entries = {}
+        self._indexed = 0
+    
+    def _index_receipt(self, key, image_hash: Optional[str], content_minhash: Optional[str]):
+        """Add one stored receipt to the lookup indexes"""
+        value = parse_hash(image_hash)
+        if value is not None:
+            self._hash_index.add(value, key)
+        signature = decode_signature(content_minhash)
+        if signature is not None:
+            self._content_index.add(signature, key)
+    
+    def _sync_indexes(self):
+        """
+        Add receipts saved since the last search. The index only ever grows, and each
+        save renames a new file into place, so inode/mtime/size identify a version.
+        """
+        stat = self.index_file.stat()
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._index_version:
+            return
+        
+        index = self._load_index()
+        if self._hash_index is None or len(index) < self._indexed:
+            self._reset_lookup_indexes()
+        new_entries = self._fill_content_minhash(index[self._indexed:])
+        for position, entry in enumerate(new_entries, self._indexed):
+            self._index_receipt(entry, entry.get('image_hash'), entry.get('content_minhash'))
+            self._image_hash_entries.setdefault(entry.get('image_hash'), []).append((position, entry))
+            self._content_hash_entries.setdefault(entry.get('content_hash'), []).append((position, entry))
+        self._indexed = len(index)
+        self._index_version = version
+    
+    @staticmethod
+    def _needs_content_minhash(index: List[Dict]) -> bool:
+        """Whether any receipt was saved before content signatures were stored"""
+        return any('content_minhash' not in entry for entry in index)
+    
+    def _fill_content_minhash(self, entries: List[Dict]) -> List[Dict]:
+        """
+        Compute content signatures, in place, for receipts saved before signatures were
+        stored, so fuzzy content matching covers the whole history. Reads only fill
+        them in memory; save_receipt() writes them with the next index update (the
+        SQLite migration does the same).
+        
+        Returns:
+            entries
+        """
+        if not self._needs_content_minhash(entries):
+            return entries
+        layout = self._current_layout()
+        for entry in entries:
+            if 'content_minhash' in entry:
+                continue
+            try:
+                storage_data = layout.read(self.storage_dir, entry['receipt_id'])
+            except (OSError, ValueError):
+                storage_data = None
+            # Receipt file lost; the index still has vendor/amount/date
+            entry['content_minhash'] = content_signature(storage_data or {'extracted_data': entry})
+        return entries
+    
+    def _index_entries(self, keys: List) -> List[Dict]:
+        """Index entries for the keys stored in the lookup indexes"""
+        return keys
+    
+    def _current_layout(self) -> ReceiptLayout:
+        """Receipt file layout, re-read if layout.json changed (e.g. after a migration)"""
+        try:
+            stat = self.layout_file.stat()
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            # Histories created before layouts existed
+            version = None
+        if version is None or version != self._layout_version:
+            self.layout = ReceiptLayout.load(self.storage_dir) or ReceiptLayout()
+            self._layout_version = version
+        return self.layout
     
     def get_receipt(self, receipt_id: str) -> Optional[Dict]:
         """Load a specific receipt by ID"""
-        receipt_file = self.storage_dir / f"{receipt_id}.json"
-        if receipt_file.exists():
-            with open(receipt_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        layout = self.layout
+        receipt = layout.read(self.storage_dir, receipt_id)
+        if receipt is None and self._current_layout() != layout:
+            # The history was migrated to another layout since
+            receipt = self.layout.read(self.storage_dir, receipt_id)
+        return receipt
     
     def get_all_receipts(self) -> List[Dict]:
         """Get index of all receipts"""
-        return self._load_index()
+        return self._fill_content_minhash(self._load_index())
     
     def get_receipts_by_category(self, category: str) -> List[Dict]:
         """Get all receipts in a category"""
         index = self._load_index()
-        return [r for r in index if r.get('category', '').lower() == category.lower()]
+        return [r for r in index if (r.get('category') or '').lower() == category.lower()]
     
     def get_receipts_by_vendor(self, vendor: str) -> List[Dict]:
         """Get all receipts from a vendor"""
         index = self._load_index()
         vendor_lower = vendor.lower()
-        return [r for r in index if vendor_lower in r.get('vendor', '').lower()]
+        return [r for r in index if vendor_lower in (r.get('vendor') or '').lower()]
     
-    def get_statistics(self) -> Dict[str, Any]:
-        """Get storage statistics"""
-        index = self._load_index()
-        
-        if not index:
-            return {
-                "total_receipts": 0,
-                "categories": {},
-                "total_amount": 0,
-                "currency": "INR"
-            }
+    def _load_spend_stats(self) -> SpendStatistics:
+        """Running statistics as last saved (rebuilt from the index if the file is missing)"""
+        try:
+            stat = self.stats_file.stat()
+        except FileNotFoundError:
+            with self.lock:
+                if self.stats_file.exists():
+                    return self._load_spend_stats()
+                statistics = SpendStatistics.from_entries(self._load_index())
+                self._save_spend_stats(statistics)
+                return statistics
         
-        # Calculate stats
-        categories = {}
-        total_amount = 0
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._spend_stats_version:
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    self._spend_stats = SpendStatistics.from_dict(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not load spend statistics, rebuilding: {e}")
+                self._spend_stats = SpendStatistics.from_entries(self._load_index())
+            self._spend_stats_version = version
+        return self._spend_stats
+    
+    def _save_spend_stats(self, statistics: SpendStatistics):
+        """Save the running statistics (caller holds self.lock)"""
+        atomic_write_json(self.stats_file, statistics.to_dict(), separators=(',', ':'))
+        stat = self.stats_file.stat()
+        self._spend_stats = statistics
+        self._spend_stats_version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def _update_spend_stats(self, index: List[Dict], entry: Dict[str, Any]):
+        """Add a just-indexed receipt to the running statistics"""
+        statistics = self._load_spend_stats()
+        receipts = statistics.get('all').receipts if statistics.get('all') else 0
+        if receipts == len(index) - 1:
+            statistics.add(entry)
+        else:
+            # Statistics fell out of step with the index (e.g. edited by hand)
+            statistics = SpendStatistics.from_entries(index)
+        self._save_spend_stats(statistics)
+    
+    def get_spend_stats(self, group: str, key=None) -> Optional[RunningStats]:
+        """
+        Running spend statistics of one group of stored receipts.
         
-        for receipt in index:
-            cat = receipt.get('category', 'other')
-            categories[cat] = categories.get(cat, 0) + 1
-            total_amount += receipt.get('amount', 0) or 0
+        Args:
+            group: 'all', 'vendor' (case-insensitive name), 'category' or 'month' ('YYYY-MM')
+            key: Vendor, category or month (unused for 'all')
+            
+        Returns:
+            RunningStats (count, mean, std, quantiles, ...) or None if no receipt is in the group
+        """
+        return self._load_spend_stats().get(group, key)
+    
+    def _spend_groups(self, group: str) -> Dict[Any, RunningStats]:
+        """Running statistics of every vendor/category/month, in order of first appearance"""
+        return self._load_spend_stats().by_group(group)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Get storage statistics from the running per-category and per-month statistics
+        (no scan of the receipt history).
+        """
+        return statistics_report(self.get_spend_stats('all'), self._spend_groups('category'),
+                                 self._spend_groups('month'))
+
+
+STORAGE_BACKENDS = ("json", "sqlite")
+
+
+def open_storage(storage_dir: str = "receipt_history", backend: Optional[str] = None) -> ReceiptStorage:
+    """
+    Open the receipt history with the configured backend.
+    
+    Args:
+        storage_dir: Directory holding the history
+        backend: 'json' (index.json plus one file per receipt) or 'sqlite'
+                 (default: RECEIPT_STORAGE_BACKEND, else 'json')
         
-        return {
-            "total_receipts": len(index),
-            "categories": categories,
-            "total_amount": total_amount,
-            "currency": "INR",  # Could be enhanced to track multiple currencies
-            "oldest_receipt": index[0].get('date') if index else None,
-            "newest_receipt": index[-1].get('date') if index else None,
-        }
+    Returns:
+        ReceiptStorage (or SQLiteReceiptStorage) instance
+    """
+    backend = (backend or os.getenv('RECEIPT_STORAGE_BACKEND') or 'json').lower()
+    if backend == 'sqlite':
+        from receipt_storage_sqlite import SQLiteReceiptStorage
+        return SQLiteReceiptStorage(storage_dir)
+    if backend != 'json':
+        raise ValueError(f"Unknown storage backend '{backend}' (expected one of {STORAGE_BACKENDS})")
+    return ReceiptStorage(storage_dir)
 
 
 def test_storage():
@@ -0,0 +1,364 @@
+"""
+SQLite Receipt Storage
+Receipt history in a single SQLite database (WAL mode) with indexed hash, vendor,
+category and date lookups. Same public methods as the JSON ReceiptStorage, but
+saving a receipt is one INSERT instead of rewriting index.json.
+"""
+
+import json
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from receipt_storage import ReceiptStorage
+from receipt_layout import ReceiptLayout
+from content_minhash import content_signature
+from spend_stats import SpendStatistics, RunningStats, group_key, receipt_groups, vendor_key
+
+
+DB_FILENAME = "receipts.sqlite3"
+
+INDEX_FIELDS = ("receipt_id", "stored_at", "vendor", "amount", "date", "category",
+                "image_hash", "content_hash", "content_minhash")
+
+# vendor/amount/date/category are declared without a type so values come back
+# exactly as stored (649 stays an int, 649.0 a float, None stays NULL)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    receipt_id TEXT NOT NULL UNIQUE,
+    stored_at TEXT,
+    vendor,
+    amount,
+    date,
+    category,
+    vendor_key TEXT,
+    category_key TEXT,
+    image_hash TEXT,
+    content_hash TEXT,
+    data TEXT NOT NULL,
+    content_minhash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_receipts_image_hash ON receipts(image_hash);
+CREATE INDEX IF NOT EXISTS idx_receipts_content_hash ON receipts(content_hash);
+CREATE INDEX IF NOT EXISTS idx_receipts_vendor ON receipts(vendor_key);
+CREATE INDEX IF NOT EXISTS idx_receipts_category ON receipts(category_key);
+CREATE INDEX IF NOT EXISTS idx_receipts_date ON receipts(date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS spend_stats (
+    group_key TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+SELECT_ENTRY = "SELECT " + ", ".join(INDEX_FIELDS) + " FROM receipts"
+
+
+def _lower(value) -> Optional[str]:
+    """Lowercased lookup key (NULL for missing/non-text values)"""
+    return value.lower() if isinstance(value, str) else None
+
+
+class SQLiteReceiptStorage(ReceiptStorage):
+    """
+    ReceiptStorage backed by SQLite.
+    Each thread gets its own connection; WAL mode lets readers run while a writer commits.
+    """
+
+    def __init__(self, storage_dir: str = "receipt_history", migrate: bool = True):
+        """
+        Initialize SQLite receipt storage.
+
+        Args:
+            storage_dir: Directory holding receipts.sqlite3
+            migrate: Import an existing index.json history the first time the database is opened
+        """
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(exist_ok=True)
+        self.index_file = self.storage_dir / "index.json"
+        self.db_path = self.storage_dir / DB_FILENAME
+        self._local = threading.local()
+        self._init_lookup_indexes()
+
+        conn = self._conn()
+        with conn:
+            conn.executescript(SCHEMA)
+            # Databases created before a column existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(receipts)")}
+            if "content_minhash" not in columns:
+                conn.execute("ALTER TABLE receipts ADD COLUMN content_minhash TEXT")
+
+        if migrate and self.index_file.exists() and self._meta("json_migrated_at") is None:
+            count = self.migrate_from_json()
+            if count:
+                print(f"📦 Migrated {count} receipt(s) from {self.index_file} to {self.db_path.name}")
+
+        # Databases from before running statistics existed
+        if not self._spend_stats_current(conn):
+            with conn:
+                # Take the write lock before re-checking, so a receipt saved by another
+                # process in between cannot be left out of the rebuilt statistics
+                conn.execute("BEGIN IMMEDIATE")
+                if not self._spend_stats_current(conn):
+                    self._rebuild_spend_stats(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (opened on first use)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _row(storage_data: Dict[str, Any], entry: Optional[Dict] = None) -> tuple:
+        """Column values for a stored receipt (indexed fields from `entry` if given)"""
+        entry = entry or ReceiptStorage._index_entry(storage_data)
+        return (
+            *(entry.get(field) for field in INDEX_FIELDS),
+            _lower(entry.get("vendor")),
+            _lower(entry.get("category")),
+            json.dumps(storage_data, ensure_ascii=False, separators=(',', ':')),
+        )
+
+    def _insert(self, conn: sqlite3.Connection, rows: List[tuple], or_ignore: bool = False) -> int:
+        """Insert receipt rows; returns how many were added"""
+        verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+        columns = INDEX_FIELDS + ("vendor_key", "category_key", "data")
+        before = conn.total_changes
+        conn.executemany(
+            f"{verb} INTO receipts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+        return conn.total_changes - before
+
+    def _entries(self, where: str = "", params: tuple = ()) -> List[Dict]:
+        """Index entries matching a WHERE clause, in insertion order"""
+        cursor = self._conn().execute(f"{SELECT_ENTRY} {where} ORDER BY seq", params)
+        return [dict(zip(INDEX_FIELDS, row)) for row in cursor]
+
+    def save_receipt(self, receipt_data: Dict[str, Any], image_path: str,
+                     image_hash: Optional[str] = None, content_hash: Optional[str] = None) -> str:
+        """
+        Save receipt data to storage.
+
+        Args:
+            receipt_data: Analyzed receipt data
+            image_path: Original image file path
+            image_hash: Precomputed image hash (computed from image_path if omitted)
+            content_hash: Precomputed content hash (computed from receipt_data if omitted)
+
+        Returns:
+            Receipt ID (timestamp-based)
+        """
+        image_hash = image_hash or self.generate_image_hash(image_path)
+        content_hash = content_hash or self.generate_content_hash(receipt_data)
+
+        content_minhash = self.generate_content_minhash(receipt_data)
+
+        conn = self._conn()
+        while True:
+            storage_data = self._storage_record(receipt_data, image_path, image_hash, content_hash,
+                                                content_minhash)
+            entry = self._index_entry(storage_data)
+            try:
+                with conn:
+                    self._insert(conn, [self._row(storage_data, entry)])
+                    self._update_spend_stats(conn, entry)
+                return storage_data["receipt_id"]
+            except sqlite3.IntegrityError:
+                # Another writer took the same microsecond timestamp; take the next one
+                continue
+
+    def find_duplicates(self, image_hash: str, content_hash: str) -> List[Dict]:
+        """
+        Find potential duplicate receipts.
+
+        Args:
+            image_hash: Hash of the image
+            content_hash: Hash of the content
+
+        Returns:
+            List of matching receipts
+        """
+        duplicates = []
+        for entry in self._entries("WHERE image_hash = ? OR content_hash = ?", (image_hash, content_hash)):
+            match_type = 'exact_image' if entry['image_hash'] == image_hash else 'same_content'
+            duplicates.append({**entry, 'match_type': match_type})
+        return duplicates
+
+    def _sync_indexes(self):
+        """Add rows inserted (by any process) since the last search"""
+        if self._hash_index is None:
+            self._reset_lookup_indexes()
+        cursor = self._conn().execute(
+            "SELECT seq, image_hash, content_minhash FROM receipts WHERE seq > ? ORDER BY seq",
+            (self._indexed,))
+        for seq, image_hash, content_minhash in cursor:
+            self._index_receipt(seq, image_hash, content_minhash)
+            self._indexed = seq
+
+    def _index_entries(self, keys: List) -> List[Dict]:
+        """Index entries for row ids, in the order given"""
+        if not keys:
+            return []
+        by_seq = {}
+        conn = self._conn()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            cursor = conn.execute(
+                f"SELECT seq, {', '.join(INDEX_FIELDS)} FROM receipts "
+                f"WHERE seq IN ({', '.join('?' * len(chunk))})", chunk)
+            for seq, *row in cursor:
+                by_seq[seq] = dict(zip(INDEX_FIELDS, row))
+        return [by_seq[seq] for seq in keys]
+
+    def get_receipt(self, receipt_id: str) -> Optional[Dict]:
+        """Load a specific receipt by ID"""
+        row = self._conn().execute("SELECT data FROM receipts WHERE receipt_id = ?", (receipt_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all_receipts(self) -> List[Dict]:
+        """Get index of all receipts"""
+        return self._entries()
+
+    def get_receipts_by_category(self, category: str) -> List[Dict]:
+        """Get all receipts in a category"""
+        return self._entries("WHERE category_key = ?", (category.lower(),))
+
+    def get_receipts_by_vendor(self, vendor: str) -> List[Dict]:
+        """Get all receipts from a vendor"""
+        return self._entries("WHERE instr(vendor_key, ?) > 0", (vendor.lower(),))
+
+    def _spend_stats_current(self, conn: sqlite3.Connection) -> bool:
+        """Whether the statistics count every stored receipt"""
+        all_stats = self.get_spend_stats('all')
+        receipts = conn.execute("SELECT COUNT(*) FROM receipts").fetchone()[0]
+        return (all_stats.receipts if all_stats else 0) == receipts
+
+    def _update_spend_stats(self, conn: sqlite3.Connection, entry: Dict[str, Any]):
+        """Add a receipt to its groups' statistics (inside the INSERT's transaction)"""
+        keys = receipt_groups(entry)
+        rows = dict(conn.execute(
+            f"SELECT group_key, state FROM spend_stats WHERE group_key IN ({', '.join('?' * len(keys))})",
+            keys).fetchall())
+        statistics = SpendStatistics.from_dict({"groups": [[key, json.loads(state)] for key, state in rows.items()]})
+        self._write_spend_stats(conn, statistics.add(entry))
+
+    @staticmethod
+    def _write_spend_stats(conn: sqlite3.Connection, changed):
+        # Upsert rather than REPLACE keeps each group's rowid, i.e. first-appearance order
+        conn.executemany(
+            "INSERT INTO spend_stats (group_key, state) VALUES (?, ?) "
+            "ON CONFLICT(group_key) DO UPDATE SET state = excluded.state",
+            [(key, json.dumps(stats.to_dict(), separators=(',', ':'))) for key, stats in changed])
+
+    def _rebuild_spend_stats(self, conn: sqlite3.Connection):
+        """Recompute all running statistics from the receipts table"""
+        statistics = SpendStatistics.from_entries(self._entries())
+        conn.execute("DELETE FROM spend_stats")
+        self._write_spend_stats(conn, statistics.groups.items())
+
+    def get_spend_stats(self, group: str, key=None) -> Optional[RunningStats]:
+        """Running spend statistics of one group (see ReceiptStorage.get_spend_stats)"""
+        if group == "vendor":
+            key = vendor_key(key)
+        row = self._conn().execute("SELECT state FROM spend_stats WHERE group_key = ?",
+                                   (group_key(group, key),)).fetchone()
+        return RunningStats.from_dict(json.loads(row[0])) if row else None
+
+    def _spend_groups(self, group: str) -> Dict[Any, RunningStats]:
+        """Running statistics of every vendor/category/month, in order of first appearance"""
+        prefix = f"{group}:"
+        cursor = self._conn().execute(
+            "SELECT group_key, state FROM spend_stats WHERE substr(group_key, 1, ?) = ? ORDER BY rowid",
+            (len(prefix), prefix))
+        return {json.loads(key[len(prefix):]): RunningStats.from_dict(json.loads(state))
+                for key, state in cursor}
+
+    def migrate_from_json(self, json_dir: Optional[str] = None) -> int:
+        """
+        Import a JSON history (index.json plus receipt files in any layout) into the database.
+        Receipts already present are skipped, so running it again is harmless; the JSON
+        files are left untouched.
+
+        Args:
+            json_dir: Directory of the JSON history (default: this storage directory)
+
+        Returns:
+            Number of receipts imported
+        """
+        json_dir = Path(json_dir) if json_dir else self.storage_dir
+        try:
+            with open(json_dir / "index.json", 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load index: {e}")
+            return 0
+
+        layout = ReceiptLayout.load(json_dir) or ReceiptLayout()
+        rows = []
+        for entry in index:
+            try:
+                storage_data = layout.read(json_dir, entry['receipt_id'])
+            except (OSError, ValueError):
+                storage_data = None
+            if storage_data is None:
+                # Receipt file lost; keep what the index knows about it
+                storage_data = dict(entry)
+            # The index is authoritative for the indexed fields; histories saved
+            # before content signatures existed get one computed now
+            if not entry.get('content_minhash'):
+                entry = {**entry, 'content_minhash': content_signature(storage_data)}
+            rows.append(self._row(storage_data, entry))
+
+        conn = self._conn()
+        with conn:
+            count = self._insert(conn, rows, or_ignore=True)
+            if count:
+                self._rebuild_spend_stats(conn)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated_at', ?)",
+                         (datetime.now().isoformat(),))
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite receipt history")
+    parser.add_argument("storage_dir", nargs="?", default="receipt_history", help="History directory")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Import index.json and receipt files again (new receipts only)")
+    args = parser.parse_args()
+
+    storage = SQLiteReceiptStorage(args.storage_dir)
+    if args.migrate:
+        count = storage.migrate_from_json()
+        print(f"📦 Migrated {count} receipt(s) into {storage.db_path}")
+
+    stats = storage.get_statistics()
+    print(f"📊 Statistics:")
+    print(f"   Total receipts: {stats['total_receipts']}")
+    print(f"   Total amount: {stats['currency']} {stats['total_amount']:.2f}")
+    print(f"   Categories: {stats['categories']}")
+
+
+if __name__ == '__main__':
+    main()
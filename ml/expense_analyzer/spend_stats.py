@@ -0,0 +1,295 @@
+"""
+Spend Statistics
+Running per-vendor, per-category and per-month spend statistics, updated in O(1) as
+receipts are saved: count, mean and variance (Welford's algorithm) and a quantile
+sketch (DDSketch-style log buckets with 1% relative error). Anomaly checks and
+storage statistics read them instead of scanning the receipt history.
+"""
+
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from receipt_lexer import iso_date
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error: positive values go into
+    logarithmic buckets of width (1 + a) / (1 - a), so any quantile is returned
+    within a fraction a of a true sample value. Zero/negative values share one bucket.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (0 <= q <= 1), None when empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"a": self.relative_accuracy, "zero": self.zero_count,
+                "bins": {str(k): v for k, v in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(state.get("a", 0.01))
+        sketch.zero_count = state.get("zero", 0)
+        sketch.bins = {int(k): v for k, v in state.get("bins", {}).items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+
+def _amount(value) -> Optional[float]:
+    """Numeric amount (None for missing/unparseable values)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value if math.isfinite(value) else None
+    try:
+        parsed = float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+    return parsed if math.isfinite(parsed) else None
+
+
+class RunningStats:
+    """Receipt count plus Welford mean/variance, total, range and quantiles of amounts"""
+
+    def __init__(self):
+        self.receipts = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.first_date = None
+        self.last_date = None
+        self.sketch = QuantileSketch()
+
+    def add(self, amount, date=None):
+        """
+        Record one receipt.
+
+        Args:
+            amount: Receipt amount (non-numeric amounts only count the receipt)
+            date: Receipt date (kept for the first and latest receipt)
+        """
+        if not self.receipts:
+            self.first_date = date
+        self.last_date = date
+        self.receipts += 1
+
+        value = _amount(amount)
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.sketch.add(value)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Sample variance (None with fewer than two amounts)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def std(self) -> Optional[float]:
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def zscore(self, amount) -> Optional[float]:
+        """Standard deviations between `amount` and the mean (None if undefined)"""
+        value, std = _amount(amount), self.std
+        if value is None or not std:
+            return None
+        return (value - self.mean) / std
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile of the amounts, clamped to the exact min/max"""
+        value = self.sketch.quantile(q)
+        return min(max(value, self.min), self.max) if value is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Rounded figures for reports"""
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+        return {
+            "receipts": self.receipts,
+            "count": self.count,
+            "total": rounded(self.total),
+            "mean": rounded(self.mean) if self.count else None,
+            "std": rounded(self.std),
+            "min": self.min,
+            "max": self.max,
+            "p50": rounded(self.quantile(0.5)),
+            "p95": rounded(self.quantile(0.95)),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "receipts": self.receipts, "count": self.count, "mean": self.mean, "m2": self.m2,
+            "total": self.total, "min": self.min, "max": self.max,
+            "first_date": self.first_date, "last_date": self.last_date,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'RunningStats':
+        stats = cls()
+        for field in ("receipts", "count", "mean", "m2", "total", "min", "max", "first_date", "last_date"):
+            setattr(stats, field, state.get(field, getattr(stats, field)))
+        stats.sketch = QuantileSketch.from_dict(state.get("sketch", {}))
+        return stats
+
+
+def vendor_key(vendor) -> Optional[str]:
+    """Vendor grouping key: case- and whitespace-insensitive name"""
+    if not isinstance(vendor, str) or not vendor.strip():
+        return None
+    return ' '.join(vendor.lower().split())
+
+
+def month_key(date) -> Optional[str]:
+    """'YYYY-MM' of a receipt date in any format iso_date() reads (None if unreadable)"""
+    date = iso_date(date)
+    return date[:7] if date else None
+
+
+def group_key(group: str, key) -> str:
+    """Storage key of one statistics group; JSON keeps None/strings distinct"""
+    return f"{group}:{json.dumps(key, ensure_ascii=False)}"
+
+
+def receipt_groups(entry: Dict[str, Any]) -> List[str]:
+    """
+    Group keys a stored receipt contributes to.
+
+    Args:
+        entry: Index entry (vendor, amount, date, category)
+
+    Returns:
+        List of group keys ('all' and its category always; vendor/month when known)
+    """
+    keys = [group_key("all", None), group_key("category", entry.get('category'))]
+    vendor = vendor_key(entry.get('vendor'))
+    if vendor:
+        keys.append(group_key("vendor", vendor))
+    month = month_key(entry.get('date'))
+    if month:
+        keys.append(group_key("month", month))
+    return keys
+
+
+class SpendStatistics:
+    """Running statistics for every group, in order of first appearance"""
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, entry: Dict[str, Any]) -> List[Tuple[str, RunningStats]]:
+        """
+        Record one stored receipt in all of its groups.
+
+        Returns:
+            The (group key, stats) pairs that changed
+        """
+        changed = []
+        for key in receipt_groups(entry):
+            stats = self.groups.get(key)
+            if stats is None:
+                stats = self.groups[key] = RunningStats()
+            stats.add(entry.get('amount'), entry.get('date'))
+            changed.append((key, stats))
+        return changed
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]]) -> 'SpendStatistics':
+        """Rebuild from a full receipt history"""
+        statistics = cls()
+        for entry in entries:
+            statistics.add(entry)
+        return statistics
+
+    def get(self, group: str, key=None) -> Optional[RunningStats]:
+        """Statistics of one group, e.g. get('vendor', 'swiggy') or get('all')"""
+        if group == "vendor":
+            key = vendor_key(key)
+        return self.groups.get(group_key(group, key))
+
+    def by_group(self, group: str) -> Dict[Any, RunningStats]:
+        """All statistics of one group kind, keyed by the original value"""
+        prefix = f"{group}:"
+        return {json.loads(key[len(prefix):]): stats
+                for key, stats in self.groups.items() if key.startswith(prefix)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": 1, "groups": [[key, stats.to_dict()] for key, stats in self.groups.items()]}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'SpendStatistics':
+        statistics = cls()
+        for key, stats in state.get("groups", []):
+            statistics.groups[key] = RunningStats.from_dict(stats)
+        return statistics
+
+
+def statistics_report(all_stats: Optional[RunningStats], categories: Dict[Any, RunningStats],
+                      months: Dict[Any, RunningStats]) -> Dict[str, Any]:
+    """
+    ReceiptStorage.get_statistics() result from running statistics.
+
+    Args:
+        all_stats: The 'all' group (None for an empty history)
+        categories: Category -> stats, in order of first appearance
+        months: 'YYYY-MM' -> stats
+
+    Returns:
+        Statistics dictionary
+    """
+    if all_stats is None or not all_stats.receipts:
+        return {
+            "total_receipts": 0,
+            "categories": {},
+            "total_amount": 0,
+            "currency": "INR"
+        }
+    return {
+        "total_receipts": all_stats.receipts,
+        "categories": {category: stats.receipts for category, stats in categories.items()},
+        "total_amount": all_stats.total,
+        "currency": "INR",  # Could be enhanced to track multiple currencies
+        "oldest_receipt": all_stats.first_date,
+        "newest_receipt": all_stats.last_date,
+        "amount_stats": all_stats.summary(),
+        "by_category": {category: stats.summary() for category, stats in categories.items()},
+        "by_month": {month: stats.summary() for month, stats in sorted(months.items())},
+    }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Test the analyzer daemon: stdio protocol, bounded queue, health/stats and draining on shutdown"""
+
+import os
+import sys
+import json
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analyzer
+from analyzer_daemon import AnalyzerDaemon
+
+DAEMON = str(Path(__file__).resolve().parent.parent / "analyzer_daemon.py")
+
+
+class GatedAnalyzer:
+    """Stands in for HybridReceiptAnalyzer: each analyze() waits for the gate to open"""
+
+    gate = threading.Event()
+    started = threading.Semaphore(0)
+
+    def __init__(self, **kwargs):
+        pass
+
+    def analyze(self, file_path):
+        GatedAnalyzer.started.release()
+        GatedAnalyzer.gate.wait(10)
+        return {"file": file_path, "extracted_data": {"amount": 1.0}}
+
+
+def gated_daemon(**kwargs):
+    """A started daemon whose workers use GatedAnalyzer"""
+    GatedAnalyzer.gate = threading.Event()
+    GatedAnalyzer.started = threading.Semaphore(0)
+    original = analyzer.HybridReceiptAnalyzer
+    analyzer.HybridReceiptAnalyzer = GatedAnalyzer
+    try:
+        daemon = AnalyzerDaemon(**kwargs)
+        daemon.start()
+    finally:
+        analyzer.HybridReceiptAnalyzer = original
+    return daemon
+
+
+class Responses:
+    """Collects responses by id"""
+
+    def __init__(self):
+        self.by_id = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, response):
+        with self.lock:
+            self.by_id[response['id']] = response
+
+
+def test_stdio_protocol():
+    requests = [
+        {"id": 1, "cmd": "health"},
+        {"id": 2, "cmd": "analyze", "file": "does-not-exist.jpg"},
+        {"id": 3, "cmd": "analyze"},
+        {"id": 4, "cmd": "frobnicate"},
+        {"id": 5, "cmd": "stats"},
+        {"id": 6, "cmd": "shutdown"},
+    ]
+    lines = "\n".join(json.dumps(r) for r in requests[:1]) + "\n[1, 2]\n\n" + \
+        "\n".join(json.dumps(r) for r in requests[1:]) + "\n"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = subprocess.run([sys.executable, DAEMON, "--fallback", "--no-fraud", "--workers", "1"],
+                              input=lines, capture_output=True, text=True, cwd=tmp, timeout=120)
+
+    assert proc.returncode == 0, proc.stderr
+    responses = [json.loads(line) for line in proc.stdout.splitlines()]  # stdout carries only responses
+    by_id = {r['id']: r for r in responses}
+    assert len(responses) == 7 and set(by_id) == {None, 1, 2, 3, 4, 5, 6}
+
+    assert by_id[None]['ok'] is False and by_id[None]['error'].startswith("Bad request")
+    assert by_id[1]['ok'] and by_id[1]['result']['status'] == "ok" and by_id[1]['result']['workers'] == 1
+    assert by_id[2]['ok'] is False and by_id[2]['error']
+    assert by_id[3] == {"id": 3, "ok": False, "error": "Missing 'file'"}
+    assert by_id[4]['error'] == "Unknown command: frobnicate"
+    assert by_id[5]['ok'] and by_id[5]['result']['received'] == 1
+    assert by_id[6]['result'] == {"status": "shutting_down"}
+
+
+def test_default_workers_all_start_with_fraud_detection():
+    # Workers build their analyzers concurrently; run startup a few times to catch races
+    env = {k: v for k, v in os.environ.items() if k != "ANALYZER_WORKERS"}
+    requests = "\n".join(json.dumps(r) for r in ({"id": 1, "cmd": "health"}, {"id": 2, "cmd": "shutdown"}))
+    for _ in range(3):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = subprocess.run([sys.executable, DAEMON, "--fallback"], input=requests + "\n",
+                                  capture_output=True, text=True, cwd=tmp, env=env, timeout=120)
+        assert proc.returncode == 0, proc.stderr
+        health = json.loads(proc.stdout.splitlines()[0])['result']
+        assert health['workers'] == 2
+        assert health['workers_alive'] == health['fraud_detection_workers'] == 2
+        assert health['status'] == "ok"
+
+
+def test_queue_full_rejects_and_shutdown_drains():
+    daemon = gated_daemon(workers=1, queue_size=2, enable_fraud_detection=False)
+    responses = Responses()
+
+    daemon.handle({"id": 1, "file": "a.jpg"}, responses)
+    assert GatedAnalyzer.started.acquire(timeout=5)      # the worker holds request 1
+    daemon.handle({"id": 2, "file": "b.jpg"}, responses)
+    daemon.handle({"id": 3, "file": "c.jpg"}, responses)
+    daemon.handle({"id": 4, "file": "d.jpg"}, responses)  # queue (size 2) is full
+
+    assert responses.by_id[4] == {"id": 4, "ok": False, "error": "Queue full", "retryable": True}
+    health = daemon.health()
+    assert health['status'] == "ok" and health['workers_alive'] == 1 and health['queue_depth'] == 2
+
+    daemon.handle({"id": 5, "cmd": "shutdown"}, responses)
+    daemon.handle({"id": 6, "file": "e.jpg"}, responses)
+    assert responses.by_id[6]['error'] == "Daemon is shutting down"
+    assert daemon.health()['status'] == "degraded"
+
+    # In-flight and queued work still completes before the workers exit
+    GatedAnalyzer.gate.set()
+    daemon.stop(timeout=10)
+    assert all(responses.by_id[i]['ok'] and responses.by_id[i]['result']['file'] for i in (1, 2, 3))
+    assert not any(t.is_alive() for t in daemon._threads)
+
+    stats = daemon.stats()
+    assert (stats['received'], stats['completed'], stats['failed'], stats['rejected']) == (4, 3, 0, 1)
+    assert stats['window'] == 3 and stats['in_queue'] == 0
+    assert stats['queue_wait_seconds']['max'] >= stats['queue_wait_seconds']['p50'] >= 0
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test batch mode: file collection, in-process and process-pool runs, and the summary"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch_analyzer import collect_files, summarize, run_batch
+
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+
+
+def receipt_dir(tmp):
+    """Three sample receipts, one unreadable 'receipt' and a file that is not a receipt"""
+    directory = Path(tmp) / "receipts"
+    (directory / "nested").mkdir(parents=True)
+    shutil.copy(SAMPLES / "sample_receipt.jpg", directory / "a.jpg")
+    shutil.copy(SAMPLES / "2.jpeg", directory / "b.jpeg")
+    shutil.copy(SAMPLES / "3.jpeg", directory / "nested" / "c.jpeg")
+    (directory / "broken.png").write_bytes(b"not an image")
+    (directory / "notes.txt").write_text("not a receipt")
+    return directory
+
+
+def batch(tmp, workers, verbose=False):
+    """Run a fallback-only batch from inside tmp (the extraction cache lives in the cwd)"""
+    directory = receipt_dir(tmp)
+    files = collect_files([str(directory)], recursive=True)
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    try:
+        records = []
+        summary = run_batch(files, workers=workers, force_fallback=True, enable_fraud_detection=False,
+                            output_dir="out", verbose=verbose, on_record=records.append)
+    finally:
+        os.chdir(cwd)
+    return files, records, summary, Path(tmp) / "out"
+
+
+def check_batch(files, records, summary, out_dir, workers):
+    assert sorted(r['file'] for r in records) == sorted(files)
+    assert summary['workers'] == workers and summary['total_files'] == len(files)
+    assert summary['succeeded'] + summary['failed'] == len(files)
+    assert any(f['file'].endswith("broken.png") for f in summary['failures'])
+
+    lines = (out_dir / "results.jsonl").read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(line)['file'] for line in lines) == sorted(files)
+    assert json.loads((out_dir / "summary.json").read_text(encoding="utf-8"))['total_files'] == len(files)
+
+
+def test_collect_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = receipt_dir(tmp)
+        top_level = collect_files([str(directory)])
+        assert [Path(f).name for f in top_level] == ["a.jpg", "b.jpeg", "broken.png"]
+
+        manifest = Path(tmp) / "manifest.txt"
+        manifest.write_text("# receipts\nreceipts/nested/c.jpeg\n\nreceipts/a.jpg\nreceipts/notes.txt\n")
+        files = collect_files([str(directory / "*.jpg")], manifest=str(manifest))
+        assert [Path(f).name for f in files] == ["a.jpg", "c.jpeg"]  # a.jpg only once, .txt skipped
+
+
+def test_in_process_batch_respects_verbose():
+    with tempfile.TemporaryDirectory() as tmp:
+        captured = io.StringIO()
+        with contextlib.redirect_stdout(captured):
+            files, records, summary, out_dir = batch(tmp, workers=1)
+        check_batch(files, records, summary, out_dir, workers=1)
+        assert captured.getvalue() == ""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        captured = io.StringIO()
+        with contextlib.redirect_stdout(captured):
+            batch(tmp, workers=1, verbose=True)
+        assert captured.getvalue() != ""
+
+
+def test_process_pool_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        files, records, summary, out_dir = batch(tmp, workers=2)
+        check_batch(files, records, summary, out_dir, workers=2)
+
+
+def test_summarize():
+    records = [
+        {"file": "a", "status": "ok", "elapsed": 1.0, "extraction_method": "llm", "duplicate_detected": True},
+        {"file": "b", "status": "ok", "elapsed": 3.0, "extraction_method": "llm", "duplicate_detected": False},
+        {"file": "c", "status": "error", "elapsed": 2.0, "error": "boom"},
+    ]
+    summary = summarize(records, wall_time=2.0, workers=2)
+    assert summary['succeeded'] == 2 and summary['failed'] == 1 and summary['duplicates_detected'] == 1
+    assert summary['throughput_files_per_second'] == 1.5
+    assert summary['latency_seconds'] == {"mean": 2.0, "p50": 2.0, "p95": 3.0, "max": 3.0}
+    assert summary['extraction_methods'] == {"llm": 2}
+    assert summary['failures'] == [{"file": "c", "error": "boom"}]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
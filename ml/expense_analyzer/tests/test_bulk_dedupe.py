@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Test offline duplicate clustering against brute force and on a stored history"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bulk_dedupe
+from bulk_dedupe import BulkDeduper, connected_components, dedupe_storage, popcount
+from content_minhash import content_signature
+from receipt_storage import ReceiptStorage
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+def entry(n, image_hash, content_hash=None, content_minhash=None, vendor="V", amount=None, date=None):
+    return {"receipt_id": f"r{n}", "stored_at": None, "vendor": vendor, "amount": n if amount is None else amount,
+            "date": date, "image_hash": image_hash, "content_hash": content_hash or f"c{n}",
+            "content_minhash": content_minhash}
+
+
+def test_near_images_match_brute_force():
+    rng = np.random.default_rng(5)
+    hashes = rng.integers(0, 2 ** 63, 1500, dtype=np.uint64)
+    # Plant neighbours at 1..7 bits from random originals
+    flips = [hashes[i] ^ np.uint64(sum(1 << int(b) for b in rng.choice(64, d, replace=False)))
+             for d, i in zip(range(1, 8), rng.choice(1500, 7, replace=False)) for _ in range(3)]
+    hashes = np.concatenate([hashes, np.array(flips, dtype=np.uint64)])
+    entries = [entry(n, f"{int(h):016x}") for n, h in enumerate(hashes)]
+
+    for max_distance in (3, 5):
+        report = BulkDeduper(max_distance=max_distance, min_similarity=0).run(entries)
+        found = {tuple(sorted((e["a"], e["b"]))) for c in report["clusters"] for e in c["evidence"]}
+        distances = popcount((hashes[:, None] ^ hashes[None, :]).ravel()).reshape(len(hashes), -1)
+        i, j = np.nonzero(np.triu(distances <= max_distance, k=1))
+        expected = {tuple(sorted((f"r{x}", f"r{y}"))) for x, y in zip(i, j)}
+        assert found == expected
+
+
+def test_popcount_without_bitwise_count():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.integers(0, 2 ** 64 - 1, 1000, dtype=np.uint64, endpoint=True),
+                             np.array([0, 2 ** 64 - 1], dtype=np.uint64)])
+    expected = [bin(int(v)).count("1") for v in values]
+    assert bulk_dedupe._popcount_bytes(values).tolist() == expected
+    assert popcount(values).tolist() == expected
+
+    # NumPy 1.x path: near images found with the byte-table popcount
+    hashes = np.array([0, 0b111, 2 ** 63, 2 ** 64 - 1], dtype=np.uint64)
+    entries = [entry(n, f"{int(h):016x}") for n, h in enumerate(hashes)]
+    original = bulk_dedupe.popcount
+    bulk_dedupe.popcount = bulk_dedupe._popcount_bytes
+    try:
+        report = BulkDeduper(max_distance=3, min_similarity=0).run(entries)
+    finally:
+        bulk_dedupe.popcount = original
+    found = {tuple(sorted((e["a"], e["b"]))) for c in report["clusters"] for e in c["evidence"]}
+    assert found == {("r0", "r1"), ("r0", "r2")}
+
+
+def test_clusters_with_evidence():
+    swiggy = {"extracted_data": {"vendor": "SWIGGY", "amount": 649.0, "date": "2025-11-08"},
+              "metadata": {"line_items": [{"item_name": "Chicken Biryani", "item_total": 649.0}]}}
+    noisy = {"extracted_data": {"vendor": "SW1GGY", "amount": "649", "date": "2025-11-08"},
+             "metadata": {"line_items": [{"item_name": "Chicken Biryanl", "item_total": 649.0}]}}
+    other = {"extracted_data": {"vendor": "Uber", "amount": 320.0, "date": "2025-11-09"}, "metadata": {}}
+    # Same merchant on another visit: similar signature, but another amount and date
+    revisit = {"extracted_data": {"vendor": "Indian Oil Petrol Pump Koramangala", "amount": 2000.0,
+                                  "date": "2025-11-01"}, "metadata": {}}
+    refuel = {"extracted_data": {"vendor": "Indian Oil Petrol Pump Koramangala", "amount": 1500.0,
+                                 "date": "2025-11-15"}, "metadata": {}}
+    entries = [
+        entry(0, "00000000000000ff", content_minhash=content_signature(swiggy), amount=649.0, date="2025-11-08"),
+        entry(1, "00000000000000ff"),                         # same image as r0
+        entry(2, "00000000000000f0"),                         # 4 bits from r0
+        entry(3, "ffff000000000000", content_minhash=content_signature(noisy),  # OCR noise of r0
+              amount="649", date="2025-11-08"),
+        entry(4, "0f0f0f0f0f0f0f0f", "c4", content_signature(other), amount=320.0, date="2025-11-09"),
+        entry(5, "f0f0f0f0f0f0f0f0", "c4"),                   # same content hash as r4
+        entry(6, "123456789abcdef0"),
+        entry(7, "not-a-hash"),
+        entry(8, "0123012301230123", content_minhash=content_signature(revisit), amount=2000.0, date="2025-11-01"),
+        entry(9, "3210321032103210", content_minhash=content_signature(refuel), amount=1500.0, date="2025-11-15"),
+    ]
+    report = BulkDeduper(max_distance=5, min_similarity=0.7).run(entries)
+
+    clusters = {c["cluster_id"]: c for c in report["clusters"]}
+    assert set(clusters) == {"r0", "r4"}
+    assert [r["receipt_id"] for r in clusters["r0"]["receipts"]] == ["r0", "r1", "r2", "r3"]
+    kinds = {e["match_type"]: e for e in clusters["r0"]["evidence"]}
+    assert set(kinds) == {"exact_image", "similar_image", "similar_content"}
+    assert kinds["similar_image"]["distance"] == 4 and kinds["similar_content"]["similarity"] >= 0.7
+    assert clusters["r4"]["evidence"][0]["match_type"] == "same_content"
+    assert report["stats"]["receipts_in_clusters"] == 6 and report["stats"]["with_image_hash"] == 9
+
+
+def test_connected_components_chains():
+    labels = connected_components(6, np.array([4, 3, 2, 0]), np.array([5, 4, 3, 1]))
+    assert labels.tolist() == [0, 0, 2, 2, 2, 2]
+
+
+def test_dedupe_stored_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        receipt = {"extracted_data": {"vendor": "Airtel", "amount": 999.0, "date": "2025-11-11"},
+                   "metadata": {"line_items": []}}
+        for i in range(3):
+            storage.save_receipt(receipt, SAMPLE, image_hash=f"{i:016x}", content_hash=f"c{i}")
+        report = dedupe_storage(storage, max_distance=0)
+        assert len(report["clusters"]) == 1 and report["clusters"][0]["size"] == 3
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Test the LLM circuit breaker, per-call timeouts and jittered retries"""
+
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from analyzer_llm import LLMReceiptAnalyzer, is_retryable
+from analyzer import HybridReceiptAnalyzer
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+class FlakyLLM(BaseHTTPRequestHandler):
+    """Answers with the next status from `statuses` (200 once exhausted) after `delay`"""
+
+    statuses = []
+    delay = 0.0
+    served = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cls = type(self)
+        cls.served += 1
+        status = cls.statuses.pop(0) if cls.statuses else 200
+        time.sleep(cls.delay)
+
+        if status != 200:
+            body = json.dumps({"error": {"message": f"status {status}", "type": "server_error"}}).encode()
+        else:
+            content = json.dumps({"merchant_name": "STORE", "total_amount": 649.0, "currency": "INR"})
+            body = json.dumps({
+                "id": "chatcmpl-1", "object": "chat.completion", "created": int(time.time()),
+                "model": "stand-in",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(statuses=(), delay=0.0, **analyzer_kwargs):
+    FlakyLLM.statuses = list(statuses)
+    FlakyLLM.delay = delay
+    FlakyLLM.served = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    analyzer = LLMReceiptAnalyzer(
+        api_key="test-key",
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        model="stand-in",
+        backoff_base=0.01,
+        **analyzer_kwargs
+    )
+    return server, analyzer
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=0.2, half_open_probes=1)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.25)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()          # the probe
+    assert not breaker.allow_request()      # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    stats = breaker.stats()
+    assert stats["opened"] == 1 and stats["rejected"] == 2 and stats["failures"] == 2
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_retries_transient_errors():
+    server, analyzer = _start_server(statuses=[503, 429], max_retries=2)
+    try:
+        result = analyzer.analyze(SAMPLE)
+    finally:
+        server.shutdown()
+    assert result["extracted_data"]["amount"] == 649.0
+    assert result["metadata"]["llm_attempts"] == 3
+    assert FlakyLLM.served == 3
+
+
+def test_does_not_retry_client_errors():
+    server, analyzer = _start_server(statuses=[400], max_retries=3)
+    try:
+        analyzer.analyze(SAMPLE)
+    except Exception as e:
+        assert not is_retryable(e)
+    else:
+        raise AssertionError("expected the 400 to be raised")
+    finally:
+        server.shutdown()
+    assert FlakyLLM.served == 1
+
+
+def test_per_call_timeout():
+    server, analyzer = _start_server(delay=1.0, max_retries=0)
+    try:
+        start = time.perf_counter()
+        analyzer.analyze(SAMPLE, timeout=0.2, retries=1)
+    except TimeoutError:
+        elapsed = time.perf_counter() - start
+    else:
+        raise AssertionError("expected TimeoutError")
+    finally:
+        server.shutdown()
+    # The timed-out call is still running, so no second call is stacked beside it
+    assert elapsed < 0.9
+    assert FlakyLLM.served == 1
+
+
+def test_retries_once_the_timed_out_call_has_ended():
+    server, analyzer = _start_server(delay=0.3, max_retries=0)
+
+    def backoff(attempt):
+        # The first call is abandoned at 0.25s and ends by itself during this wait;
+        # the endpoint has recovered for the retry
+        FlakyLLM.delay = 0.0
+        return 0.2
+
+    analyzer._backoff = backoff
+    try:
+        result = analyzer.analyze(SAMPLE, timeout=0.25, retries=1)
+    finally:
+        server.shutdown()
+    assert result["metadata"]["llm_attempts"] == 2
+    assert FlakyLLM.served == 2
+
+
+def test_async_retries_transient_errors():
+    server, analyzer = _start_server(statuses=[503, 429], max_retries=2)
+    try:
+        [result] = analyzer.analyze_many([SAMPLE], timeout=10)
+    finally:
+        server.shutdown()
+    assert result["extracted_data"]["amount"] == 649.0
+    assert result["metadata"]["llm_attempts"] == 3
+    assert FlakyLLM.served == 3
+
+
+def test_async_retries_stay_within_the_deadline():
+    server, analyzer = _start_server(statuses=[503] * 20, max_retries=10)
+    analyzer.backoff_base = 0.1  # waits of up to 0.1, 0.2, 0.4s: the deadline ends the retries
+    try:
+        start = time.perf_counter()
+        [result] = analyzer.analyze_many([SAMPLE], timeout=0.3)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    assert is_retryable(result) and not isinstance(result, dict)
+    assert elapsed < 0.6
+
+
+def test_async_path_uses_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+    server, analyzer = _start_server(statuses=[503] * 10, max_retries=0, circuit_breaker=breaker)
+    try:
+        results = analyzer.analyze_many([SAMPLE] * 5, max_in_flight=1, timeout=10)
+    finally:
+        server.shutdown()
+    assert FlakyLLM.served == 2
+    assert all(is_retryable(r) for r in results[:2])
+    assert all(isinstance(r, CircuitOpenError) for r in results[2:])
+    assert breaker.state == OPEN and breaker.stats()["rejected"] == 3
+
+
+def test_hybrid_routes_to_fallback_while_open():
+    class Fallback:
+        def analyze(self, file_path, image_context=None):
+            return {"timestamp": "now", "extracted_data": {"amount": 1.0},
+                    "metadata": {"extraction_method": "fallback"}}
+
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+    server, llm = _start_server(statuses=[503] * 10, max_retries=0, circuit_breaker=breaker)
+    hybrid = HybridReceiptAnalyzer(force_fallback=True, enable_fraud_detection=False, enable_cache=False)
+    hybrid.force_fallback = False
+    hybrid.llm_analyzer = llm
+    hybrid.fallback_analyzer = Fallback()
+    hybrid.circuit_breaker = breaker
+
+    try:
+        results = [hybrid.analyze(SAMPLE) for _ in range(5)]
+    finally:
+        server.shutdown()
+    assert FlakyLLM.served == 2
+    assert all(r["metadata"]["extraction_method"] == "fallback" for r in results)
+    assert results[-1]["metadata"]["llm_circuit"] == OPEN
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Stress test: many processes saving into one receipt history must not lose receipts"""
+
+import sys
+import json
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_storage import open_storage
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+WORKERS = 8
+SAVES_PER_WORKER = 25
+
+
+def save_many(storage_dir, backend, worker, start):
+    """Worker process: wait for the start signal, then save receipts as fast as possible"""
+    storage = open_storage(storage_dir, backend=backend)
+    start.wait()
+    for i in range(SAVES_PER_WORKER):
+        storage.save_receipt({
+            "file": f"w{worker}_{i}.jpg",
+            "extracted_data": {"vendor": f"Vendor {worker}", "amount": 100 + i, "date": "2025-11-08",
+                               "category": "food"},
+            "metadata": {"line_items": []},
+        }, SAMPLE, image_hash=f"{worker:08x}{i:08x}", content_hash=f"w{worker}_{i}")
+
+
+def run_workers(storage_dir, backend):
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    workers = [context.Process(target=save_many, args=(storage_dir, backend, w, start)) for w in range(WORKERS)]
+    for process in workers:
+        process.start()
+    start.set()
+    for process in workers:
+        process.join(120)
+        assert process.exitcode == 0
+
+
+def check_history(storage):
+    entries = storage.get_all_receipts()
+    expected = {f"w{w}_{i}" for w in range(WORKERS) for i in range(SAVES_PER_WORKER)}
+    assert len(entries) == WORKERS * SAVES_PER_WORKER
+    assert {e["content_hash"] for e in entries} == expected
+    assert len({e["receipt_id"] for e in entries}) == len(entries)
+    for entry in entries[::20]:
+        assert storage.get_receipt(entry["receipt_id"])["content_hash"] == entry["content_hash"]
+
+    stats = storage.get_statistics()
+    assert stats["total_receipts"] == len(entries)
+    assert storage.get_spend_stats("vendor", "Vendor 3").count == SAVES_PER_WORKER
+
+
+def test_concurrent_json_saves():
+    with tempfile.TemporaryDirectory() as tmp:
+        run_workers(tmp, "json")
+        storage = open_storage(tmp, backend="json")
+        check_history(storage)
+        assert len(list(Path(tmp).glob("receipt_*.json"))) == WORKERS * SAVES_PER_WORKER
+        assert not list(Path(tmp).glob("*.tmp"))
+        with open(Path(tmp) / "index.json", encoding="utf-8") as f:
+            assert len(json.load(f)) == WORKERS * SAVES_PER_WORKER
+
+
+def test_concurrent_sqlite_saves():
+    with tempfile.TemporaryDirectory() as tmp:
+        open_storage(tmp, backend="sqlite").close()
+        run_workers(tmp, "sqlite")
+        check_history(open_storage(tmp, backend="sqlite"))
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
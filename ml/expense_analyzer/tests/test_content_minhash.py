@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Test MinHash content signatures, the LSH index and fuzzy content duplicates in FraudDetector"""
+
+import sys
+import json
+import random
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from content_minhash import (MinHashLSH, content_shingles, content_signature, decode_signature,
+                             minhash, similarity, lsh_bands)
+from receipt_storage import ReceiptStorage
+from receipt_storage_sqlite import SQLiteReceiptStorage
+from fraud_detector import FraudDetector
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+def receipt(vendor, amount, date="2025-11-08", items=()):
+    return {"timestamp": "2025-11-08T00:00:00",
+            "extracted_data": {"vendor": vendor, "amount": amount, "date": date, "category": "food"},
+            "metadata": {"line_items": [{"item_name": name, "item_total": total} for name, total in items]}}
+
+
+def sig(data):
+    return decode_signature(content_signature(data))
+
+
+def test_ocr_noise_keeps_content_similar():
+    items = [("Chicken Biryani", 449), ("Delivery fee", 200)]
+    original = receipt("SWIGGY", 649.0, items=items)
+    assert content_shingles(original) == content_shingles(receipt("SW1GGY", "649", items=items))
+    assert similarity(sig(original), sig(receipt("SWIGGV", 649.0, items=items))) >= 0.7
+    assert similarity(sig(original), sig(receipt("UBER", 320.0, "2025-11-09"))) < 0.2
+    # Same merchant and price on another day is a different receipt
+    assert similarity(sig(receipt("SWIGGY", 649.0)), sig(receipt("SWIGGY", 649.0, "2025-11-09"))) < 0.7
+    assert content_signature(receipt(None, None, None)) is None
+
+
+def test_signature_is_pinned():
+    # Stored signatures are compared with new ones, so they must never drift
+    # (between NumPy versions, platforms or processes)
+    signature = sig(receipt("SWIGGY", 649.0, items=[("Paneer Tikka", 349)]))
+    assert list(signature[:6]) == [88620840, 108584483, 75591638, 104131954, 257003868, 154137603]
+    assert hashlib.sha256(signature.astype('<u4').tobytes()).hexdigest()[:16] == "afdffb2f66b52eff"
+
+
+def test_lsh_finds_similar_without_comparing_everything():
+    rng = random.Random(5)
+    index = MinHashLSH(threshold=0.5)
+    words = ["store", "mart", "cafe", "foods", "travels", "pharma", "books", "fuel"]
+    for i in range(2000):
+        vendor = f"{rng.choice(words)} {rng.choice(words)} {i}"
+        index.add(sig(receipt(vendor, rng.randint(1, 5000), f"2025-{rng.randint(1, 12):02d}-01")), i)
+    target = sig(receipt("zomato", 412.0))
+    index.add(target, "zomato")
+
+    matches, candidates = index.query(sig(receipt("Z0MAT0", "412")), 0.7)
+    assert matches[0] == ("zomato", 1.0)
+    assert candidates < len(index) // 10
+
+
+def test_lsh_bands():
+    bands, rows = lsh_bands(0.5)
+    assert bands * rows == 64
+    assert abs((1 / bands) ** (1 / rows) - 0.5) < 0.1
+    assert minhash(set()) is None
+
+
+def check_fraud_detector(storage):
+    storage.save_receipt(receipt("SWIGGY", 649.0, items=[("Biryani", 449)]), SAMPLE,
+                         image_hash="cf013f1f1f018f9f")
+    detector = FraudDetector(storage, max_hash_distance=5, min_content_similarity=0.7)
+
+    # Different photo (far image hash), OCR read the vendor and amount differently
+    ocr_noise = receipt("SW1GGY", "649", items=[("Biryani", "449.00")])
+
+    class Context:
+        image_hash = "0000000000000000"
+
+    result = detector.check_duplicates(SAMPLE, ocr_noise, image_context=Context())
+    assert result["content_duplicates"] == 0
+    assert result["fuzzy_content_duplicates"] == 1
+    assert result["content_candidates"] >= 1
+    assert result["min_content_similarity"] == 0.7
+    match = result["similar_receipts"][0]
+    assert match["match_type"] == "similar_content" and match["similarity"] == 1.0
+
+    off = FraudDetector(storage, max_hash_distance=0, min_content_similarity=0)
+    assert not off.check_duplicates(SAMPLE, ocr_noise, image_context=Context())["duplicate_detected"]
+
+    # Another visit to a merchant with a long name: the vendor trigrams alone put the
+    # signatures above the threshold, but the amount and date differ
+    vendor = "Indian Oil Petrol Pump Koramangala"
+    storage.save_receipt(receipt(vendor, 2000.0, "2025-11-01"), SAMPLE, image_hash="0f0f0f0f0f0f0f0f")
+    revisit = receipt(vendor, 1500.0, "2025-11-15")
+    assert similarity(sig(revisit), sig(receipt(vendor, 2000.0, "2025-11-01"))) >= 0.7
+    result = detector.check_duplicates(SAMPLE, revisit, image_context=Context())
+    assert result["fuzzy_content_duplicates"] == 0 and not result["duplicate_detected"]
+
+
+def test_fraud_detector_fuzzy_content_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_fraud_detector(ReceiptStorage(tmp))
+
+
+def test_fraud_detector_fuzzy_content_sqlite():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_fraud_detector(SQLiteReceiptStorage(tmp))
+
+
+def test_migration_backfills_signatures():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        storage.save_receipt(receipt("SWIGGY", 649.0), SAMPLE, image_hash="cf013f1f1f018f9f")
+        # History written before signatures were stored
+        index = json.loads((Path(tmp) / "index.json").read_text())
+        for entry in index:
+            entry.pop("content_minhash")
+        (Path(tmp) / "index.json").write_text(json.dumps(index))
+
+        sqlite_storage = SQLiteReceiptStorage(tmp)
+        matches, _ = sqlite_storage.find_similar_content(content_signature(receipt("SWlGGY", 649)))
+        assert [m["vendor"] for m in matches] == ["SWIGGY"]
+
+
+def test_json_history_backfills_signatures():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        storage.save_receipt(receipt("SWIGGY", 649.0), SAMPLE, image_hash="cf013f1f1f018f9f")
+        index_file = Path(tmp) / "index.json"
+        index = json.loads(index_file.read_text())
+        for entry in index:
+            entry.pop("content_minhash")
+        index_file.write_text(json.dumps(index))
+
+        # Bulk dedupe reads the whole index and searches use it; both fill the
+        # signatures in memory without rewriting the index
+        legacy = index_file.read_bytes()
+        signatures = [e.get("content_minhash") for e in ReceiptStorage(tmp).get_all_receipts()]
+        assert signatures == [content_signature(receipt("SWIGGY", 649.0))]
+        matches, _ = ReceiptStorage(tmp).find_similar_content(content_signature(receipt("SWlGGY", 649)))
+        assert [m["vendor"] for m in matches] == ["SWIGGY"]
+        assert index_file.read_bytes() == legacy
+
+        # The next save writes them
+        ReceiptStorage(tmp).save_receipt(receipt("UBER", 320.0), SAMPLE, image_hash="0000000000000001")
+        assert [e["content_minhash"] for e in json.loads(index_file.read_text())] == [
+            content_signature(receipt("SWIGGY", 649.0)), content_signature(receipt("UBER", 320.0))]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Test the content-addressed extraction cache: keys, LRU/byte eviction, expiry, atomic writes"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extraction_cache import ANALYZER_VERSION, ExtractionCache, file_sha256
+
+RESULT = {"extracted_data": {"amount": 649.0, "vendor": "Swiggy"}, "metadata": {"extraction_method": "llm"}}
+
+
+def write(directory, name, content):
+    path = Path(directory) / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_is_content_method_and_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(Path(tmp) / "cache")
+        a = write(tmp, "a.jpg", b"receipt bytes")
+        copy = write(tmp, "copy.jpg", b"receipt bytes")
+        other = write(tmp, "other.jpg", b"other receipt")
+
+        digest = file_sha256(a)
+        assert digest == hashlib.sha256(b"receipt bytes").hexdigest()
+        assert cache.version == ANALYZER_VERSION
+        assert cache.make_key(digest, "llm") == hashlib.sha256(f"{ANALYZER_VERSION}:llm:{digest}".encode()).hexdigest()
+
+        cache.put(a, "llm", RESULT)
+        assert cache.get(copy, "llm") == RESULT              # same bytes under another name
+        assert cache.get(a, "fallback") is None              # other extraction method
+        assert cache.get(other, "llm") is None               # other content
+        assert cache.get("unused", "llm", digest=digest) == RESULT
+
+
+def test_version_bump_invalidates_entries():
+    with tempfile.TemporaryDirectory() as tmp:
+        receipt = write(tmp, "a.jpg", b"receipt bytes")
+        ExtractionCache(Path(tmp) / "cache", version="3").put(receipt, "llm", RESULT)
+
+        assert ExtractionCache(Path(tmp) / "cache", version="3").get(receipt, "llm") == RESULT
+        bumped = ExtractionCache(Path(tmp) / "cache", version="4")
+        assert bumped.get(receipt, "llm") is None
+        assert bumped.stats()['misses'] == 1
+
+
+def test_lru_eviction_by_entry_count():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(Path(tmp) / "cache", max_entries=2)
+        cache.put("a", "llm", RESULT, digest="a")
+        cache.put("b", "llm", RESULT, digest="b")
+        assert cache.get("a", "llm", digest="a") == RESULT   # a is now most recently used
+        cache.put("c", "llm", RESULT, digest="c")
+
+        assert cache.get("b", "llm", digest="b") is None
+        assert cache.get("a", "llm", digest="a") == RESULT and cache.get("c", "llm", digest="c") == RESULT
+        assert cache.stats()['evictions'] == 1 and cache.stats()['entries'] == 2
+        assert len(list((Path(tmp) / "cache").glob("*.json"))) == 2
+
+
+def test_lru_eviction_by_bytes():
+    with tempfile.TemporaryDirectory() as tmp:
+        probe = ExtractionCache(Path(tmp) / "probe")
+        probe.put("x", "llm", RESULT, digest="x")
+        entry_size = probe.stats()['bytes']
+
+        cache = ExtractionCache(Path(tmp) / "cache", max_bytes=int(entry_size * 2.5))
+        for key in "abc":
+            cache.put(key, "llm", RESULT, digest=key)
+
+        stats = cache.stats()
+        assert stats['entries'] == 2 and stats['bytes'] <= entry_size * 2.5 and stats['evictions'] == 1
+        assert cache.get("a", "llm", digest="a") is None
+
+        # A restart rebuilds the index and the LRU order from the files
+        reopened = ExtractionCache(Path(tmp) / "cache", max_bytes=int(entry_size * 2.5))
+        assert reopened.stats()['entries'] == 2 and reopened.stats()['bytes'] == stats['bytes']
+
+
+def test_age_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(Path(tmp) / "cache", max_age_days=1)
+        cache.put("old", "llm", RESULT, digest="old")
+        cache.put("new", "llm", RESULT, digest="new")
+
+        old_path = cache._path(cache.make_key("old", "llm"))
+        entry = json.loads(old_path.read_text(encoding="utf-8"))
+        entry['cached_at'] -= 2 * 86400
+        old_path.write_text(json.dumps(entry), encoding="utf-8")
+
+        assert cache.get("old", "llm", digest="old") is None
+        assert not old_path.exists() and cache.stats()['entries'] == 1
+
+        # Stale files are dropped when the cache is opened
+        new_path = cache._path(cache.make_key("new", "llm"))
+        stale = time.time() - 2 * 86400
+        os.utime(new_path, (stale, stale))
+        assert ExtractionCache(Path(tmp) / "cache", max_age_days=1).stats()['entries'] == 0
+        assert not new_path.exists()
+
+
+def test_put_is_atomic():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(Path(tmp) / "cache")
+        big = {"extracted_data": {"amount": 1.0}, "raw_text": "x" * 500000}
+        cache.put("r", "llm", big, digest="r")
+
+        seen = []
+        stop = threading.Event()
+
+        def writer():
+            for i in range(50):
+                cache.put("r", "llm", dict(big, version=i), digest="r")
+            stop.set()
+
+        def reader():
+            while not stop.is_set():
+                seen.append(cache.get("r", "llm", digest="r"))
+
+        threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Readers only ever see complete entries, and no temporary files are left behind
+        assert seen and all(result is not None and len(result['raw_text']) == 500000 for result in seen)
+        assert [p.name for p in (Path(tmp) / "cache").iterdir()] == [f"{cache.make_key('r', 'llm')}.json"]
+        assert cache.stats()['entries'] == 1
+
+
+def test_hit_and_miss_counters():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(Path(tmp) / "cache")
+        assert cache.stats()['hit_rate'] == 0.0
+        cache.get("a", "llm", digest="a")
+        cache.put("a", "llm", RESULT, digest="a")
+        cache.get("a", "llm", digest="a")
+        cache.get("a", "llm", digest="a")
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 1, 0)
+        assert abs(stats['hit_rate'] - 2 / 3) < 1e-12
+
+        cache.clear()
+        assert cache.stats()['entries'] == 0 and cache.get("a", "llm", digest="a") is None
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Test near-duplicate image-hash search against a brute-force scan and in FraudDetector"""
+
+import sys
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hash_index import HammingIndex, parse_hash, hamming_distance
+from receipt_storage import ReceiptStorage
+from receipt_storage_sqlite import SQLiteReceiptStorage
+from fraud_detector import FraudDetector
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+def flip(value, bits, rng):
+    for p in rng.sample(range(64), bits):
+        value ^= 1 << p
+    return value
+
+
+def test_matches_brute_force():
+    rng = random.Random(3)
+    base = [rng.getrandbits(64) for _ in range(300)]
+    # Clusters of near copies so every radius has hits
+    hashes = base + [flip(rng.choice(base), rng.randint(1, 12), rng) for _ in range(3000)]
+    index = HammingIndex()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+
+    for query in rng.sample(hashes, 40) + [rng.getrandbits(64) for _ in range(10)]:
+        for distance in (0, 3, 4, 7, 10, 15):
+            expected = sorted(((h ^ query).bit_count(), i) for i, h in enumerate(hashes)
+                              if (h ^ query).bit_count() <= distance)
+            assert index.search(query, distance) == [(i, d) for d, i in expected]
+
+
+def test_parse_and_distance():
+    assert parse_hash("cf013f1f1f018f9f") == 0xcf013f1f1f018f9f
+    assert parse_hash("not-a-hash-value") is None
+    assert parse_hash("abc") is None
+    assert hamming_distance("0000000000000000", "000000000000000f") == 4
+    assert hamming_distance("0000000000000000", None) is None
+
+
+def receipt(vendor, amount):
+    return {"timestamp": "2025-11-08T00:00:00",
+            "extracted_data": {"vendor": vendor, "amount": amount, "date": "2025-11-08", "category": "food"},
+            "metadata": {"line_items": []}}
+
+
+class Context:
+    """Stand-in ImageContext carrying a precomputed image hash"""
+
+    def __init__(self, image_hash):
+        self.image_hash = image_hash
+
+
+def check_storage(storage):
+    storage.save_receipt(receipt("SWIGGY", 649.0), SAMPLE, image_hash="cf013f1f1f018f9f")
+    storage.save_receipt(receipt("UBER", 250.0), SAMPLE, image_hash="0123456789abcdef")
+
+    detector = FraudDetector(storage, max_hash_distance=5)
+    # Same receipt re-photographed: 3 bits differ, OCR read a different amount
+    result = detector.check_duplicates(SAMPLE, receipt("SWIGGY", 694.0),
+                                       image_context=Context("cf013f1f1f018f98"))
+    assert result["duplicate_detected"]
+    assert result["near_duplicates"] == 1 and result["exact_duplicates"] == 0
+    assert result["similar_receipts"][0]["match_type"] == "similar_image"
+    assert result["similar_receipts"][0]["distance"] == 3
+    assert result["similar_receipts"][0]["vendor"] == "SWIGGY"
+
+    # Exact-only detector ignores it; saving more receipts updates the index
+    exact_only = FraudDetector(storage, max_hash_distance=0)
+    assert not exact_only.check_duplicates(SAMPLE, receipt("SWIGGY", 694.0),
+                                           image_context=Context("cf013f1f1f018f98"))["duplicate_detected"]
+    storage.save_receipt(receipt("ZOMATO", 10.0), SAMPLE, image_hash="0123456789abcdee")
+    assert [d["distance"] for d in storage.find_near_duplicates("0123456789abcdef", 2)] == [0, 1]
+
+
+def scan_duplicates(entries, image_hash, content_hash):
+    """find_duplicates as a scan of the whole index"""
+    duplicates = []
+    for entry in entries:
+        if entry["image_hash"] == image_hash:
+            duplicates.append({**entry, "match_type": "exact_image"})
+        elif entry["content_hash"] == content_hash:
+            duplicates.append({**entry, "match_type": "same_content"})
+    return duplicates
+
+
+def test_exact_duplicates_match_a_full_scan():
+    rng = random.Random(3)
+    image_hashes = [f"{rng.getrandbits(64):016x}" for _ in range(12)]
+    content_hashes = [f"c{i}" for i in range(9)]
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        for round_ in range(3):
+            for i in range(40):
+                storage.save_receipt(receipt(f"V{i}", i), SAMPLE, image_hash=rng.choice(image_hashes),
+                                     content_hash=rng.choice(content_hashes))
+            # Lookups see receipts saved since the last one
+            entries = storage.get_all_receipts()
+            for image_hash in image_hashes + ["ffffffffffffffff"]:
+                for content_hash in content_hashes + ["c-new"]:
+                    assert storage.find_duplicates(image_hash, content_hash) == \
+                        scan_duplicates(entries, image_hash, content_hash)
+
+
+def test_fraud_detector_reports_distance_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_storage(ReceiptStorage(tmp))
+
+
+def test_fraud_detector_reports_distance_sqlite():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_storage(SQLiteReceiptStorage(tmp))
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Test hedged LLM-vs-OCR extraction with stand-in analyzers of controlled latency"""
+
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analyzer import HybridReceiptAnalyzer
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+class StandIn:
+    """Sleeps, then returns a result with the given amount (or raises)"""
+
+    def __init__(self, delay, amount=649.0, method="llm_receipt_ocr", fail=False):
+        self.delay = delay
+        self.amount = amount
+        self.method = method
+        self.fail = fail
+        self.calls = 0
+
+    def analyze(self, file_path, image_context=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.method} unavailable")
+        return {
+            "file": Path(file_path).name,
+            "timestamp": "2025-11-08T00:00:00",
+            "extracted_data": {"amount": self.amount},
+            "metadata": {"extraction_method": self.method},
+        }
+
+
+def make_analyzer(llm, fallback, delay, deadline):
+    """
+    Build the analyzer the normal way, with stand-in analyzer_llm / analyzer_fallback
+    backend modules in place of the real ones (backends are looked up in sys.modules)
+    """
+    backends = {
+        "analyzer_llm": types.SimpleNamespace(is_available=lambda: True, LLMReceiptAnalyzer=lambda **kwargs: llm),
+        "analyzer_fallback": types.SimpleNamespace(ReceiptAnalyzer=lambda: fallback),
+    }
+    saved = {name: sys.modules.get(name) for name in backends}
+    sys.modules.update(backends)
+    try:
+        analyzer = HybridReceiptAnalyzer(enable_fraud_detection=False, enable_cache=False,
+                                         hedge_delay=delay, hedge_deadline=deadline)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    assert analyzer.llm_analyzer is llm and analyzer.fallback_analyzer is fallback and analyzer.hedging
+    return analyzer
+
+
+def run(llm, fallback, delay=0.1, deadline=5.0):
+    analyzer = make_analyzer(llm, fallback, delay, deadline)
+    start = time.perf_counter()
+    result = analyzer.analyze(SAMPLE)
+    return result, time.perf_counter() - start
+
+
+def test_fast_llm_never_starts_ocr():
+    fallback = StandIn(0.1, method="fallback")
+    result, _ = run(StandIn(0.05), fallback, delay=0.5)
+    assert result["metadata"]["hedge"]["winner"] == "llm"
+    assert result["metadata"]["hedge"]["fallback_started"] is False
+    assert fallback.calls == 0
+
+
+def test_valid_llm_preferred_before_deadline():
+    result, elapsed = run(StandIn(0.6), StandIn(0.05, method="fallback"), delay=0.1, deadline=5.0)
+    assert result["metadata"]["hedge"]["winner"] == "llm"
+    assert result["metadata"]["hedge"]["fallback_started"] is True
+    assert elapsed < 1.0
+
+
+def test_ocr_wins_after_deadline():
+    result, elapsed = run(StandIn(3.0), StandIn(0.05, method="fallback"), delay=0.1, deadline=0.4)
+    assert result["metadata"]["hedge"]["winner"] == "fallback"
+    assert result["metadata"]["extraction_method"] == "fallback"
+    assert 0.35 < elapsed < 1.5
+
+
+def test_llm_failure_starts_ocr_immediately():
+    result, elapsed = run(StandIn(0.05, fail=True), StandIn(0.05, method="fallback"), delay=2.0)
+    assert result["metadata"]["hedge"]["winner"] == "fallback"
+    assert elapsed < 1.0
+
+
+def test_llm_without_amount_is_not_accepted():
+    result, _ = run(StandIn(0.05, amount=None), StandIn(0.1, method="fallback"), delay=0.0)
+    assert result["metadata"]["hedge"]["winner"] == "fallback"
+
+
+def test_both_failing_raises():
+    try:
+        run(StandIn(0.05, fail=True), StandIn(0.05, method="fallback", fail=True))
+    except RuntimeError as e:
+        assert "All methods failed" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
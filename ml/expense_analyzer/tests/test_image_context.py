@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Test the shared per-analysis image context: lazy, cached, one read and one decode per analysis"""
+
+import os
+import sys
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_context import ImageContext
+from image_hashing import compute_hashes
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+OCR_TEXT = "SWIGGY\nDate: 08-11-2025\nTOTAL: Rs 649.00\n"
+
+
+@contextlib.contextmanager
+def counting(file_path):
+    """Count full decodes (ImageContext._decode) and disk reads of file_path"""
+    counts = {"decode": 0, "read": 0}
+    decode, read_bytes = ImageContext._decode, Path.read_bytes
+
+    def counted_decode(self):
+        counts["decode"] += 1
+        return decode(self)
+
+    def counted_read(self):
+        if str(self) == file_path:
+            counts["read"] += 1
+        return read_bytes(self)
+
+    ImageContext._decode, Path.read_bytes = counted_decode, counted_read
+    try:
+        yield counts
+    finally:
+        ImageContext._decode, Path.read_bytes = decode, read_bytes
+
+
+def test_properties_are_lazy_and_cached():
+    with counting(SAMPLE) as counts:
+        context = ImageContext(SAMPLE)
+        assert counts == {"decode": 0, "read": 0}  # nothing happens on construction
+
+        data = context.data
+        assert context.data is data and data == Path(SAMPLE).read_bytes()
+        assert context.sha256 == hashlib.sha256(data).hexdigest() and context.file_hash == context.sha256[:16]
+
+        # JPEG hashes come from a reduced decode of the bytes, not the full image
+        hashes = context.image_hashes
+        assert context.image_hashes is hashes and hashes == compute_hashes(data)
+        assert context.image_hash == hashes['ahash'] and context._image is None
+        assert counts["decode"] == 0
+
+        image = context.image
+        assert context.image is image and image.size == (400, 600)
+        assert counts == {"decode": 1, "read": 2}    # context.data once + the comparison read above
+
+
+def test_missing_file_raises_on_first_use():
+    context = ImageContext("does-not-exist.jpg")
+    try:
+        context.data
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("expected FileNotFoundError")
+
+
+def test_one_analysis_reads_and_decodes_once():
+    from analyzer import HybridReceiptAnalyzer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)  # extraction cache and receipt history live in the cwd
+        try:
+            analyzer = HybridReceiptAnalyzer(force_fallback=True)
+            # Only the Tesseract call is replaced: loading, preprocessing, parsing,
+            # caching, fraud checks and storage all run for real
+            analyzer._get_fallback_analyzer().extract_text = lambda image: OCR_TEXT
+            with counting(SAMPLE) as counts:
+                result = analyzer.analyze(SAMPLE)
+        finally:
+            os.chdir(cwd)
+
+    assert result['extracted_data']['amount'] == 649.0 and result['receipt_id']
+    assert result['fraud_checks']['image_hash'] == compute_hashes(Path(SAMPLE).read_bytes())['ahash']
+    assert counts == {"decode": 1, "read": 1}
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
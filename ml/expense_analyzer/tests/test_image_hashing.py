@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Test NumPy aHash/dHash/pHash and the draft-mode decode path"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw
+
+from image_hashing import compute_hashes, average_hash, difference_hash, perceptual_hash
+from image_context import ImageContext
+from hash_index import hamming_distance
+from receipt_storage import ReceiptStorage
+
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+
+
+def legacy_average_hash(img):
+    small = img.convert('L').resize((8, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.tobytes())
+    avg = sum(pixels) / len(pixels)
+    return hex(int(''.join('1' if p > avg else '0' for p in pixels), 2))[2:].zfill(16)
+
+
+def jpeg_bytes(img, quality=90):
+    out = io.BytesIO()
+    img.convert('RGB').save(out, 'JPEG', quality=quality)
+    return out.getvalue()
+
+
+def test_full_decode_ahash_matches_previous_implementation():
+    for path in SAMPLES.glob("*.jp*g"):
+        with Image.open(path) as img:
+            assert average_hash(img) == legacy_average_hash(img)
+            assert compute_hashes(str(path), kinds=('ahash',), draft=False)['ahash'] == legacy_average_hash(img)
+
+
+def test_draft_decode_stays_close():
+    with Image.open(SAMPLES / "sample_receipt.jpg") as img:
+        big = img.resize((img.width * 6, img.height * 6), Image.Resampling.BICUBIC)
+    data = jpeg_bytes(big)
+    full, draft = compute_hashes(data, draft=False), compute_hashes(data)
+    assert set(draft) == {'ahash', 'dhash', 'phash'}
+    for kind in draft:
+        assert len(draft[kind]) == 16
+        assert hamming_distance(full[kind], draft[kind]) <= 4
+
+
+def test_hash_does_not_depend_on_requested_kinds():
+    # Small JPEGs are where the draft scale would differ between an 8x8 and a 32x32 floor
+    with Image.open(SAMPLES / "sample_receipt.jpg") as img:
+        sizes = [(img.width * s // 8, img.height * s // 8) for s in (1, 2, 3, 4, 8)]
+        sources = [jpeg_bytes(img.resize(size, Image.Resampling.BICUBIC)) for size in sizes]
+    for data in sources:
+        together = compute_hashes(data)
+        for kind in together:
+            assert compute_hashes(data, kinds=(kind,))[kind] == together[kind]
+
+    # Storage (aHash only) and the analysis context (all kinds) agree
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "small.jpg"
+        path.write_bytes(sources[0])
+        stored = ReceiptStorage(storage_dir=str(Path(tmp) / "history")).generate_image_hash(str(path))
+        assert stored == ImageContext(str(path)).image_hash
+
+
+def test_hashes_survive_rescale_and_separate_different_images():
+    a = Image.open(SAMPLES / "sample_receipt.jpg").convert('RGB')
+    b = Image.new('RGB', a.size, 'white')
+    draw = ImageDraw.Draw(b)
+    for y in range(0, b.height, 40):
+        draw.rectangle([10, y, b.width // 2, y + 15], fill='black')
+    smaller = a.resize((a.width // 2, a.height // 2), Image.Resampling.BILINEAR)
+
+    for fn in (average_hash, difference_hash, perceptual_hash):
+        assert hamming_distance(fn(a), fn(smaller)) <= 6
+        assert hamming_distance(fn(a), fn(b)) > 10
+
+
+def test_image_context_hashes_once_from_bytes():
+    context = ImageContext(str(SAMPLES / "sample_receipt.jpg"))
+    hashes = context.image_hashes
+    assert context.image_hash == hashes['ahash'] == "cf013f1f1f018f9f"
+    # Decoding the full image for OCR does not change the hash
+    _ = context.image
+    assert context.image_hashes is hashes
+
+
+def test_unknown_kind_rejected():
+    try:
+        compute_hashes(str(SAMPLES / "sample_receipt.jpg"), kinds=('whash',))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test the combined keyword matcher against the per-category patterns and classify_many()"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from keyword_classifier import KeywordClassifier
+
+classifier = KeywordClassifier()
+
+
+def per_category_matches(text):
+    """Unique matches per category using the separate patterns"""
+    matches = {}
+    for category, pattern in classifier.patterns.items():
+        found = {m.lower() for m in pattern.findall(text)}
+        if found:
+            matches[category] = found
+    return matches
+
+
+def test_overlapping_keywords_count_for_every_category():
+    text = "Uber Eats order, Gas Station near Prime Video office"
+    result = classifier.classify(description=text)
+    expected = per_category_matches(text)
+    assert expected["food"] == {"uber eats"}
+    assert expected["travel"] == {"uber", "gas station"}
+    assert expected["utilities"] == {"gas"}
+    assert result["category"] == "travel"
+    assert set(result["matched_keywords"]) == expected["travel"]
+
+
+def test_word_boundaries():
+    assert classifier.classify(vendor="UberEats cabin showroom")["category"] == "other"
+    assert classifier.classify(vendor="Railway Rail")["matched_keywords"] == ["railway", "rail"]
+
+
+def test_ties_go_to_earlier_category():
+    result = classifier.classify(vendor="Netflix", description="Swiggy")
+    assert result["category"] == "food"
+    assert result["confidence"] == 0.5
+
+
+def test_classify_many_list_and_dicts():
+    items = ["SWIGGY", {"vendor": "Airtel", "line_items": [{"item_name": "Broadband"}]}, "", None, "SWIGGY"]
+    results = classifier.classify_many(items)
+    assert [r["category"] for r in results] == ["food", "utilities", "other", "other", "food"]
+    assert results[1]["confidence"] == 0.7
+    # Repeated texts share the score but not the result objects
+    results[0]["matched_keywords"].append("x")
+    assert results[4]["matched_keywords"] == ["swiggy"]
+
+
+def test_classify_many_matches_classify():
+    texts = [
+        "Uber Eats order, Gas Station near Prime Video office", "UberEats cabin showroom",
+        "Railway Rail", "Netflix Swiggy", "SWIGGY", "", "   ", "Starbucks #1234/Coffee - Bakery",
+        "parking / fuel, PETROL, diesel", "Hotel\x00Taxi", "Uber", "uber eats", "Uber Eats",
+    ]
+    # ASCII batches take the lower-cased fast path; any non-ASCII text takes the
+    # case-insensitive matcher (str.lower() can change lengths there)
+    unicode_texts = texts + ["CAFÉ Coffee", "İstanbul Hotel Taxi", "Straße Taxi", "KFC Kfc"]
+    for batch in (texts, unicode_texts):
+        assert classifier.classify_many(batch) == [classifier.classify(description=t) for t in batch]
+
+
+def test_classify_many_series():
+    try:
+        import pandas as pd
+    except ImportError:
+        return
+    series = pd.Series(["Uber", "Amazon", None], index=["a", "b", "c"])
+    frame = classifier.classify_many(series)
+    assert list(frame.index) == ["a", "b", "c"]
+    assert list(frame["category"]) == ["travel", "supplies", "other"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test that analyzer.py only imports the backends a run actually selects"""
+
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import sys, json
+sys.path.insert(0, {root!r})
+from analyzer import HybridReceiptAnalyzer
+HybridReceiptAnalyzer({kwargs})
+print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in {watch!r})))
+"""
+
+WATCH = ["analyzer_llm", "receipt_ocr", "openai", "analyzer_fallback", "pytesseract",
+         "receipt_storage", "fraud_detector"]
+
+
+def loaded_modules(kwargs: str) -> set:
+    """Construct an analyzer in a fresh interpreter and return the watched modules it loaded"""
+    code = PROBE.format(root=str(ROOT), kwargs=kwargs, watch=WATCH)
+    with tempfile.TemporaryDirectory() as cwd:
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True,
+                             text=True, check=True).stdout
+    return set(json.loads(out.strip().splitlines()[-1]))
+
+
+def test_fallback_skips_llm_stack():
+    loaded = loaded_modules("force_fallback=True, enable_cache=False, enable_fraud_detection=False")
+    assert "analyzer_fallback" in loaded
+    assert not loaded & {"analyzer_llm", "receipt_ocr", "openai"}
+    # OCR engine is only imported when OCR actually runs
+    assert "pytesseract" not in loaded
+
+
+def test_storage_imported_only_with_fraud_detection():
+    without = loaded_modules("force_fallback=True, enable_cache=False, enable_fraud_detection=False")
+    assert not without & {"receipt_storage", "fraud_detector"}
+
+    with_fraud = loaded_modules("force_fallback=True, enable_cache=False, enable_fraud_detection=True")
+    assert {"receipt_storage", "fraud_detector"} <= with_fraud
+    assert not with_fraud & {"analyzer_llm", "receipt_ocr", "openai"}
+
+
+CONCURRENT = """
+import sys, json, threading
+sys.path.insert(0, {root!r})
+from analyzer import HybridReceiptAnalyzer
+outcomes = []
+def build():
+    try:
+        analyzer = HybridReceiptAnalyzer(force_fallback=True, enable_cache=False)
+        outcomes.append("ok" if analyzer.fraud_detector else "no fraud detection")
+    except Exception as e:
+        outcomes.append(repr(e))
+threads = [threading.Thread(target=build) for _ in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(json.dumps(outcomes))
+"""
+
+
+def test_concurrent_first_imports_see_complete_modules():
+    # Threads racing on the first import of a backend must not get it half-initialized
+    for _ in range(3):
+        with tempfile.TemporaryDirectory() as cwd:
+            out = subprocess.run([sys.executable, "-c", CONCURRENT.format(root=str(ROOT))], cwd=cwd,
+                                 capture_output=True, text=True, check=True).stdout
+        assert json.loads(out.strip().splitlines()[-1]) == ["ok"] * 4
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Test concurrent LLM extraction against a local stand-in for the OpenAI-compatible API"""
+
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analyzer_llm import LLMReceiptAnalyzer
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+class StandInLLM(BaseHTTPRequestHandler):
+    """Answers /chat/completions after a delay and records peak concurrency"""
+
+    delay = 0.3
+    delays = {}  # per-request delay by arrival number (1-based), overriding delay
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    served = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.served += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+            n = cls.served
+        time.sleep(cls.delays.get(n, cls.delay))
+        with cls.lock:
+            cls.in_flight -= 1
+
+        content = json.dumps({"merchant_name": f"STORE {n}", "total_amount": 100.0 + n, "currency": "INR"})
+        body = json.dumps({
+            "id": f"chatcmpl-{n}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stand-in",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(delay, delays=None):
+    StandInLLM.delay = delay
+    StandInLLM.delays = delays or {}
+    StandInLLM.in_flight = StandInLLM.peak = StandInLLM.served = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    analyzer = LLMReceiptAnalyzer(
+        api_key="test-key",
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        model="stand-in"
+    )
+    return server, analyzer
+
+
+def _receipt_copies(directory, n):
+    """n copies of the sample receipt under distinct names"""
+    paths = []
+    for i in range(n):
+        path = Path(directory) / f"receipt_{i}.jpg"
+        shutil.copy(SAMPLE, path)
+        paths.append(str(path))
+    return paths
+
+
+def test_bounded_concurrency_and_input_order():
+    # The first requests take longest, so results complete out of input order
+    server, analyzer = _start_server(delay=0.3, delays={1: 0.6, 2: 0.5, 3: 0.4})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = _receipt_copies(tmp, 8)
+            start = time.perf_counter()
+            results = analyzer.analyze_many(paths, max_in_flight=4, timeout=10)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert all(isinstance(r, dict) for r in results)
+    assert [r["file"] for r in results] == [Path(p).name for p in paths]
+    assert StandInLLM.peak == 4
+    # 8 requests, 4 at a time, 0.3-0.6s each: ~0.9s instead of ~3s sequentially
+    assert elapsed < 1.8
+    assert all(r["metadata"]["extraction_method"] == "llm_receipt_ocr" for r in results)
+
+
+def test_timeout_is_reported_per_request():
+    server, analyzer = _start_server(delay=1.0)
+    try:
+        results = analyzer.analyze_many([SAMPLE] * 2, max_in_flight=2, timeout=0.2)
+    finally:
+        server.shutdown()
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+
+
+def test_abandoned_call_keeps_its_slot():
+    # The first request to arrive hangs past its timeout while the other slot keeps
+    # serving. The abandoned call still counts, so no third call opens beside it
+    server, analyzer = _start_server(delay=0.25, delays={1: 1.5})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            results = analyzer.analyze_many(_receipt_copies(tmp, 8), max_in_flight=2, timeout=1.0)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert all(isinstance(r, (dict, TimeoutError)) for r in results)
+    assert sum(isinstance(r, dict) for r in results) >= 3
+    assert StandInLLM.peak == 2 and elapsed < 1.4
+
+
+def test_deadline_includes_queueing_on_a_hung_endpoint():
+    # One slot, held by a call that never answers in time: the queued requests fail
+    # at their own deadline instead of waiting for the slot, and never reach the endpoint
+    server, analyzer = _start_server(delay=1.5)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            results = analyzer.analyze_many(_receipt_copies(tmp, 3), max_in_flight=1, timeout=0.3)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert elapsed < 0.8
+    assert StandInLLM.served == 1
+
+
+def test_streams_results_as_completed():
+    server, analyzer = _start_server(delay=0.1)
+
+    async def collect():
+        return [i async for i, _ in analyzer.iter_analyze_async([SAMPLE] * 5, max_in_flight=2, timeout=10)]
+
+    try:
+        indexes = asyncio.run(collect())
+    finally:
+        server.shutdown()
+
+    assert sorted(indexes) == list(range(5))
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Test the OCR preprocessing stages: deskew, Sauvola binarization and OCR_PREPROCESS stage selection"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ocr_preprocess import OCRPreprocessor, STAGES, DEFAULT_STAGES
+
+
+def text_page(seed=1):
+    """White page with rows of dark 'words', like a scanned receipt"""
+    rng = np.random.default_rng(seed)
+    page = Image.new('L', (600, 800), 255)
+    draw = ImageDraw.Draw(page)
+    for y in range(60, 740, 28):
+        x = 40
+        while x < 540:
+            width = int(rng.integers(15, 60))
+            draw.rectangle([x, y, min(x + width, 560), y + 10], fill=0)
+            x += width + int(rng.integers(8, 20))
+    return page
+
+
+def with_env(value, fn):
+    """Run fn() with OCR_PREPROCESS set to value (None unsets it)"""
+    saved = os.environ.get('OCR_PREPROCESS')
+    try:
+        if value is None:
+            os.environ.pop('OCR_PREPROCESS', None)
+        else:
+            os.environ['OCR_PREPROCESS'] = value
+        return fn()
+    finally:
+        if saved is None:
+            os.environ.pop('OCR_PREPROCESS', None)
+        else:
+            os.environ['OCR_PREPROCESS'] = saved
+
+
+def test_deskew_corrects_known_rotation():
+    preprocessor = OCRPreprocessor(stages=('deskew',))
+    assert preprocessor.estimate_skew(text_page()) == 0.0
+
+    for angle in (3.0, -3.0):
+        skewed = text_page().rotate(angle, expand=True, fillcolor=255)
+        assert abs(preprocessor.estimate_skew(skewed) - angle) <= preprocessor.skew_step_degrees
+
+        corrected, timings = preprocessor.process(skewed)
+        assert abs(timings['deskew_angle'] - angle) <= preprocessor.skew_step_degrees
+        assert abs(preprocessor.estimate_skew(corrected)) <= preprocessor.skew_step_degrees
+
+
+def test_sauvola_binarization():
+    # Text on an unevenly lit background: dark on the left, bright on the right
+    page = np.asarray(text_page(), dtype=np.float64)
+    lighting = np.linspace(0.55, 1.0, page.shape[1])[None, :]
+    shaded = Image.fromarray((page * lighting).astype(np.uint8))
+
+    binary, timings = OCRPreprocessor(stages=('binarize',)).process(shaded)
+    pixels = np.asarray(binary)
+    assert binary.mode == 'L' and binary.size == shaded.size and timings['output_size'] == list(shaded.size)
+    assert set(np.unique(pixels)) <= {0, 255}
+
+    # The shadow does not turn into ink: text stays black, the background white
+    ink = np.asarray(text_page()) == 0
+    assert (pixels[ink] == 0).mean() > 0.95
+    assert (pixels[~ink] == 255).mean() > 0.95
+
+
+def test_stage_selection_from_env():
+    def stages(value):
+        return with_env(value, lambda: OCRPreprocessor.from_env().stages)
+
+    assert stages(None) == list(DEFAULT_STAGES) == ['grayscale']
+    assert stages('none') == [] and stages('off') == []
+    assert stages('all') == list(STAGES)
+    assert stages(' Deskew, grayscale ') == ['grayscale', 'deskew']  # pipeline order
+    try:
+        stages('grayscale,sharpen')
+    except ValueError as e:
+        assert 'sharpen' in str(e)
+    else:
+        raise AssertionError("expected ValueError for an unknown stage")
+
+    # Only the selected stages run, and the fallback analyzer picks the setting up
+    image = text_page().convert('RGB')
+    _, timings = with_env('grayscale,binarize', lambda: OCRPreprocessor.from_env().process(image))
+    assert sorted(k for k in timings if k.endswith('_ms')) == ['binarize_ms', 'grayscale_ms']
+    untouched, timings = with_env('none', lambda: OCRPreprocessor.from_env().process(image))
+    assert untouched is image and timings == {'output_size': [600, 800]}
+
+    from analyzer_fallback import ReceiptAnalyzer
+    assert with_env('deskew', lambda: ReceiptAnalyzer().preprocessor.stages) == ['deskew']
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
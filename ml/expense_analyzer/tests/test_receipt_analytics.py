@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Test the compact receipt frame, spend queries and the Parquet export"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_analytics import SpendAnalytics, receipts_frame, export_parquet
+from receipt_storage import ReceiptStorage
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+RECEIPTS = [
+    ("SWIGGY", 649.0, "2025-11-08", "food"),
+    ("Uber India", 320, "2025-11-09", "travel"),
+    ("swiggy instamart", 120.5, "2025-12-01", "food"),
+    (None, None, None, None),
+    ("Airtel", 999.0, "2026-01-11", "utilities"),
+    ("Swiggy", 80, "2026-01-15", "Food"),
+]
+
+
+def fill(storage):
+    for i, (vendor, amount, date, category) in enumerate(RECEIPTS):
+        storage.save_receipt({
+            "file": "r.jpg",
+            "extracted_data": {"vendor": vendor, "amount": amount, "date": date, "category": category},
+            "metadata": {"line_items": []},
+        }, SAMPLE, image_hash=f"{i:016x}", content_hash=f"c{i}")
+    return storage
+
+
+def test_compact_dtypes():
+    with tempfile.TemporaryDirectory() as tmp:
+        frame = receipts_frame(fill(ReceiptStorage(tmp)).get_all_receipts())
+    assert str(frame["amount"].dtype) == "float32"
+    assert str(frame["vendor"].dtype) == "category" and str(frame["category"].dtype) == "category"
+    assert frame["date"].dtype.kind == "M"
+    assert list(frame["month"]) == ["2025-11", "2025-11", "2025-12", "unknown", "2026-01", "2026-01"]
+    assert frame["amount"].isna().sum() == 1
+
+
+def test_non_iso_dates_get_their_month():
+    entries = [
+        {"receipt_id": "a", "date": "05/03/2020", "amount": 10.0},
+        {"receipt_id": "b", "date": "Mar 17, 19", "amount": 20.0},
+        {"receipt_id": "c", "date": "17 March 2019", "amount": 30.0},
+        {"receipt_id": "d", "date": "2025-11-08T10:15:00", "amount": 40.0},
+        {"receipt_id": "e", "date": "last tuesday", "amount": 50.0},
+    ]
+    frame = receipts_frame(entries)
+    assert list(frame["date"].dt.strftime("%Y-%m-%d").fillna("NaT")) == [
+        "2020-03-05", "2019-03-17", "2019-03-17", "2025-11-08", "NaT"]
+    assert list(frame["month"]) == ["2020-03", "2019-03", "2019-03", "2025-11", "unknown"]
+
+
+def test_grouped_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        analytics = SpendAnalytics.from_storage(fill(ReceiptStorage(tmp)))
+
+    by_category = analytics.summary(by=["category"])
+    assert by_category.loc["utilities", "total"] == 999.0
+    assert by_category.loc["food", "receipts"] == 2
+
+    food = analytics.summary(by=["category"], categories=["FOOD"])
+    assert set(food.index) == {"food", "Food"} and food["total"].sum() == pytest.approx(849.5)
+
+    monthly = analytics.summary(by=["vendor_key"], freq="M", start="2025-11-01", end="2025-12-31")
+    assert monthly["receipts"].sum() == 3
+
+    swiggy = analytics.receipts(columns=["vendor", "amount"], vendor="SWIG")
+    assert list(swiggy["vendor"]) == ["SWIGGY", "swiggy instamart", "Swiggy"]
+
+
+def test_parquet_round_trip():
+    pytest.importorskip("pyarrow")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = fill(ReceiptStorage(str(Path(tmp) / "history")))
+        dataset = Path(tmp) / "parquet"
+        assert export_parquet(storage, dataset) == len(RECEIPTS)
+        assert (dataset / "month=2025-11").is_dir()
+
+        analytics = SpendAnalytics(dataset)
+        december = analytics.receipts(columns=["vendor", "amount"], start="2025-12-01", end="2025-12-31")
+        assert list(december["vendor"]) == ["swiggy instamart"]
+        in_memory = SpendAnalytics.from_storage(storage).summary(by=["category"])
+        assert analytics.summary(by=["category"])["total"].to_dict() == in_memory["total"].to_dict()
+
+        # Partition pruning: a date range never opens files of other months
+        for path in (dataset / "month=2026-01").glob("*.parquet"):
+            path.write_bytes(b"not parquet")
+        december = analytics.receipts(columns=["vendor"], start="2025-12-01", end="2025-12-31")
+        assert list(december["vendor"]) == ["swiggy instamart"]
+        with pytest.raises(Exception):
+            analytics.receipts(columns=["vendor"])
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Test sharded/compressed receipt layouts and migrating a history between them"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_layout import ReceiptLayout, migrate_layout, ZSTD_AVAILABLE
+from receipt_storage import ReceiptStorage
+from receipt_storage_sqlite import SQLiteReceiptStorage
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+def receipt(vendor, amount):
+    return {
+        "file": "r.jpg",
+        "extracted_data": {"vendor": vendor, "amount": amount, "date": "2025-11-08", "category": "food"},
+        "metadata": {"line_items": [{"item_name": "Biryani ₹", "item_total": amount}]},
+    }
+
+
+def fill(storage, count=6):
+    return [storage.save_receipt(receipt(f"Vendor {i}", 100 + i), SAMPLE, image_hash=f"{i:016x}",
+                                 content_hash=f"c{i}") for i in range(count)]
+
+
+def test_paths_and_round_trip():
+    storage_dir = Path("history")
+    receipt_id = "receipt_20251108_101010_123456"
+    assert ReceiptLayout().path(storage_dir, receipt_id) == storage_dir / f"{receipt_id}.json"
+    assert ReceiptLayout("month", "gzip").path(storage_dir, receipt_id) == \
+        storage_dir / "receipts" / "2025" / "11" / f"{receipt_id}.json.gz"
+    shard = ReceiptLayout("hash").path(storage_dir, receipt_id).parent
+    assert shard.parent == storage_dir / "receipts" and len(shard.name) == 2
+
+    data = {"receipt_id": receipt_id, "extracted_data": {"vendor": "Café", "amount": 649.0}}
+    compressions = ["none", "gzip"] + (["zstd"] if ZSTD_AVAILABLE else [])
+    for layout in [ReceiptLayout()] + [ReceiptLayout("hash", c) for c in compressions]:
+        assert layout.decode(layout.encode(data)) == data
+
+
+def test_sharded_storage_reads_its_receipts():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp, layout="month", compression="gzip")
+        ids = fill(storage)
+        assert not list(Path(tmp).glob("receipt_*.json"))
+        assert len(list(Path(tmp).glob("receipts/*/*/receipt_*.json.gz"))) == len(ids)
+
+        reopened = ReceiptStorage(tmp)
+        assert reopened.layout == ReceiptLayout("month", "gzip")
+        assert reopened.get_receipt(ids[2])["extracted_data"]["vendor"] == "Vendor 2"
+
+        try:
+            ReceiptStorage(tmp, layout="hash")
+            assert False, "opening with a different layout should fail"
+        except ValueError:
+            pass
+
+
+def test_migration_keeps_every_receipt():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        ids = fill(storage)
+        before = {receipt_id: storage.get_receipt(receipt_id) for receipt_id in ids}
+
+        counts = migrate_layout(tmp, ReceiptLayout("hash", "gzip"))
+        assert counts["receipts"] == len(ids) and counts["missing"] == 0
+        assert counts["bytes_after"] < counts["bytes_before"]
+        assert not list(Path(tmp).glob("receipt_*.json"))
+
+        # The already open storage notices the new layout, for reads and writes
+        assert {receipt_id: storage.get_receipt(receipt_id) for receipt_id in ids} == before
+        new_id = storage.save_receipt(receipt("Late", 1), SAMPLE, image_hash="f" * 16, content_hash="late")
+        assert list(Path(tmp).glob(f"receipts/*/{new_id}.json.gz"))
+
+        migrate_layout(tmp, ReceiptLayout("flat"))
+        assert not (Path(tmp) / "receipts").exists()
+        assert len(list(Path(tmp).glob("receipt_*.json"))) == len(ids) + 1
+
+        # SQLite import reads whichever layout the history uses
+        migrate_layout(tmp, ReceiptLayout("month"))
+        sqlite_storage = SQLiteReceiptStorage(tmp)
+        assert sqlite_storage.get_receipt(ids[0]) == before[ids[0]]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
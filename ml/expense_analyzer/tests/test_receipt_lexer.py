@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Test the receipt lexer and the fallback extractors that read from it"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_lexer import tokenize
+from analyzer_fallback import ReceiptAnalyzer
+from ocr_preprocess import OCRPreprocessor
+
+RECEIPT = """
+  SWIGGY
+Tax Invoice
+Order No: 12345678
+Date: 08/11/2025
+1 x Paneer Tikka   Rs 240.00
+2 x Butter Naan     120
+Subtotal: 580
+CGST 2.5% SGST 2.5%  29
+Delivery Fee 40
+Grand Total: 649.00
+"""
+
+
+def make_analyzer():
+    return ReceiptAnalyzer(preprocessor=OCRPreprocessor(stages=()))
+
+
+def test_table_lines_and_numbers():
+    receipt = tokenize(RECEIPT)
+    assert receipt.lines[0] == "SWIGGY"
+    assert len(receipt.lines) == 10
+    assert ("649.00", 649.0, 9) in receipt.numbers
+    assert receipt.all_amounts() == sorted(set(receipt.all_amounts()))
+    assert tokenize(receipt) is receipt
+
+
+def test_line_flags_overlap():
+    receipt = tokenize("Subtotal 580\nGST No 29ABCDE\n2 x Tea 40")
+    # "subtotal" also contains "total"; "gst no" also implies "gst"
+    assert {'subtotal', 'total'} <= receipt.line_flags(0)
+    assert {'id_line', 'tax'} <= receipt.line_flags(1)
+    assert 'item' in receipt.line_flags(2)
+
+
+def test_currency_priority():
+    assert tokenize("Total $12 or Rs 900").currency == 'INR'
+    assert tokenize("Total USD 12").currency == 'USD'
+    assert tokenize("Paid 10 EURs").currency == 'INR'  # "Rs" inside "EURs"
+    assert tokenize("Total 12").currency == 'INR'
+
+
+def test_extractors():
+    analyzer = make_analyzer()
+    receipt = tokenize(RECEIPT)
+
+    amount = analyzer.extract_amount(receipt)
+    assert amount["amount"] == 649.0
+    assert amount["chosen_line"] == "Grand Total: 649.00"
+    assert amount["chosen_line_index"] == 9
+    assert amount["extraction_method"] == "explicit_total_pattern"
+
+    assert analyzer.extract_date(receipt) == {"date": "2025-11-08", "raw_date": "08/11/2025"}
+    assert analyzer.extract_vendor(receipt) == {"vendor": "SWIGGY", "confidence": "high"}
+
+
+def test_heuristic_amount_without_total_label():
+    text = "Cafe 24\n1 x Coffee 120\nSubtotal 580\nGST 29\nPAID 609"
+    amount = make_analyzer().extract_amount(text)
+    assert amount["amount"] == 609.0
+    assert amount["extraction_method"] == "smart_heuristics"
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
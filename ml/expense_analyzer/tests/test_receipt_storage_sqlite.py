@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Test that the SQLite receipt storage answers like the JSON storage, and the JSON migration"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_storage import ReceiptStorage, open_storage
+from receipt_storage_sqlite import SQLiteReceiptStorage
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+RECEIPTS = [
+    ("SWIGGY", 649.0, "2025-11-08", "food", "aaaa", "c1"),
+    ("Uber India", 320, "2025-11-09", "travel", "bbbb", "c2"),
+    ("swiggy instamart", 120.5, None, "Food", "cccc", "c3"),
+    (None, None, "2025-11-10", None, "aaaa", "c4"),
+    ("Airtel", 999.0, "2025-11-11", "utilities", "dddd", "c2"),
+]
+
+
+def receipt(vendor, amount, date, category):
+    return {
+        "file": "r.jpg",
+        "timestamp": "2025-11-08T00:00:00",
+        "extracted_data": {"vendor": vendor, "amount": amount, "date": date, "category": category},
+        "metadata": {"extraction_method": "llm", "line_items": []},
+    }
+
+
+def fill(storage):
+    for vendor, amount, date, category, image_hash, content_hash in RECEIPTS:
+        storage.save_receipt(receipt(vendor, amount, date, category), SAMPLE,
+                             image_hash=image_hash, content_hash=content_hash)
+
+
+def without_ids(entries):
+    return [{k: v for k, v in e.items() if k not in ("receipt_id", "stored_at")} for e in entries]
+
+
+def test_same_answers_as_json_storage():
+    with tempfile.TemporaryDirectory() as tmp:
+        json_storage = ReceiptStorage(str(Path(tmp) / "json"))
+        sqlite_storage = SQLiteReceiptStorage(str(Path(tmp) / "sqlite"))
+        fill(json_storage)
+        fill(sqlite_storage)
+
+        for a, b in [
+            (json_storage.get_all_receipts(), sqlite_storage.get_all_receipts()),
+            (json_storage.find_duplicates("aaaa", "c2"), sqlite_storage.find_duplicates("aaaa", "c2")),
+            (json_storage.get_receipts_by_vendor("SWIG"), sqlite_storage.get_receipts_by_vendor("SWIG")),
+            (json_storage.get_receipts_by_category("FOOD"), sqlite_storage.get_receipts_by_category("FOOD")),
+        ]:
+            assert without_ids(a) == without_ids(b)
+
+        assert [d["match_type"] for d in sqlite_storage.find_duplicates("aaaa", "c2")] == \
+            ["exact_image", "same_content", "exact_image", "same_content"]
+        assert sqlite_storage.get_all_receipts()[1]["amount"] == 320
+
+        stats_json, stats_sqlite = json_storage.get_statistics(), sqlite_storage.get_statistics()
+        assert abs(stats_json.pop("total_amount") - stats_sqlite.pop("total_amount")) < 1e-6
+        assert stats_json == stats_sqlite
+
+        receipt_id = sqlite_storage.get_all_receipts()[0]["receipt_id"]
+        stored = sqlite_storage.get_receipt(receipt_id)
+        assert stored["extracted_data"]["vendor"] == "SWIGGY" and stored["image_hash"] == "aaaa"
+        assert sqlite_storage.get_receipt("receipt_missing") is None
+
+
+def test_migrates_json_history_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        history = Path(tmp) / "history"
+        fill(ReceiptStorage(str(history)))
+        expected = ReceiptStorage(str(history)).get_all_receipts()
+
+        storage = open_storage(str(history), backend="sqlite")
+        assert isinstance(storage, SQLiteReceiptStorage)
+        assert storage.get_all_receipts() == expected
+        assert storage.get_receipt(expected[0]["receipt_id"])["file"] == "r.jpg"
+
+        # One-shot: reopening does not import again; an explicit rerun only adds new receipts
+        storage.save_receipt(receipt("Zomato", 10.0, None, "food"), SAMPLE, image_hash="eeee", content_hash="c9")
+        assert len(SQLiteReceiptStorage(str(history)).get_all_receipts()) == len(expected) + 1
+        assert storage.migrate_from_json() == 0
+
+
+def test_empty_statistics():
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = SQLiteReceiptStorage(tmp).get_statistics()
+        assert stats["total_receipts"] == 0 and stats["categories"] == {}
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
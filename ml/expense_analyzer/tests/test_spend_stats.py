@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Test running spend statistics (Welford, quantile sketch) and their use by storage and fraud checks"""
+
+import sys
+import random
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from spend_stats import RunningStats, SpendStatistics, QuantileSketch, month_key
+from receipt_analytics import receipts_frame
+from receipt_storage import ReceiptStorage
+from receipt_storage_sqlite import SQLiteReceiptStorage
+from fraud_detector import FraudDetector
+
+SAMPLE = str(Path(__file__).resolve().parent.parent / "samples" / "sample_receipt.jpg")
+
+
+def receipt(vendor, amount, date, category):
+    return {
+        "file": "r.jpg",
+        "timestamp": "2025-11-08T00:00:00",
+        "extracted_data": {"vendor": vendor, "amount": amount, "date": date, "category": category},
+        "metadata": {"extraction_method": "llm", "line_items": []},
+    }
+
+
+def test_welford_matches_two_pass():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(5, 1) for _ in range(5000)]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    stats.add(None)
+
+    assert stats.receipts == 5001 and stats.count == 5000
+    assert abs(stats.mean - statistics.fmean(values)) < 1e-9 * stats.mean
+    assert abs(stats.variance - statistics.variance(values)) < 1e-9 * stats.variance
+    assert stats.min == min(values) and stats.max == max(values)
+
+
+def test_quantile_sketch_relative_error():
+    rng = random.Random(4)
+    values = sorted(rng.lognormvariate(6, 1.5) for _ in range(20000))
+    sketch = QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.05, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.count == sketch.count and restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_groups_and_round_trip():
+    statistics_ = SpendStatistics()
+    statistics_.add({"vendor": " Swiggy ", "amount": 100, "date": "2025-11-08", "category": "food"})
+    statistics_.add({"vendor": "SWIGGY", "amount": 300, "date": "2025-12-01", "category": "food"})
+    statistics_.add({"vendor": None, "amount": None, "date": None, "category": None})
+
+    restored = SpendStatistics.from_dict(statistics_.to_dict())
+    assert restored.get("vendor", "swiggy").mean == 200
+    assert restored.get("all").receipts == 3 and restored.get("all").total == 400
+    assert list(restored.by_group("category")) == ["food", None]
+    assert sorted(restored.by_group("month")) == ["2025-11", "2025-12"]
+
+
+def test_non_iso_dates_keep_their_month():
+    dates = ["2025-11-08", "2025-11-08T10:15:00", "05/03/2020", "Mar 17, 19", "17 March 2019", "soon", None]
+    assert [month_key(d) for d in dates] == ["2025-11", "2025-11", "2020-03", "2019-03", "2019-03", None, None]
+
+    # Statistics and the analytics frame put every receipt in the same month
+    frame = receipts_frame({"receipt_id": str(i), "date": d} for i, d in enumerate(dates))
+    assert [m if m != "unknown" else None for m in frame["month"]] == [month_key(d) for d in dates]
+
+    statistics_ = SpendStatistics()
+    for date in dates:
+        statistics_.add({"vendor": "Uber", "amount": 100, "date": date, "category": "travel"})
+    assert {month: stats.count for month, stats in statistics_.by_group("month").items()} == {
+        "2025-11": 2, "2020-03": 1, "2019-03": 2}
+
+
+def test_statistics_kept_on_save_and_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in (ReceiptStorage(str(Path(tmp) / "json")), SQLiteReceiptStorage(str(Path(tmp) / "sqlite"))):
+            for i, amount in enumerate([100, 120, 80, 95.5]):
+                storage.save_receipt(receipt("Uber", amount, f"2025-11-0{i + 1}", "travel"), SAMPLE,
+                                     image_hash=f"{i:016x}", content_hash=f"c{i}")
+            stats = storage.get_statistics()
+            assert stats["total_receipts"] == 4 and stats["total_amount"] == 395.5
+            assert stats["categories"] == {"travel": 4} and stats["newest_receipt"] == "2025-11-04"
+            assert stats["by_month"]["2025-11"]["count"] == 4
+            assert storage.get_spend_stats("vendor", "UBER").max == 120
+
+        # A JSON history without the statistics file gets them rebuilt
+        (Path(tmp) / "json" / "spend_stats.json").unlink()
+        assert ReceiptStorage(str(Path(tmp) / "json")).get_statistics()["total_receipts"] == 4
+
+
+def test_outlier_flags():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = ReceiptStorage(tmp)
+        for i in range(12):
+            storage.save_receipt(receipt("Uber", 300 + 10 * (i % 4), "2025-11-08", "travel"), SAMPLE,
+                                 image_hash=f"{i:016x}", content_hash=f"c{i}")
+        detector = FraudDetector(storage)
+
+        usual = detector.check_anomalies(receipt("uber", 320, "2025-11-09", "travel"))
+        assert usual["flags"] == [] and usual["spend_context"]["vendor"]["count"] == 12
+
+        outlier = detector.check_anomalies(receipt("Uber", 900, "2025-11-09", "travel"))
+        assert {f["type"] for f in outlier["flags"]} == {"vendor_outlier", "category_outlier"}
+        assert outlier["spend_context"]["vendor"]["zscore"] > 3
+
+        # Too little history: no statistical flags
+        few = FraudDetector(storage, min_history=50).check_anomalies(receipt("Uber", 900, None, "travel"))
+        assert few["flags"] == []
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")